@@ -0,0 +1,73 @@
+"""
+PROJECT HOPE v3.0 - Multi-Account Engine
+Runs one TradingEngine per account/tier on top of a single shared market-data plane
+Market-data cost stays flat as accounts are added; each account keeps its own
+state, protections, execution, storage and ACTIVE_TIER limits
+"""
+import json, os
+from engine import TradingEngine
+from engine_bridge import UnknownAccount
+from market_data import SharedServices
+import storage
+import config
+
+
+def load_accounts():
+    """Accounts from HOPE_ACCOUNTS (JSON list) or accounts.json on the storage disk; default = single account"""
+    raw = config.ACCOUNTS_JSON
+    if not raw:
+        path = os.path.join(storage.STORAGE_DIR, 'accounts.json')
+        if os.path.exists(path):
+            with open(path) as f: raw = f.read()
+    accounts = []
+    if raw:
+        try: accounts = json.loads(raw)
+        except json.JSONDecodeError as e: print(f"[ACCOUNTS ERR] Bad accounts config: {e}")
+    if not accounts:
+        return [{'id': 'default', 'name': 'Default', 'tier': config.TIER}]
+    for i, a in enumerate(accounts):
+        a.setdefault('id', a.get('account_id') or f'account{i+1}')
+        a.setdefault('name', a['id'])
+        a.setdefault('tier', config.TIER)
+        # The first account keeps the root storage dir so single-account data carries over
+        if i > 0 and not a.get('storage_dir'):
+            a['storage_dir'] = os.path.join(storage.STORAGE_DIR, 'accounts', a['id'])
+    return accounts
+
+
+class MultiAccountEngine:
+    def __init__(self, accounts=None):
+        accounts = accounts or load_accounts()
+        # The default account's Storage also backs the shared services: one instance per storage root
+        root = storage.create_storage(accounts[0].get('storage_dir'))
+        self.shared = SharedServices(storage=root)
+        self.engines = {}
+        for i, acct in enumerate(accounts):
+            self.engines[acct['id']] = TradingEngine(acct, shared=self.shared, storage=root if i == 0 else None)
+        self.default_id = next(iter(self.engines))
+        print(f"[ACCOUNTS] {len(self.engines)} account(s): {', '.join(self.engines)}")
+
+    def start(self):
+        self.shared.start()
+        for e in self.engines.values(): e.start()
+
+    def stop(self):
+        """Stop every engine's loops and write its final state"""
+        for e in self.engines.values():
+            e.state['engine_running'] = False
+            e.persister.stop()
+
+    def get(self, account_id=None):
+        """Engine for an account id; None = the default (first) account"""
+        if not account_id: return self.engines[self.default_id]
+        if account_id not in self.engines: raise UnknownAccount(f"Unknown account: {account_id}")
+        return self.engines[account_id]
+
+    def list_accounts(self):
+        return [{'id': k, 'name': e.account.get('name', k), 'tier': e.tier['name'],
+                 'open_positions': len([s for s in e.state['credit_spreads'] if s['status'] in ['open','pending']]),
+                 'total_pnl': round(e.state.get('total_pnl', 0), 2)}
+                for k, e in self.engines.items()]
+
+    def get_market_stats(self):
+        return self.shared.market.get_stats()
@@ -1,16 +1,25 @@
 """PROJECT HOPE v3.0 - Performance Analytics with Persistent Storage"""
-import math
-from datetime import datetime
+import bisect, math, threading
+from datetime import datetime, timedelta
+import numpy as np
 import config
+from chart_series import ChartSeries, downsample
+from attribution import AttributionCube
 
 class Analytics:
+    """Trade analytics kept as running accumulators, updated once per trade in record_trade.
+    get_full_report() only reads them, so its cost doesn't grow with trade history."""
+
     def __init__(self, storage=None):
         self.storage = storage
         self.trade_history = []
+        self._lock = threading.Lock()
+        self._reset()
         # Load saved trade history on startup
         if storage:
             saved = storage.load_trade_history()
             if saved:
+                self._seed(saved)
                 self.trade_history = saved
                 print(f"[ANALYTICS] Loaded {len(saved)} trades from storage")
 
@@ -28,164 +37,318 @@ class Analytics:
             'setup_type': trade_data.get('setup_type', ''),
             'close_reason': trade_data.get('close_reason', ''),
         }
-        self.trade_history.append(entry)
+        with self._lock:
+            self._accumulate(entry)
+            self.trade_history.append(entry)
         # Save to disk immediately
         if self.storage:
             self.storage.save_trade(entry)
 
     def get_full_report(self):
-        if not self.trade_history:
-            return self._empty_report()
-
-        pnls = [t['pnl'] for t in self.trade_history]
-        wins = [t for t in self.trade_history if t['pnl'] > 0]
-        losses = [t for t in self.trade_history if t['pnl'] <= 0]
-        total = len(self.trade_history)
-        win_count = len(wins); loss_count = len(losses)
-        win_rate = round((win_count / total) * 100, 1) if total > 0 else 0
-        total_pnl = round(sum(pnls), 2)
-        gross_profit = round(sum(t['pnl'] for t in wins), 2)
-        gross_loss = round(abs(sum(t['pnl'] for t in losses)), 2)
-        avg_win = round(gross_profit / win_count, 2) if win_count > 0 else 0
-        avg_loss = round(gross_loss / loss_count, 2) if loss_count > 0 else 0
-        largest_win = round(max(pnls), 2) if pnls else 0
-        largest_loss = round(min(pnls), 2) if pnls else 0
-        profit_factor = round(gross_profit / gross_loss, 2) if gross_loss > 0 else 999
-        expectancy = round(total_pnl / total, 2) if total > 0 else 0
-        mw, ml, cur, ct = self._streaks()
-        sharpe = self._sharpe(pnls)
-        mdd, mddp = self._drawdown()
-        monthly = self._monthly()
-
-        spread_trades = [t for t in self.trade_history if 'spread' in t.get('type', '')]
-        
-        setup_stats = {}
-        for t in self.trade_history:
-            st = t.get('setup_type', 'unknown')
-            if st not in setup_stats: setup_stats[st] = {'wins':0,'losses':0,'pnl':0}
-            if t['pnl'] > 0: setup_stats[st]['wins'] += 1
-            else: setup_stats[st]['losses'] += 1
-            setup_stats[st]['pnl'] += t['pnl']
-        for k in setup_stats:
-            tot = setup_stats[k]['wins'] + setup_stats[k]['losses']
-            setup_stats[k]['win_rate'] = round((setup_stats[k]['wins']/tot)*100,1) if tot>0 else 0
-            setup_stats[k]['pnl'] = round(setup_stats[k]['pnl'], 2)
-
-        symbol_stats = {}
-        for t in self.trade_history:
-            sym = t['symbol']
-            if sym not in symbol_stats: symbol_stats[sym] = {'trades':0,'wins':0,'pnl':0}
-            symbol_stats[sym]['trades'] += 1
-            if t['pnl'] > 0: symbol_stats[sym]['wins'] += 1
-            symbol_stats[sym]['pnl'] += t['pnl']
-        for k in symbol_stats:
-            symbol_stats[k]['win_rate'] = round((symbol_stats[k]['wins']/symbol_stats[k]['trades'])*100,1)
-            symbol_stats[k]['pnl'] = round(symbol_stats[k]['pnl'], 2)
-        sorted_syms = sorted(symbol_stats.items(), key=lambda x: x[1]['pnl'], reverse=True)
-
-        # Weekly breakdown
-        weekly = self._weekly()
+        with self._lock:
+            if not self.trade_history:
+                return self._empty_report()
+            a = self._acc
+            total = a['n']
+            win_count = a['wins']; loss_count = total - win_count
+            win_rate = round((win_count / total) * 100, 1) if total > 0 else 0
+            total_pnl = round(a['sum'], 2)
+            gross_profit = round(a['gross_profit'], 2)
+            gross_loss = round(abs(a['gross_loss']), 2)
+            avg_win = round(gross_profit / win_count, 2) if win_count > 0 else 0
+            avg_loss = round(gross_loss / loss_count, 2) if loss_count > 0 else 0
+            profit_factor = round(gross_profit / gross_loss, 2) if gross_loss > 0 else 999
+            expectancy = round(total_pnl / total, 2) if total > 0 else 0
+
+            setup_stats = {}
+            for k, s in a['setups'].items():
+                tot = s['wins'] + s['losses']
+                setup_stats[k] = {**s, 'pnl': round(s['pnl'], 2), 'win_rate': round((s['wins']/tot)*100,1) if tot>0 else 0}
+            symbol_stats = {k: {**s, 'pnl': round(s['pnl'], 2), 'win_rate': round((s['wins']/s['trades'])*100,1)}
+                            for k, s in a['symbols'].items()}
+            sorted_syms = sorted(symbol_stats.items(), key=lambda x: x[1]['pnl'], reverse=True)
+            sp = a['spreads']
+
+            return {
+                'total_trades':total,'win_rate':win_rate,'wins':win_count,'losses':loss_count,
+                'total_pnl':total_pnl,'gross_profit':gross_profit,'gross_loss':gross_loss,
+                'avg_win':avg_win,'avg_loss':avg_loss,
+                'largest_win':round(a['max'], 2),'largest_loss':round(a['min'], 2),
+                'profit_factor':profit_factor,'expectancy':expectancy,'sharpe_ratio':self._sharpe(),
+                'max_drawdown':round(a['mdd'], 2),'max_drawdown_pct':round(a['mddp'], 1),
+                'max_win_streak':a['max_win_streak'],'max_loss_streak':a['max_loss_streak'],
+                'current_streak':a['streak'],'streak_type':a['streak_type'],
+                'monthly':self._buckets(a['monthly'], 'month'),'weekly':self._buckets(a['weekly'], 'week'),
+                'spread_stats':{'name':'Credit Spreads','trades':sp['trades'],'wins':sp['wins'],
+                                'win_rate':round((sp['wins']/sp['trades'])*100,1),'pnl':round(sp['pnl'],2)}
+                               if sp['trades'] else {'name':'Credit Spreads','trades':0,'win_rate':0,'pnl':0},
+                'setup_stats':setup_stats,
+                'top_symbols':[{'symbol':s[0],**s[1]} for s in sorted_syms[:5]],
+                'bottom_symbols':[{'symbol':s[0],**s[1]} for s in sorted_syms[-5:]],
+                'equity_curve':self._equity_curve(),
+                'recent_trades':self.trade_history[-30:],
+                'first_trade_date':self.trade_history[0].get('closed_at','')[:10],
+                'days_trading': len(a['days']),
+            }
+
+    # ========== ACCUMULATORS ==========
+
+    def _reset(self):
+        bal = config.BACKTEST_INITIAL_BALANCE
+        self._acc = {
+            'n': 0, 'wins': 0, 'sum': 0.0, 'gross_profit': 0.0, 'gross_loss': 0.0,
+            'max': float('-inf'), 'min': float('inf'),
+            'mean': 0.0, 'm2': 0.0,                        # Welford
+            'balance': bal, 'peak': bal, 'mdd': 0, 'mddp': 0,
+            'streak': 0, 'last': None, 'streak_type': '', 'max_win_streak': 0, 'max_loss_streak': 0,
+            'monthly': {}, 'weekly': {}, 'days': set(),
+            'setups': {}, 'symbols': {}, 'spreads': {'trades': 0, 'wins': 0, 'pnl': 0},
+        }
+        self.charts = ChartSeries(('equity', 'drawdown'))
+        self.cube = AttributionCube()
+        self._week_of = {}  # date string -> Monday of its week (None if unparseable)
+        # Daily buckets for rolling windows: day -> [trades, wins, pnl, pnl^2, gross profit, gross loss]
+        self._daily = {}
+        self._daily_keys = []       # sorted days
+        self._prefix = [(0,) * 6]   # _prefix[k] = column sums over _daily_keys[:k]
+        self._prefix_valid = 0      # prefix rows past this need rebuilding
+
+    def _accumulate(self, t):
+        a = self._acc; pnl = t['pnl']; win = pnl > 0
+        a['n'] += 1; a['sum'] += pnl
+        if win: a['wins'] += 1; a['gross_profit'] += pnl
+        else: a['gross_loss'] += pnl
+        a['max'] = max(a['max'], pnl); a['min'] = min(a['min'], pnl)
+        delta = pnl - a['mean']; a['mean'] += delta / a['n']; a['m2'] += delta * (pnl - a['mean'])
+        # Streaks
+        kind = 'w' if win else 'l'
+        a['streak'] = a['streak'] + 1 if a['last'] == kind else 1; a['last'] = kind
+        if win: a['streak_type'] = 'win'; a['max_win_streak'] = max(a['max_win_streak'], a['streak'])
+        else: a['streak_type'] = 'loss'; a['max_loss_streak'] = max(a['max_loss_streak'], a['streak'])
+        # Drawdown + equity curve
+        a['balance'] += pnl
+        if a['balance'] > a['peak']: a['peak'] = a['balance']
+        dd = a['peak'] - a['balance']; ddp = (dd / a['peak']) * 100 if a['peak'] > 0 else 0
+        if dd > a['mdd']: a['mdd'] = dd; a['mddp'] = ddp
+        closed = t.get('closed_at', '')
+        self.charts.append('equity', a['n'], round(a['balance'], 2), closed[:10])
+        self.charts.append('drawdown', a['n'], round(dd, 2), closed[:10])
+        self.cube.add(t)
+        # Buckets
+        if closed[:7]: self._bump(a['monthly'], closed[:7], pnl, win)
+        day = closed[:10]
+        if day:
+            a['days'].add(day)
+            self._add_daily(day, pnl, win)
+            if day not in self._week_of:
+                try:
+                    d = datetime.strptime(day, '%Y-%m-%d')
+                    self._week_of[day] = (d - timedelta(days=d.weekday())).strftime('%Y-%m-%d')
+                except: self._week_of[day] = None
+            if self._week_of[day]: self._bump(a['weekly'], self._week_of[day], pnl, win)
+        st = a['setups'].setdefault(t.get('setup_type', 'unknown'), {'wins':0,'losses':0,'pnl':0})
+        st['wins' if win else 'losses'] += 1; st['pnl'] += pnl
+        sy = a['symbols'].setdefault(t['symbol'], {'trades':0,'wins':0,'pnl':0})
+        sy['trades'] += 1; sy['wins'] += win; sy['pnl'] += pnl
+        if 'spread' in t.get('type', ''):
+            sp = a['spreads']; sp['trades'] += 1; sp['wins'] += win; sp['pnl'] += pnl
 
+    # ========== VECTORIZED SEED ==========
+
+    @staticmethod
+    def columns(trades):
+        """Trade history as columnar arrays: pnl, spread flag, and day/symbol/setup codes
+        into the returned lookup tables (day table entries carry their date ordinal, -1 if unparseable)"""
+        day_code, days = Analytics._encode(t.get('closed_at', '')[:10] for t in trades)
+        symbol_code, symbols = Analytics._encode(t['symbol'] for t in trades)
+        setup_code, setups = Analytics._encode(t.get('setup_type', 'unknown') for t in trades)
+        ordinals = []
+        for d in days:
+            try: ordinals.append(datetime.strptime(d, '%Y-%m-%d').toordinal())
+            except: ordinals.append(-1)
         return {
-            'total_trades':total,'win_rate':win_rate,'wins':win_count,'losses':loss_count,
-            'total_pnl':total_pnl,'gross_profit':gross_profit,'gross_loss':gross_loss,
-            'avg_win':avg_win,'avg_loss':avg_loss,'largest_win':largest_win,'largest_loss':largest_loss,
-            'profit_factor':profit_factor,'expectancy':expectancy,'sharpe_ratio':sharpe,
-            'max_drawdown':mdd,'max_drawdown_pct':mddp,
-            'max_win_streak':mw,'max_loss_streak':ml,'current_streak':cur,'streak_type':ct,
-            'monthly':monthly,'weekly':weekly,
-            'spread_stats':self._ss(spread_trades,'Credit Spreads'),
-            
-            'setup_stats':setup_stats,
-            'top_symbols':[{'symbol':s[0],**s[1]} for s in sorted_syms[:5]],
-            'bottom_symbols':[{'symbol':s[0],**s[1]} for s in sorted_syms[-5:]],
-            'equity_curve':self._equity(),
-            'recent_trades':self.trade_history[-30:],
-            'first_trade_date':self.trade_history[0].get('closed_at','')[:10] if self.trade_history else '',
-            'days_trading': self._days_trading(),
+            'pnl': np.array([t['pnl'] for t in trades], dtype=float),
+            'spread': np.array(['spread' in t.get('type', '') for t in trades], dtype=bool),
+            'day': day_code, 'days': days, 'day_ordinals': np.array(ordinals, dtype=np.int64),
+            'symbol': symbol_code, 'symbols': symbols, 'setup': setup_code, 'setups': setups,
         }
 
-    def _streaks(self):
-        mw=ml=cur=0;ct='';last=None
-        for t in self.trade_history:
-            if t['pnl']>0:
-                cur=cur+1 if last=='w' else 1;last='w';ct='win';mw=max(mw,cur)
-            else:
-                cur=cur+1 if last=='l' else 1;last='l';ct='loss';ml=max(ml,cur)
-        return mw,ml,cur,ct
-
-    def _sharpe(self, pnls):
-        if len(pnls)<2: return 0
-        avg=sum(pnls)/len(pnls)
-        std=math.sqrt(sum((p-avg)**2 for p in pnls)/(len(pnls)-1))
-        if std==0: return 0
-        return round(((avg-config.RISK_FREE_RATE/252)/std)*math.sqrt(252),2)
-
-    def _drawdown(self):
-        bal=config.BACKTEST_INITIAL_BALANCE;peak=bal;mdd=0;mddp=0
-        for t in self.trade_history:
-            bal+=t['pnl']
-            if bal>peak: peak=bal
-            dd=peak-bal;ddp=(dd/peak)*100 if peak>0 else 0
-            if dd>mdd: mdd=dd;mddp=ddp
-        return round(mdd,2),round(mddp,1)
-
-    def _monthly(self):
-        m={}
-        for t in self.trade_history:
-            k=t.get('closed_at','')[:7]
-            if not k: continue
-            if k not in m: m[k]={'pnl':0,'trades':0,'wins':0}
-            m[k]['pnl']+=t['pnl'];m[k]['trades']+=1
-            if t['pnl']>0: m[k]['wins']+=1
-        result=[]
-        for k in sorted(m.keys()):
-            d=m[k];d['month']=k;d['pnl']=round(d['pnl'],2)
-            d['win_rate']=round((d['wins']/d['trades'])*100,1) if d['trades']>0 else 0
-            result.append(d)
-        return result
+    @staticmethod
+    def _encode(values):
+        """(codes, keys) with keys in first-seen order, matching the insertion order of the per-trade path"""
+        table = {}
+        codes = np.fromiter((table.setdefault(v, len(table)) for v in values), dtype=np.int64)
+        return codes, list(table)
+
+    def _seed(self, trades):
+        """Fill the accumulators from a whole history at once; equivalent to _accumulate per trade"""
+        c = self.columns(trades); a = self._acc
+        pnl = c['pnl']; win = pnl > 0; n = len(pnl)
+        a['n'] = n; a['wins'] = int(win.sum()); a['sum'] = float(pnl.sum())
+        a['gross_profit'] = float(pnl[win].sum()); a['gross_loss'] = float(pnl[~win].sum())
+        a['max'] = float(pnl.max()); a['min'] = float(pnl.min())
+        a['mean'] = float(pnl.mean()); a['m2'] = float(((pnl - a['mean']) ** 2).sum())
+        # Drawdown: running peak of the balance, first index of the deepest drop
+        balance = config.BACKTEST_INITIAL_BALANCE + np.cumsum(pnl)
+        peak = np.maximum.accumulate(np.maximum(balance, config.BACKTEST_INITIAL_BALANCE))
+        dd = peak - balance
+        a['balance'] = float(balance[-1]); a['peak'] = float(peak[-1])
+        k = int(np.argmax(dd))
+        if dd[k] > 0:
+            a['mdd'] = float(dd[k]); a['mddp'] = float(dd[k] / peak[k] * 100) if peak[k] > 0 else 0
+        # Streaks: run lengths between win/loss flips
+        starts = np.concatenate(([0], np.flatnonzero(win[1:] != win[:-1]) + 1))
+        runs = np.diff(np.append(starts, n)); run_win = win[starts]
+        a['max_win_streak'] = int(runs[run_win].max()) if run_win.any() else 0
+        a['max_loss_streak'] = int(runs[~run_win].max()) if (~run_win).any() else 0
+        a['streak'] = int(runs[-1]); a['last'] = 'w' if win[-1] else 'l'; a['streak_type'] = 'win' if win[-1] else 'loss'
+        days = c['days']; day_of = np.array(days, dtype=object)[c['day']].tolist()
+        trade_num = range(1, n + 1)
+        self.charts.extend('equity', trade_num, np.round(balance, 2).tolist(), day_of)
+        self.charts.extend('drawdown', trade_num, np.round(dd, 2).tolist(), day_of)
+        self.cube.add_many(trades, pnl)
+        # Buckets: every calendar key is a function of the day, so group days first, then bincount
+        for d, o in zip(days, c['day_ordinals'].tolist()):
+            # ordinal 1 is a Monday, so weekday() == (o - 1) % 7
+            if d: self._week_of[d] = datetime.fromordinal(o - (o - 1) % 7).strftime('%Y-%m-%d') if o >= 0 else None
+        a['days'] = set(days) - {''}
+        self._group(a['monthly'], c['day'], [d[:7] for d in days], pnl, win)
+        self._group(a['weekly'], c['day'], [self._week_of.get(d) or '' for d in days], pnl, win)
+        for name, s in zip(c['setups'], self._stats(c['setup'], len(c['setups']), pnl, win)):
+            a['setups'][name] = {'wins': s['wins'], 'losses': s['trades'] - s['wins'], 'pnl': s['pnl']}
+        for name, s in zip(c['symbols'], self._stats(c['symbol'], len(c['symbols']), pnl, win)):
+            a['symbols'][name] = s
+        sp = c['spread']
+        if sp.any(): a['spreads'] = {'trades': int(sp.sum()), 'wins': int(win[sp].sum()), 'pnl': float(pnl[sp].sum())}
+        # Daily buckets for rolling windows
+        size = len(days)
+        cols = [np.bincount(c['day'], weights=w, minlength=size) for w in
+                (None, win, pnl, pnl * pnl, np.where(win, pnl, 0), np.where(win, 0, pnl))]
+        for i, day in enumerate(days):
+            if day: self._daily[day] = [int(cols[0][i]), int(cols[1][i])] + [float(col[i]) for col in cols[2:]]
+        self._daily_keys = sorted(self._daily)
+
+    @staticmethod
+    def _stats(codes, size, pnl, win):
+        trades = np.bincount(codes, minlength=size); wins = np.bincount(codes, weights=win, minlength=size)
+        sums = np.bincount(codes, weights=pnl, minlength=size)
+        return [{'trades': int(t), 'wins': int(w), 'pnl': float(p)} for t, w, p in zip(trades, wins, sums)]
+
+    def _group(self, buckets, day_codes, key_of_day, pnl, win):
+        """Bucket trades by a per-day key ('' = skip) via bincount"""
+        codes, keys = self._encode(key_of_day)
+        for k, s in zip(keys, self._stats(codes[day_codes], len(keys), pnl, win)):
+            if k and s['trades']: buckets[k] = s
+
+    @staticmethod
+    def _bump(buckets, key, pnl, win):
+        b = buckets.setdefault(key, {'pnl':0,'trades':0,'wins':0})
+        b['pnl'] += pnl; b['trades'] += 1; b['wins'] += win
 
-    def _weekly(self):
-        w={}
-        for t in self.trade_history:
-            dt=t.get('closed_at','')[:10]
-            if not dt: continue
-            try:
-                from datetime import datetime as DT
-                d = DT.strptime(dt, '%Y-%m-%d')
-                # Get Monday of that week
-                monday = d - __import__('datetime').timedelta(days=d.weekday())
-                wk = monday.strftime('%Y-%m-%d')
-            except: continue
-            if wk not in w: w[wk]={'pnl':0,'trades':0,'wins':0}
-            w[wk]['pnl']+=t['pnl'];w[wk]['trades']+=1
-            if t['pnl']>0: w[wk]['wins']+=1
-        result=[]
-        for k in sorted(w.keys()):
-            d=w[k];d['week']=k;d['pnl']=round(d['pnl'],2)
-            d['win_rate']=round((d['wins']/d['trades'])*100,1) if d['trades']>0 else 0
-            result.append(d)
+    @staticmethod
+    def _buckets(buckets, label):
+        result = []
+        for k in sorted(buckets):
+            d = buckets[k]
+            result.append({'pnl':round(d['pnl'],2),'trades':d['trades'],'wins':d['wins'],label:k,
+                           'win_rate':round((d['wins']/d['trades'])*100,1) if d['trades']>0 else 0})
         return result
 
-    def _days_trading(self):
-        dates = set()
-        for t in self.trade_history:
-            dt = t.get('closed_at','')[:10]
-            if dt: dates.add(dt)
-        return len(dates)
-
-    def _equity(self):
-        curve=[];bal=config.BACKTEST_INITIAL_BALANCE
-        for i,t in enumerate(self.trade_history):
-            bal+=t['pnl']
-            curve.append({'trade_num':i+1,'balance':round(bal,2),'date':t.get('closed_at','')[:10]})
-        return curve
-
-    def _ss(self, trades, name):
-        if not trades: return {'name':name,'trades':0,'win_rate':0,'pnl':0}
-        w=sum(1 for t in trades if t['pnl']>0)
-        return {'name':name,'trades':len(trades),'wins':w,
-                'win_rate':round((w/len(trades))*100,1),'pnl':round(sum(t['pnl'] for t in trades),2)}
+    def _sharpe(self):
+        a = self._acc
+        if a['n'] < 2: return 0
+        return self._sharpe_ratio(a['mean'], math.sqrt(a['m2'] / (a['n'] - 1)))
+
+    @staticmethod
+    def _sharpe_ratio(mean, std):
+        if std <= 0: return 0
+        return round(((mean-config.RISK_FREE_RATE/252)/std)*math.sqrt(252),2)
+
+    # ========== ATTRIBUTION ==========
+
+    def query(self, group_by=(), filters=None, sort='pnl', limit=None):
+        """P&L attribution by any of symbol, sector, spread_type, close_reason, month (see attribution.py)"""
+        return self.cube.query(group_by, filters, sort, limit)
+
+    # ========== CHART SERIES ==========
+
+    def get_series(self, name='equity', points=None, method='minmax'):
+        """Downsampled chart series: equity (balance per trade), drawdown (below peak, per trade)
+        or daily_pnl (per trading day). points should match the chart's pixel width."""
+        if name != 'daily_pnl': return self.charts.get(name, points, method)
+        points = max(3, min(int(points or config.CHART_REPORT_POINTS), config.CHART_MAX_POINTS))
+        with self._lock:
+            keys = list(self._daily_keys); pnl = [round(self._daily[d][2], 2) for d in keys]
+        idx = downsample(range(len(keys)), pnl, points, method).tolist() if keys else []
+        return {'name': name, 'total': len(keys), 'points': len(idx),
+                'x': [keys[i] for i in idx], 'y': [pnl[i] for i in idx], 'label': [keys[i] for i in idx]}
+
+    def _equity_curve(self):
+        s = self.charts.get('equity', config.CHART_REPORT_POINTS)
+        return [{'trade_num': x, 'balance': y, 'date': d} for x, y, d in zip(s['x'], s['y'], s['label'])]
+
+    # ========== ROLLING WINDOWS ==========
+
+    def get_rolling(self, windows=(30, 90, 365), end=None):
+        """Metrics over the last N calendar days (ending `end`, default today) for each N in `windows`
+
+        Sums come from prefix totals over the daily buckets, so a window costs two bisects;
+        drawdown walks the window's daily closing equity.
+        """
+        end = (end or datetime.now().strftime('%Y-%m-%d'))[:10]
+        end_d = datetime.strptime(end, '%Y-%m-%d')
+        out = {}
+        with self._lock:
+            self._build_prefix()
+            keys, prefix = self._daily_keys, self._prefix
+            for w in windows:
+                w = int(w)
+                start = (end_d - timedelta(days=max(w, 1) - 1)).strftime('%Y-%m-%d')
+                i = bisect.bisect_left(keys, start); j = bisect.bisect_right(keys, end)
+                n, wins, pnl, sq, gp, gl = (hi - lo for hi, lo in zip(prefix[j], prefix[i]))
+                out[str(w)] = self._window_report(start, end, i, j, n, wins, pnl, sq, gp, gl)
+        return {'end': end, 'windows': out}
+
+    def _window_report(self, start, end, i, j, n, wins, pnl, sq, gp, gl):
+        mean = pnl / n if n else 0
+        std = math.sqrt(max(sq - n * mean * mean, 0) / (n - 1)) if n > 1 else 0
+        # Drawdown on daily closing equity, starting from the balance before the window
+        balance = config.BACKTEST_INITIAL_BALANCE + self._prefix[i][2]
+        peak, mdd, mddp = balance, 0, 0
+        for k in range(i, j):
+            balance = config.BACKTEST_INITIAL_BALANCE + self._prefix[k + 1][2]
+            if balance > peak: peak = balance
+            dd = peak - balance
+            if dd > mdd: mdd = dd; mddp = (dd / peak) * 100 if peak > 0 else 0
+        return {
+            'start': start, 'end': end, 'trades': n, 'wins': wins, 'losses': n - wins, 'days_traded': j - i,
+            'win_rate': round((wins / n) * 100, 1) if n else 0, 'total_pnl': round(pnl, 2),
+            'gross_profit': round(gp, 2), 'gross_loss': round(abs(gl), 2),
+            'profit_factor': round(gp / abs(gl), 2) if gl < 0 else (999 if gp > 0 else 0),
+            'expectancy': round(mean, 2), 'sharpe_ratio': self._sharpe_ratio(mean, std) if n > 1 else 0,
+            'max_drawdown': round(mdd, 2), 'max_drawdown_pct': round(mddp, 1),
+        }
+
+    def _add_daily(self, day, pnl, win):
+        d = self._daily.get(day)
+        if d is None:
+            d = self._daily[day] = [0, 0, 0.0, 0.0, 0.0, 0.0]
+            k = bisect.bisect_left(self._daily_keys, day)
+            self._daily_keys.insert(k, day)
+        else:
+            k = bisect.bisect_left(self._daily_keys, day)
+        d[0] += 1; d[1] += win; d[2] += pnl; d[3] += pnl * pnl
+        if win: d[4] += pnl
+        else: d[5] += pnl
+        # Trades close in date order, so normally only the last prefix row is invalidated
+        self._prefix_valid = min(self._prefix_valid, k)
+
+    def _build_prefix(self):
+        keys, prefix = self._daily_keys, self._prefix
+        del prefix[self._prefix_valid + 1:]
+        for day in keys[self._prefix_valid:]:
+            prefix.append(tuple(p + v for p, v in zip(prefix[-1], self._daily[day])))
+        self._prefix_valid = len(keys)
 
     def _empty_report(self):
         return {
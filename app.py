@@ -1,173 +1,328 @@
 """PROJECT HOPE v3.0 FINAL - Web Server"""
-from flask import Flask, send_file, jsonify, request, Response
-from engine import TradingEngine
-import threading, os
+from flask import Flask, jsonify, request, Response
+import csv, io, json, os, threading
+from datetime import datetime
+import config
+from storage import TRADE_CSV_HEADER, trade_csv_row
+from attribution import DIMENSIONS
+from static_assets import StaticAssets, JSONCompressor
+from engine_bridge import UnknownAccount
 
 app = Flask(__name__)
-engine = TradingEngine()
-engine.start()
+hub = None  # created by create_hub() in the serving process, never at import
+_hub_lock = threading.Lock()
+
+def create_hub():
+    """This process's engine hub, built on first call (gunicorn's post_worker_init, `python app.py`,
+    or the first request): remote = a client for `python engine_bridge.py`, else in-process engines"""
+    global hub
+    if hub is None:
+        with _hub_lock:
+            if hub is None:
+                if config.ENGINE_MODE == 'remote':
+                    # Engines run in their own process; workers are stateless
+                    from engine_bridge import EngineClient
+                    hub = EngineClient()
+                else:
+                    from accounts import MultiAccountEngine
+                    engines = MultiAccountEngine()
+                    engines.start()
+                    hub = engines
+    return hub
+
+def get_engine():
+    """Engine for the account named by ?account= or X-Hope-Account; default account otherwise"""
+    return create_hub().get(request.args.get('account') or request.headers.get('X-Hope-Account'))
+
+# Pages are read and compressed once at startup
+assets = StaticAssets(files=['landing.html', 'legal.html', 'pre-trade.html', 'index.html'])
+compress_json = JSONCompressor()
+
+@app.after_request
+def compress(response): return compress_json(response, request)
+
+@app.errorhandler(ConnectionError)
+def engine_unavailable(e): return jsonify({'error': str(e)}), 503
+
+@app.errorhandler(UnknownAccount)
+def unknown_account(e): return jsonify({'error': str(e)}), 404
 
 @app.route('/')
-def landing(): return send_file('landing.html')
+def landing(): return assets.response('landing.html', request)
 
 @app.route('/legal')
-def legal(): return send_file('legal.html')
+def legal(): return assets.response('legal.html', request)
 
 @app.route('/pre-trade')
-def pre_trade(): return send_file('pre-trade.html')
+def pre_trade(): return assets.response('pre-trade.html', request)
 
 @app.route('/dashboard')
-def dashboard_page(): return send_file('index.html')
+def dashboard_page(): return assets.response('index.html', request)
 
 @app.route('/api/dashboard')
-def dashboard(): return jsonify(engine.get_dashboard_data())
+def dashboard():
+    # Pre-serialized by the engine's snapshot producers; 304 when the client's copy is current
+    version, etag, body = get_engine().dashboard_snapshot()
+    resp = Response(body, mimetype='application/json')
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'no-cache'
+    resp.headers['X-Snapshot-Version'] = str(version)
+    return resp.make_conditional(request)
+
+stream_slots = threading.BoundedSemaphore(config.STREAM_MAX_PER_WORKER)
+
+@app.route('/api/stream')
+def stream():
+    """Server-Sent Events: one event per dashboard section, sent only when that section changes"""
+    eng = get_engine()
+    # A stream holds its thread for the tab's lifetime; past the cap the client polls /api/dashboard instead
+    if not stream_slots.acquire(blocking=False):
+        return Response('stream limit reached', status=503, headers={'Retry-After': '60'})
+    try: since = int(request.headers.get('Last-Event-ID') or request.args.get('since') or 0)
+    except ValueError: since = 0
+    def events(version):
+        yield 'retry: 5000\n\n'
+        while True:
+            version, sections = eng.dashboard_changes(version, config.STREAM_HEARTBEAT)
+            if not sections:
+                yield ': ping\n\n'
+                continue
+            for name, data in sections.items():
+                yield f'id: {version}\nevent: {name}\ndata: {data}\n\n'
+    resp = Response(events(since), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    resp.call_on_close(stream_slots.release)
+    return resp
+
+@app.route('/api/accounts')
+def accounts_list(): return jsonify({'accounts': create_hub().list_accounts(), 'market_data': create_hub().get_market_stats()})
 
 @app.route('/api/autopilot', methods=['POST'])
-def toggle_ap(): return jsonify({'autopilot': engine.toggle_autopilot()})
+def toggle_ap(): return jsonify({'autopilot': get_engine().toggle_autopilot()})
 
 @app.route('/api/overnight', methods=['POST'])
-def toggle_overnight(): return jsonify({'overnight_hold': engine.toggle_overnight()})
+def toggle_overnight(): return jsonify({'overnight_hold': get_engine().toggle_overnight()})
 
 @app.route('/api/theme', methods=['POST'])
 def set_theme():
     d = request.json or {}
-    engine.set_theme(d.get('theme', 'dark'))
-    return jsonify({'theme': engine.state['theme']})
+    get_engine().set_theme(d.get('theme', 'dark'))
+    return jsonify({'theme': get_engine().get_state_value('theme')})
 
 @app.route('/api/close', methods=['POST'])
 def close_pos():
     d = request.json or {}
-    r = engine.position_manager.manual_close_position(d.get('trade_id'), d.get('trade_type','spread'))
-    engine.storage.save_state(engine.state)
+    r = get_engine().close_position(d.get('trade_id'), d.get('trade_type','spread'))
     return jsonify({'success': r})
 
 @app.route('/api/override', methods=['POST'])
 def toggle_ovr():
     d = request.json or {}
-    r = engine.position_manager.toggle_manual_override(d.get('trade_id'), d.get('trade_type','spread'))
+    r = get_engine().toggle_override(d.get('trade_id'), d.get('trade_type','spread'))
     return jsonify({'manual_override': r})
 
 @app.route('/api/close-all', methods=['POST'])
-def close_all():
-    c = 0
-    for s in engine.state['credit_spreads']:
-        if s['status'] == 'open': engine.position_manager.manual_close_position(s['order_id'],'spread'); c += 1
-
-    engine.storage.save_state(engine.state)
-    return jsonify({'closed': c})
+def close_all(): return jsonify({'closed': get_engine().close_all()})
 
 @app.route('/api/reset-breaker', methods=['POST'])
-def reset_breaker():
-    engine.state['consecutive_losses'] = 0
-    engine._log('system', 'Loss breaker reset')
-    return jsonify({'success': True})
+def reset_breaker(): return jsonify({'success': get_engine().reset_breaker()})
 
 @app.route('/api/backtest', methods=['POST'])
 def run_backtest():
     d = request.json or {}
     symbol = d.get('symbol', 'SPY')
     days = min(d.get('days', 365), 730)
-    if engine.state.get('backtest_running'): return jsonify({'error': 'Already running'})
-    threading.Thread(target=engine.run_backtest, args=(symbol, days), daemon=True).start()
-    return jsonify({'status': 'started', 'symbol': symbol, 'days': days})
+    model = d.get('model') if d.get('model') in ('path', 'portfolio', 'archive') else 'simple'
+    robust = bool(d.get('robust', True))
+    engine = get_engine()
+    job = engine.start_backtest(symbol, days, model, robust)
+    # Cached results come back within the short wait; anything else is polled via /api/backtest/results?job=
+    job = engine.get_backtest_status(job['id'], wait=0.25)
+    return jsonify({'status': 'done' if job['status'] == 'done' else 'started', 'job_id': job['id'], 'job': job,
+                    'symbol': symbol, 'days': days, 'model': model, 'robust': robust})
 
 @app.route('/api/backtest/results')
 def backtest_results():
-    return jsonify({'results': engine.state.get('backtest_results'), 'running': engine.state.get('backtest_running', False)})
+    job_id = request.args.get('job')
+    if not job_id: return jsonify(get_engine().get_backtest_status())
+    try: wait = float(request.args.get('wait', 0))
+    except ValueError: return jsonify({'error': 'wait must be a number'}), 400
+    job = get_engine().get_backtest_status(job_id, wait)
+    return (jsonify(job), 200) if job else (jsonify({'error': f'Unknown job {job_id}'}), 404)
+
+@app.route('/api/backtest/cancel', methods=['POST'])
+def cancel_backtest():
+    d = request.json or {}
+    return jsonify({'cancelled': get_engine().cancel_backtest(d.get('job_id', ''))})
+
+@app.route('/api/backtest/sweep', methods=['POST'])
+def run_sweep():
+    d = request.json or {}
+    symbols = d.get('symbols') or ['SPY', 'QQQ', 'IWM']
+    days = min(int(d.get('days', 365)), 730)
+    try:
+        started = get_engine().start_sweep(symbols[:50], days, d.get('space'), d.get('mode', 'grid'),
+                                           d.get('samples'), d.get('rank_by', 'sharpe'))
+    except (ValueError, RuntimeError) as e: return jsonify({'error': str(e)}), 400
+    if not started: return jsonify({'error': 'Already running'})
+    return jsonify({'status': 'started', 'symbols': symbols[:50], 'days': days})
+
+@app.route('/api/backtest/sweep/results')
+def sweep_results(): return jsonify(get_engine().get_sweep_status())
 
 @app.route('/api/screener')
-def screener_data(): return jsonify(engine.state.get('screener_results', {}))
+def screener_data(): return jsonify(get_engine().get_state_value('screener_results', {}))
 
 @app.route('/api/analytics')
-def analytics_data(): return jsonify(engine.analytics.get_full_report())
+def analytics_data(): return jsonify(get_engine().analytics.get_full_report())
+
+@app.route('/api/analytics/series')
+def analytics_series():
+    name = request.args.get('name', 'equity')
+    if name not in ('equity', 'drawdown', 'daily_pnl'): return jsonify({'error': 'name must be equity, drawdown or daily_pnl'}), 400
+    method = 'lttb' if request.args.get('method') == 'lttb' else 'minmax'
+    return jsonify(get_engine().analytics.get_series(name, request.args.get('points', type=int), method))
+
+@app.route('/api/analytics/query')
+def analytics_query():
+    # ?group_by=sector,month&filter=symbol:SPY|QQQ,close_reason:STOP LOSS&sort=pnl&limit=20
+    a = request.args
+    group_by = [d.strip() for d in a.get('group_by', '').split(',') if d.strip()]
+    filters = {}
+    for part in a.get('filter', '').split(','):
+        if ':' in part:
+            dim, values = part.split(':', 1)
+            filters[dim.strip()] = [v.strip() for v in values.split('|')]
+    bad = [d for d in group_by + list(filters) if d not in DIMENSIONS]
+    if bad: return jsonify({'error': f"unknown dimension(s) {', '.join(bad)}; use {', '.join(DIMENSIONS)}"}), 400
+    return jsonify(get_engine().analytics.query(group_by, filters, a.get('sort', 'pnl'), a.get('limit', type=int)))
+
+@app.route('/api/analytics/rolling')
+def analytics_rolling():
+    end = request.args.get('end') or None
+    try:
+        windows = [max(1, min(int(w), 3650)) for w in request.args.get('windows', '30,90,365').split(',') if w.strip()]
+        if end: datetime.strptime(end, '%Y-%m-%d')
+    except ValueError: return jsonify({'error': 'windows must be comma-separated day counts, end YYYY-MM-DD'}), 400
+    return jsonify(get_engine().analytics.get_rolling(windows[:10] or [30], end))
 
 @app.route('/api/greeks')
-def greeks_data(): return jsonify(engine.state.get('portfolio_greeks', {}))
+def greeks_data(): return jsonify(get_engine().get_state_value('portfolio_greeks', {}))
 
 @app.route('/api/storage')
-def storage_stats(): return jsonify(engine.storage.get_storage_stats())
+def storage_stats(): return jsonify(get_engine().storage.get_storage_stats())
 
 @app.route('/api/storage/save', methods=['POST'])
-def force_save():
-    engine.storage.save_state(engine.state)
-    return jsonify({'saved': True})
+def force_save(): return jsonify({'saved': get_engine().save_state()})
+
+def _trade_filters():
+    a = request.args
+    return {'start': a.get('start') or None, 'end': a.get('end') or None,
+            'symbol': a.get('symbol') or None, 'close_reason': a.get('reason') or None}
+
+def _iter_trades(eng, filters, chunk=500):
+    # Pages through query_trades so it streams the same way in embedded and remote mode
+    cursor = 0
+    while cursor is not None:
+        page = eng.storage.query_trades(cursor=cursor, limit=chunk, order='asc', **filters)
+        yield from page['trades']
+        cursor = page['next_cursor']
 
 @app.route('/api/trade-history')
 def trade_history():
-    h = engine.storage.load_trade_history()
-    return jsonify({'total': len(h), 'trades': h[-100:]})
+    a = request.args
+    cursor = a.get('cursor', type=int)
+    limit = max(1, min(a.get('limit', 100, type=int), 1000))
+    order = 'asc' if a.get('order') == 'asc' else 'desc'
+    return jsonify(get_engine().storage.query_trades(cursor=cursor, limit=limit, order=order, **_trade_filters()))
+
+@app.route('/api/symbol-stats')
+def symbol_stats(): return jsonify(get_engine().storage.symbol_stats(request.args.get('symbol') or None))
 
 @app.route('/api/daily-logs')
-def daily_logs(): return jsonify(engine.storage.load_daily_logs())
+def daily_logs(): return jsonify(get_engine().storage.load_daily_logs())
 
 # === NEW ENDPOINTS ===
 
 @app.route('/api/earnings')
-def earnings_data(): return jsonify(engine.earnings.get_data())
+def earnings_data(): return jsonify(get_engine().earnings.get_data())
 
 @app.route('/api/earnings/add', methods=['POST'])
 def add_earnings():
     d = request.json or {}
-    engine.earnings.add_manual_earnings(d.get('symbol',''), d.get('date',''), d.get('timing',''))
+    get_engine().earnings.add_manual_earnings(d.get('symbol',''), d.get('date',''), d.get('timing',''))
     return jsonify({'success': True})
 
 @app.route('/api/iv-rank')
-def iv_rank_data(): return jsonify(engine.iv_rank.get_data())
+def iv_rank_data(): return jsonify(get_engine().iv_rank.get_data())
 
 @app.route('/api/iv-rank/top')
-def iv_rank_top(): return jsonify(engine.iv_rank.get_top_iv_symbols(20))
+def iv_rank_top(): return jsonify(get_engine().iv_rank.get_top_iv_symbols(20))
 
 @app.route('/api/risk')
-def risk_data(): return jsonify(engine.risk.stress_test(engine.state))
+def risk_data(): return jsonify(get_engine().get_risk())
 
 @app.route('/api/risk/correlations')
-def correlations():
-    open_syms = [s['symbol'] for s in engine.state['credit_spreads'] if s['status'] in ['open','pending']]
-    if not open_syms: open_syms = ['SPY','QQQ','AAPL','MSFT','NVDA']
-    return jsonify(engine.risk.calculate_correlations(list(set(open_syms))))
+def correlations(): return jsonify(get_engine().get_correlations())
 
 @app.route('/api/risk/heatmap')
-def heatmap(): return jsonify(engine.risk.get_sector_heatmap())
+def heatmap(): return jsonify(get_engine().risk.get_sector_heatmap())
 
 @app.route('/api/journal')
-def journal_data(): return jsonify(engine.journal.get_data())
+def journal_data(): return jsonify(get_engine().journal.get_data())
 
 @app.route('/api/journal/add', methods=['POST'])
 def journal_add():
     d = request.json or {}
-    entry = engine.journal.add_entry(d)
+    entry = get_engine().journal.add_entry(d)
     return jsonify(entry)
 
 @app.route('/api/journal/update', methods=['POST'])
 def journal_update():
     d = request.json or {}
-    entry = engine.journal.update_entry(d.get('id'), d)
+    entry = get_engine().journal.update_entry(d.get('id'), d)
     return jsonify(entry or {'error': 'Not found'})
 
 @app.route('/api/calendar')
-def calendar_data(): return jsonify(engine.econ_cal.get_data())
+def calendar_data(): return jsonify(get_engine().econ_cal.get_data())
 
 @app.route('/api/export/csv')
 def export_csv():
-    csv_data = engine.export_trades_csv()
-    return Response(csv_data, mimetype='text/csv',
+    eng = get_engine(); filters = _trade_filters()
+    def rows():
+        buf = io.StringIO(); writer = csv.writer(buf)
+        writer.writerow(TRADE_CSV_HEADER)
+        for t in _iter_trades(eng, filters):
+            writer.writerow(trade_csv_row(t))
+            if buf.tell() > 16384:
+                yield buf.getvalue(); buf.seek(0); buf.truncate()
+        yield buf.getvalue()
+    return Response(rows(), mimetype='text/csv',
                     headers={'Content-Disposition': 'attachment;filename=project_hope_trades.csv'})
 
+@app.route('/api/export/ndjson')
+def export_ndjson():
+    eng = get_engine(); filters = _trade_filters()
+    def lines():
+        for t in _iter_trades(eng, filters): yield json.dumps(t, default=str) + '\n'
+    return Response(lines(), mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': 'attachment;filename=project_hope_trades.ndjson'})
+
 
 @app.route('/api/agreement', methods=['POST'])
 def save_agreement():
     d = request.json or {}
     d['ip'] = request.remote_addr
-    success = engine.storage.save_agreement(d)
+    success = get_engine().storage.save_agreement(d)
     return jsonify({'saved': success})
 
 @app.route('/api/agreements')
 def list_agreements():
-    records = engine.storage.load_agreements()
-    q = request.args.get('search','').lower()
-    if q:
-        records = [r for r in records if q in r.get('name','').lower() or q in r.get('email','').lower() or q in r.get('ip','').lower()]
+    q = request.args.get('search','')
+    storage = get_engine().storage
+    records = storage.search_agreements(q) if q else storage.load_agreements()
     return jsonify({'total': len(records), 'records': records})
 
 if __name__ == '__main__':
+    create_hub()
     app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
@@ -0,0 +1,251 @@
+"""
+PROJECT HOPE v3.0 - Archive Backtester
+Replays the live CreditSpreadScanner, Protections and PositionManager against option
+chains recorded in the ChainArchive instead of modelled prices.
+
+ArchiveMarketAPI answers the market calls those classes make (expirations, quotes,
+chains, history) from the archive as of a simulated time, and fills orders there:
+entries at short bid - long ask (the scanner's own credit), exits at short ask -
+long bid (PositionManager's debit). Snapshots are read through ChainArchive's
+memory-mapped readers one at a time, and the archive keeps parsed headers for a bounded
+number of recent files (CHAIN_INDEX_CACHE_FILES), so a long replay holds the current
+day's chains and index, not the whole archive's.
+"""
+import re, time
+from datetime import datetime, timedelta
+import config
+from chain_archive import ChainArchive
+from credit_spread_scanner import CreditSpreadScanner
+from position_manager import PositionManager
+from protections import Protections
+from robustness import analyze
+
+OCC = re.compile(r'^([A-Z.]+?)(\d{6})([PC])(\d{8})$')
+SCAN_MINUTE = 600   # 10:00 AM: entries scan against snapshots recorded up to then
+CHECK_MINUTE = 955  # 3:55 PM: exits are checked against the day's latest snapshots
+
+
+def parse_occ(symbol):
+    """'SPY250117P00450000' -> ('SPY', '2025-01-17', 'put', 450.0), or None"""
+    m = OCC.match(symbol or '')
+    if not m: return None
+    root, ymd, cp, strike = m.groups()
+    return root, f"20{ymd[:2]}-{ymd[2:4]}-{ymd[4:]}", 'put' if cp == 'P' else 'call', int(strike) / 1000
+
+
+class _QuietAlerts:
+    def send(self, message): return False
+
+
+class ArchiveMarketAPI:
+    """Market reads from the chain archive as of `now`; orders fill at archived quotes"""
+
+    def __init__(self, archive, history_api=None):
+        self.archive = archive
+        self.history_api = history_api  # optional daily bars source for the scanner's trend filter
+        self.set_time(datetime(2000, 1, 1))
+        self.orders = 0
+        self._quotes = {}   # option symbol -> (bid, ask), for the current time only
+        self._history = {}  # symbol -> daily bars (history_api) or {day: underlying} (archive)
+
+    def set_time(self, now):
+        """now: naive US/Eastern datetime, the clock Protections and PositionManager see"""
+        self.now = now; self._quotes = {}
+        try:
+            import pytz; self.ts = pytz.timezone('US/Eastern').localize(now).timestamp()
+        except: self.ts = now.timestamp()
+
+    @property
+    def day(self):
+        return self.now.strftime('%Y-%m-%d')
+
+    # ========== MARKET READS ==========
+
+    def get_option_expirations(self, symbol):
+        ts = self.ts
+        return sorted({s['expiration'] for s in self.archive.snapshots(symbol, self.day) if s['ts'] <= ts})
+
+    def find_expiration_in_range(self, symbol, min_dte, max_dte):
+        today = self.now.date()
+        for exp_str in self.get_option_expirations(symbol):
+            try:
+                dte = (datetime.strptime(exp_str, '%Y-%m-%d').date() - today).days
+                if min_dte <= dte <= max_dte: return exp_str, dte
+            except: continue
+        return None, None
+
+    def get_option_chain(self, symbol, expiration):
+        snap = self.archive.snapshot_at(symbol, expiration, self.ts)
+        return ChainArchive.to_chain(snap) if snap else []
+
+    def get_quote(self, symbol):
+        return self.get_quotes([symbol]).get(symbol)
+
+    def get_quotes(self, symbols):
+        out = {}
+        for sym in symbols:
+            occ = parse_occ(sym)
+            if occ:
+                q = self._option_quote(sym, occ)
+                if q: out[sym] = {'symbol': sym, 'bid': q[0], 'ask': q[1]}
+            else:
+                last = self._underlying(sym)
+                if last: out[sym] = {'symbol': sym, 'last': last}
+        return out
+
+    def get_quotes_batch(self, symbols):
+        return self.get_quotes(symbols)
+
+    def get_vix(self):
+        q = self.get_quote('VIX')
+        return q.get('last', 20) if q else 20
+
+    def get_history(self, symbol, days=365):
+        """Daily bars up to and including the simulated day"""
+        if self.history_api:
+            bars = self._history.get(symbol)
+            if bars is None:
+                try: bars = self._history[symbol] = self.history_api.get_history(symbol, 730) or []
+                except Exception: bars = self._history[symbol] = []
+            bars = [b for b in bars if b.get('date', '') <= self.day]
+        else:
+            # Underlying price stamped on each day's last archived snapshot
+            known = self._history.setdefault(symbol, {})
+            bars = []
+            for i in range(days, -1, -1):
+                d = (self.now - timedelta(days=i)).strftime('%Y-%m-%d')
+                if d == self.day: close = self._underlying(symbol)  # today's moves with the clock
+                else:
+                    if d not in known:
+                        heads = [h for h in self.archive.snapshots(symbol, d) if h.get('underlying')]
+                        known[d] = heads[-1]['underlying'] if heads else None
+                    close = known[d]
+                if close: bars.append({'date': d, 'close': close})
+        return bars[-days:]
+
+    # ========== ORDERS ==========
+
+    def place_credit_spread(self, symbol, short_symbol, long_symbol, qty, credit):
+        self.orders += 1
+        return {'order': {'id': f'bt-{self.orders}', 'status': 'filled'}}
+
+    def close_credit_spread(self, symbol, short_symbol, long_symbol, qty, debit):
+        self.orders += 1
+        return {'order': {'id': f'bt-{self.orders}', 'status': 'filled'}}
+
+    # ========== INTERNAL ==========
+
+    def _option_quote(self, sym, occ):
+        if sym not in self._quotes:
+            root, exp, _, strike = occ
+            # Only the strike rows are decompressed; both legs of a spread share the cache
+            snap = self.archive.snapshot_at(root, exp, self.ts, columns=('bid', 'ask'), strikes=(strike, strike))
+            for i, s in enumerate(snap['symbol'] if snap else []):
+                self._quotes[s] = (float(snap['bid'][i]), float(snap['ask'][i]))
+            self._quotes.setdefault(sym, None)
+        q = self._quotes[sym]
+        return q if q and q[0] == q[0] and q[1] == q[1] else None  # NaN: quote missing in the snapshot
+
+    def _underlying(self, symbol):
+        ts = self.ts
+        heads = [h for h in self.archive.snapshots(symbol, self.day) if h['ts'] <= ts and h.get('underlying')]
+        if heads: return heads[-1]['underlying']
+        bars = self.get_history(symbol, 10) if self.history_api else []
+        return bars[-1].get('close') if bars else None
+
+
+class ArchiveBacktester:
+    def __init__(self, archive=None, history_api=None, tier=None):
+        self.archive = archive or ChainArchive()
+        self.history_api = history_api
+        self.tier = tier or config.ACTIVE_TIER
+
+    def run(self, symbols=None, start=None, end=None, robust=False, progress=None):
+        """Replay every archived day in [start, end] through the live selection and exit logic
+
+        progress(fraction, message) is called once per day; it may raise to cancel.
+        """
+        t0 = time.time()
+        days = [d for d in self.archive.days() if (not start or d >= start) and (not end or d <= end)]
+        if not days: return {'error': 'No archived chains in range', 'archive': self.archive.root}
+        api = ArchiveMarketAPI(self.archive, self.history_api)
+        state = {'credit_spreads': [], 'cs_trades_today': 0, 'daily_pnl': 0, 'consecutive_losses': 0,
+                 'last_trade_time': None, 'vix': 20, 'wins': 0, 'losses': 0, 'total_pnl': 0, 'activity_log': []}
+        clock = lambda: api.now
+        scanner = CreditSpreadScanner(api, state)
+        prot = Protections(api, state, clock=clock)
+        pm = PositionManager(api, state, _QuietAlerts(), clock=clock)
+        wanted = set(symbols or ())
+        scan = lambda: [o for o in scanner.scan() if not wanted or o['symbol'] in wanted]
+        balance = peak = config.BACKTEST_INITIAL_BALANCE
+        max_dd = 0; blocked = {}; equity = []; scans = 0
+
+        for i, day in enumerate(days):
+            if progress: progress(i / len(days), f'Replaying {day}')
+            d = datetime.strptime(day, '%Y-%m-%d')
+            state.update({'cs_trades_today': 0, 'daily_pnl': 0, 'consecutive_losses': 0})
+            # ========== MORNING EXITS, THEN ENTRIES ==========
+            api.set_time(d + timedelta(minutes=SCAN_MINUTE))
+            self._check_exits(api, pm, state, day)
+            state['vix'] = api.get_vix()
+            while True:
+                if len([s for s in state['credit_spreads'] if s['status'] == 'open']) >= self.tier['max_positions']:
+                    ok, reason = False, 'Tier max positions'
+                else:
+                    ok, reason = prot.check_all('spread')
+                if not ok:
+                    blocked[reason.split(':')[0]] = blocked.get(reason.split(':')[0], 0) + 1
+                    if not reason.startswith('Cooldown'): break
+                    api.set_time(api.now + timedelta(seconds=config.SPREAD_SCAN_INTERVAL)); continue
+                scans += 1
+                opps = [o for o in scan() if prot.check_sector_limit(o['symbol'])[0]
+                        and o.get('width', config.CS_SPREAD_WIDTH) <= self.tier['max_spread_width']]
+                if not opps: break
+                rec = scanner.execute_spread(opps[0])
+                if not rec: break
+                rec.update({'status': 'open', 'opened_at': api.now.isoformat()})
+                state['last_trade_time'] = api.now
+            # ========== CLOSING EXITS ==========
+            api.set_time(d + timedelta(minutes=CHECK_MINUTE))
+            self._check_exits(api, pm, state, day)
+            balance = config.BACKTEST_INITIAL_BALANCE + state['total_pnl']
+            if balance > peak: peak = balance
+            dd = (peak - balance) / peak * 100 if peak > 0 else 0
+            if dd > max_dd: max_dd = dd
+            equity.append({'date': day, 'balance': round(balance, 2)})
+
+        closed = [s for s in state['credit_spreads'] if s['status'] in ('closed', 'rolled')]
+        wins = sum(1 for s in closed if s.get('current_profit', 0) > 0)
+        reasons = {}
+        for s in closed:
+            r = (s.get('close_reason') or '').split(' (')[0]; reasons[r] = reasons.get(r, 0) + 1
+        print(f"[ABT] {len(days)} archived days, {scans} scans, {len(closed)} trades in {time.time() - t0:.1f}s")
+        return {
+            'model': 'archive', 'start': days[0], 'end': days[-1], 'days': len(days),
+            'total_trades': len(closed), 'open_at_end': len(state['credit_spreads']) - len(closed),
+            'wins': wins, 'losses': len(closed) - wins,
+            'win_rate': round(wins / len(closed) * 100, 1) if closed else 0,
+            'total_pnl': round(balance - config.BACKTEST_INITIAL_BALANCE, 2),
+            'total_return': round((balance - config.BACKTEST_INITIAL_BALANCE) / config.BACKTEST_INITIAL_BALANCE * 100, 1),
+            'final_balance': round(balance, 2), 'max_dd': round(max_dd, 1), 'exit_reasons': reasons,
+            'blocked': dict(sorted(blocked.items(), key=lambda kv: -kv[1])),
+            'equity_curve': equity, 'trades': closed[-30:], 'elapsed': round(time.time() - t0, 2),
+            'robustness': analyze([s['current_profit'] * s['contracts'] * 100 for s in closed]) if robust else None,
+        }
+
+    def _check_exits(self, api, pm, state, day):
+        before = state['total_pnl']
+        pm.check_all_positions()
+        for s in state['credit_spreads']:
+            if s['status'] == 'open' and s['expiration'] < day: self._settle(api, pm, s)
+        state['daily_pnl'] += state['total_pnl'] - before
+
+    @staticmethod
+    def _settle(api, pm, s):
+        """Spread past expiration with no archived quotes to exit on: settle at intrinsic"""
+        last = api._underlying(s['symbol']) or s.get('stock_price', 0)
+        width = abs(s['short_strike'] - s['long_strike'])
+        itm = s['short_strike'] - last if s.get('type') == 'put_credit_spread' else last - s['short_strike']
+        s['current_debit'] = round(max(0, min(itm, width)), 2)
+        s['current_profit'] = round(s['credit'] - s['current_debit'], 2)
+        pm._close_spread(s, 'EXPIRED')
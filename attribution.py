@@ -0,0 +1,89 @@
+"""
+PROJECT HOPE v3.0 - P&L Attribution Cube
+Closed trades are aggregated into cells keyed by
+symbol x sector x spread type x close reason x month as they are recorded.
+Group-by queries roll the matching cells up, so their cost depends on the number
+of distinct cells, not on how many trades have been taken.
+"""
+import threading
+import numpy as np
+import config
+
+DIMENSIONS = ('symbol', 'sector', 'spread_type', 'close_reason', 'month')
+# Cell columns: trades, wins, pnl, gross profit, gross loss
+_TRADES, _WINS, _PNL, _GP, _GL = range(5)
+
+
+def close_reason_key(reason):
+    """'TAKE PROFIT (52.1%)' -> 'TAKE PROFIT': drop the per-trade detail so reasons group"""
+    return (reason or '').split(' (')[0].strip() or 'unknown'
+
+
+class AttributionCube:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cells = {}  # (symbol, sector, spread_type, close_reason, month) -> [trades, wins, pnl, gp, gl]
+
+    @staticmethod
+    def key(t):
+        symbol = t.get('symbol', '') or 'unknown'
+        return (symbol, config.SECTOR_MAP.get(symbol, 'Other'), t.get('type', '') or 'unknown',
+                close_reason_key(t.get('close_reason')), (t.get('closed_at', '') or '')[:7] or 'unknown')
+
+    def add(self, t):
+        pnl = t['pnl']; key = self.key(t)
+        with self._lock:
+            c = self.cells.setdefault(key, [0, 0, 0.0, 0.0, 0.0])
+            c[_TRADES] += 1; c[_PNL] += pnl
+            if pnl > 0: c[_WINS] += 1; c[_GP] += pnl
+            else: c[_GL] += pnl
+
+    def add_many(self, trades, pnl=None):
+        """Bulk load: one key per trade, then bincount sums per cell"""
+        if not trades: return
+        pnl = np.asarray(pnl if pnl is not None else [t['pnl'] for t in trades], dtype=float)
+        table = {}
+        codes = np.fromiter((table.setdefault(self.key(t), len(table)) for t in trades), dtype=np.int64)
+        win = pnl > 0
+        sums = [np.bincount(codes, weights=w, minlength=len(table)) for w in
+                (None, win, pnl, np.where(win, pnl, 0), np.where(win, 0, pnl))]
+        with self._lock:
+            for k, i in table.items():
+                c = self.cells.setdefault(k, [0, 0, 0.0, 0.0, 0.0])
+                c[_TRADES] += int(sums[0][i]); c[_WINS] += int(sums[1][i])
+                for col in (_PNL, _GP, _GL): c[col] += float(sums[col][i])
+
+    def query(self, group_by=(), filters=None, sort='pnl', limit=None):
+        """Roll cells up by `group_by` dimensions, keeping cells whose values are in `filters`
+
+        filters: {dimension: value or [values]}. Returns {'group_by','rows','groups','totals','cells'}.
+        """
+        group_by = [d for d in group_by if d in DIMENSIONS]
+        pos = [DIMENSIONS.index(d) for d in group_by]
+        wanted = []
+        for dim, values in (filters or {}).items():
+            if dim not in DIMENSIONS: raise ValueError(f"unknown dimension {dim}")
+            wanted.append((DIMENSIONS.index(dim), {values} if isinstance(values, str) else set(values)))
+        groups = {}; total = [0, 0, 0.0, 0.0, 0.0]
+        with self._lock:
+            cells = list(self.cells.items())
+        for key, c in cells:
+            if any(key[i] not in values for i, values in wanted): continue
+            g = groups.setdefault(tuple(key[i] for i in pos), [0, 0, 0.0, 0.0, 0.0])
+            for col in range(5): g[col] += c[col]; total[col] += c[col]
+        rows = [{**dict(zip(group_by, k)), **self._metrics(g)} for k, g in groups.items()]
+        if sort in ('pnl', 'trades', 'win_rate', 'profit_factor', 'avg_pnl'):
+            rows.sort(key=lambda r: r[sort], reverse=True)
+        else:
+            rows.sort(key=lambda r: tuple(r[d] for d in group_by))
+        return {'group_by': group_by, 'rows': rows[:limit] if limit else rows,
+                'groups': len(rows), 'totals': self._metrics(total), 'cells': len(cells)}
+
+    @staticmethod
+    def _metrics(c):
+        trades, wins, pnl, gp, gl = c
+        return {'trades': trades, 'wins': wins, 'losses': trades - wins,
+                'win_rate': round(wins / trades * 100, 1) if trades else 0,
+                'pnl': round(pnl, 2), 'avg_pnl': round(pnl / trades, 2) if trades else 0,
+                'gross_profit': round(gp, 2), 'gross_loss': round(abs(gl), 2),
+                'profit_factor': round(gp / abs(gl), 2) if gl < 0 else (999 if gp > 0 else 0)}
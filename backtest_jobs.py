@@ -0,0 +1,195 @@
+"""
+PROJECT HOPE v3.0 - Backtest Jobs
+Backtests run as jobs on a bounded thread pool, so many can be queued or running at
+once, each with progress and cancellation.
+
+Results are cached on disk under a content address: a hash of the model, symbol,
+days, the date range and a fingerprint of the data actually used (price histories,
+or the archive files in range), plus every config setting that shapes a backtest.
+Repeating a request against unchanged data returns the stored result without
+recomputing; a request identical to one still in flight joins that job.
+"""
+import hashlib, itertools, json, os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import config
+import storage
+
+MODEL_VERSION = 1  # bump when a backtest model changes results for the same inputs
+MODELS = ('simple', 'path', 'portfolio', 'archive')
+CONFIG_PREFIXES = ('CS_', 'BACKTEST_', 'ROBUST_', 'MAX_', 'ACTIVE_TIER', 'RISK_FREE_RATE', 'VIRTUAL_ACCOUNT_SIZE',
+                   'SPREAD_SCAN_INTERVAL', 'CHART_REPORT_POINTS', 'SECTOR_MAP')
+FINISHED = ('done', 'error', 'cancelled')
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class BacktestJobs:
+    def __init__(self, backtester, cache_dir=None, workers=None):
+        self.backtester = backtester
+        self.cache_dir = cache_dir or config.BACKTEST_CACHE_DIR or os.path.join(storage.STORAGE_DIR, 'backtests')
+        self.pool = ThreadPoolExecutor(max_workers=workers or config.BACKTEST_WORKERS, thread_name_prefix='backtest')
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.jobs = {}  # id -> job dict (most recent BACKTEST_JOBS_KEEP)
+        self.hits = 0; self.misses = 0
+
+    # ========== PUBLIC ==========
+
+    def submit(self, model='simple', symbol='SPY', days=365, robust=True, on_done=None):
+        """Queue a backtest; returns its job (an identical queued/running request is joined instead)"""
+        if model not in MODELS: raise ValueError(f"model must be one of {', '.join(MODELS)}")
+        params = {'model': model, 'symbol': symbol if model in ('simple', 'path') else None,
+                  'days': int(days), 'robust': bool(robust)}
+        with self._lock:
+            for job in self.jobs.values():
+                if job['params'] == params and job['status'] not in FINISHED:
+                    if on_done: job['_callbacks'].append(on_done)
+                    return self._public(job)
+            job = {'id': f"bt{next(self._ids)}", 'params': params, 'status': 'queued', 'progress': 0.0, 'message': '',
+                   'key': None, 'cached': False, 'submitted_at': time.time(), 'started_at': None, 'finished_at': None,
+                   'result': None, '_cancel': threading.Event(), '_callbacks': [on_done] if on_done else []}
+            self.jobs[job['id']] = job
+            self._trim()
+            job['_future'] = self.pool.submit(self._run, job)
+        return self._public(job)
+
+    def get(self, job_id, wait=0):
+        """Job status (with result once done); wait up to `wait` seconds for it to finish"""
+        with self._lock: job = self.jobs.get(job_id)
+        if not job: return None
+        if wait and job['status'] not in FINISHED:
+            try: job['_future'].result(timeout=wait)
+            except Exception: pass
+        return self._public(job, result=True)
+
+    def list(self):
+        with self._lock:
+            return [self._public(j) for j in sorted(self.jobs.values(), key=lambda j: -j['submitted_at'])]
+
+    def cancel(self, job_id):
+        with self._lock: job = self.jobs.get(job_id)
+        if not job or job['status'] in FINISHED: return False
+        job['_cancel'].set()
+        if job['_future'].cancel(): self._finish(job, 'cancelled', message='Cancelled before start')
+        return True
+
+    def running(self):
+        with self._lock:
+            return any(j['status'] in ('queued', 'running') for j in self.jobs.values())
+
+    def get_stats(self):
+        with self._lock:
+            jobs = len(self.jobs); active = sum(1 for j in self.jobs.values() if j['status'] not in FINISHED)
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {'jobs': jobs, 'active': active, 'cache_hits': hits, 'cache_misses': misses,
+                'hit_rate': round(hits / total * 100, 1) if total else 0, 'cache_dir': self.cache_dir}
+
+    # ========== INTERNAL ==========
+
+    def _run(self, job):
+        if job['_cancel'].is_set(): return self._finish(job, 'cancelled', message='Cancelled')
+        job['status'] = 'running'; job['started_at'] = time.time()
+        p = job['params']
+
+        def progress(frac, message=''):
+            if job['_cancel'].is_set(): raise JobCancelled()
+            job['progress'] = round(min(max(frac, 0), 1), 3)
+            if message: job['message'] = message
+
+        try:
+            progress(0, 'Fingerprinting data')
+            job['key'] = self._key(p)
+            cached = self._cache_get(job['key'])
+            if cached is not None:
+                with self._lock: self.hits += 1
+                job['cached'] = True
+                return self._finish(job, 'done', cached, 'Cached result')
+            with self._lock: self.misses += 1
+            bt = self.backtester
+            progress(0, 'Running')
+            if p['model'] == 'path': r = bt.run_path_backtest(p['symbol'], p['days'], robust=p['robust'])
+            elif p['model'] == 'portfolio': r = bt.run_portfolio_backtest(None, p['days'], robust=p['robust'], progress=progress)
+            elif p['model'] == 'archive': r = bt.run_archive_backtest(None, p['days'], robust=p['robust'], progress=progress)
+            else: r = bt.run_credit_spread_backtest(p['symbol'], p['days'], robust=p['robust'])
+            progress(1)
+            if 'error' not in r: self._cache_put(job['key'], r)
+            self._finish(job, 'error' if 'error' in r else 'done', r)
+        except JobCancelled:
+            self._finish(job, 'cancelled', message='Cancelled')
+        except Exception as e:
+            print(f"[BT JOB ERR] {job['id']}: {e}")
+            self._finish(job, 'error', {'error': str(e)}, str(e))
+
+    def _finish(self, job, status, result=None, message=''):
+        job.update({'status': status, 'result': result, 'finished_at': time.time()})
+        if message: job['message'] = message
+        if status == 'done': job['progress'] = 1.0
+        for cb in job['_callbacks']:
+            try: cb(self._public(job, result=True))
+            except Exception as e: print(f"[BT JOB ERR] callback: {e}")
+
+    def _key(self, p):
+        """Content address: request + data fingerprint + the config settings backtests read"""
+        settings = {k: getattr(config, k) for k in dir(config) if k.startswith(CONFIG_PREFIXES)}
+        if p['model'] == 'portfolio': settings['WATCHLIST'] = config.WATCHLIST
+        blob = json.dumps({'v': MODEL_VERSION, **p, 'data': self._fingerprint(p), 'config': settings},
+                          sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode()).hexdigest()[:24]
+
+    def _fingerprint(self, p):
+        h = hashlib.sha1()
+        if p['model'] == 'archive':
+            # Archive files in range: path, size and mtime (appends change size)
+            archive = getattr(self.backtester.api, 'archive', None)
+            root = archive.root if archive else os.path.join(storage.STORAGE_DIR, 'chains')
+            start = (datetime.now() - timedelta(days=p['days'])).strftime('%Y/%m/%d')
+            for dirpath, _, files in sorted(os.walk(root)):
+                rel = os.path.relpath(dirpath, root)
+                if rel.count(os.sep) != 2 or rel.replace(os.sep, '/') < start: continue
+                for f in sorted(files):
+                    st = os.stat(os.path.join(dirpath, f))
+                    h.update(f"{rel}/{f}:{st.st_size}:{st.st_mtime_ns};".encode())
+            return {'archive': h.hexdigest(), 'start': start}
+        symbols = [p['symbol']] if p['symbol'] else list(config.WATCHLIST)
+        first = last = ''
+        for sym in symbols:
+            try: hist = self.backtester.api.get_history(sym, p['days']) or []
+            except Exception: hist = []
+            h.update(f"{sym}:".encode() + json.dumps(hist, sort_keys=True, default=str).encode())
+            if hist:
+                first = min(first or hist[0].get('date', ''), hist[0].get('date', ''))
+                last = max(last, hist[-1].get('date', ''))
+        return {'prices': h.hexdigest(), 'range': [first, last]}
+
+    def _cache_get(self, key):
+        path = os.path.join(self.cache_dir, f'{key}.json')
+        try:
+            with open(path) as f: return json.load(f)
+        except (OSError, ValueError): return None
+
+    def _cache_put(self, key, result):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = os.path.join(self.cache_dir, f'{key}.tmp')
+            with open(tmp, 'w') as f: json.dump(result, f, default=str)
+            os.replace(tmp, os.path.join(self.cache_dir, f'{key}.json'))
+            files = sorted((os.path.getmtime(p), p) for p in
+                           (os.path.join(self.cache_dir, n) for n in os.listdir(self.cache_dir)) if p.endswith('.json'))
+            for _, p in files[:-config.BACKTEST_CACHE_KEEP]: os.remove(p)
+        except Exception as e:
+            print(f"[BT JOB ERR] cache write: {e}")
+
+    def _trim(self):
+        done = sorted((j['submitted_at'], k) for k, j in self.jobs.items() if j['status'] in FINISHED)
+        for _, k in done[:max(0, len(self.jobs) - config.BACKTEST_JOBS_KEEP)]: del self.jobs[k]
+
+    @staticmethod
+    def _public(job, result=False):
+        out = {k: v for k, v in job.items() if not k.startswith('_') and k != 'result'}
+        out['elapsed'] = round((job['finished_at'] or time.time()) - (job['started_at'] or job['submitted_at']), 2)
+        if result: out['result'] = job['result']
+        return out
@@ -5,77 +5,131 @@ Uses FREE Tradier historical data - no proprietary tools needed
 """
 import math
 from datetime import datetime, timedelta
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import config
+from archive_backtest import ArchiveBacktester
+from chain_archive import ChainArchive
+from chart_series import downsample
+from path_simulator import PathSimulator
+from portfolio_backtest import PortfolioBacktester
+from robustness import analyze
 
 class Backtester:
     def __init__(self, api):
         self.api = api
 
-    def run_credit_spread_backtest(self, symbol='SPY', days=365):
-        """Simulate credit spread strategy on historical data"""
+    def run_credit_spread_backtest(self, symbol='SPY', days=365, robust=False):
+        """Simulate credit spread strategy on historical data; robust adds resampled confidence intervals"""
         history = self.api.get_history(symbol, days)
         if not history or len(history) < 30:
             return {'error': f'Insufficient data for {symbol}', 'symbol': symbol}
 
-        trades = []
-        balance = config.BACKTEST_INITIAL_BALANCE
-        wins = losses = 0
-        peak = balance
-        max_dd = 0
-        daily_returns = []
-
-        i = 0
-        while i < len(history) - 25:
-            entry = history[i]
-            price = entry.get('close', 0)
-            if price <= 0:
-                i += 1
-                continue
-
-            # Enter a put credit spread once per week
-            short_strike = round(price * 0.95, 2)
-            long_strike = short_strike - config.CS_SPREAD_WIDTH
-            credit = round(config.CS_SPREAD_WIDTH * 0.22, 2)
-            max_loss = config.CS_SPREAD_WIDTH - credit
-
-            # Check price over next 21 trading days
-            exit_idx = min(i + 21, len(history) - 1)
-            min_price = price
-            for j in range(i, exit_idx + 1):
-                low = history[j].get('low', price)
-                if low < min_price:
-                    min_price = low
-
-            # Determine result
-            if min_price > short_strike:
-                pnl = round(credit * 0.50 * 100, 2)
-                wins += 1
-                result = 'WIN'
-            elif min_price <= long_strike:
-                pnl = round(-max_loss * 100, 2)
-                losses += 1
-                result = 'MAX_LOSS'
-            else:
-                intrusion = (short_strike - min_price) / config.CS_SPREAD_WIDTH
-                pnl = round(-(intrusion * max_loss) * 100, 2)
-                losses += 1
-                result = 'STOP_LOSS'
-
-            balance += pnl
-            daily_returns.append(pnl / max(balance, 1))
+        close, low = self._history_arrays(history)
+        width = config.CS_SPREAD_WIDTH
+        credit = round(width * 0.22, 2)
+
+        # Lowest price over each entry's next 21 trading days (entry day included), all days at once
+        window_low = sliding_window_view(low, 22).min(axis=1)[:len(history) - 25]
+        entries = self._entry_days(close[:len(history) - 25])
+        if not len(entries):
+            return self._compile_results(symbol, days, [], 0, 0, config.BACKTEST_INITIAL_BALANCE, 0, [])
+        pnl, win, max_hit, min_price, short_strike, long_strike = self._spread_pnl(close, window_low, entries, width, credit)
+
+        balance = np.cumsum(np.concatenate(([float(config.BACKTEST_INITIAL_BALANCE)], pnl)))[1:]
+        daily_returns = (pnl / np.maximum(balance, 1)).tolist()
+        peak = np.maximum.accumulate(np.maximum(balance, config.BACKTEST_INITIAL_BALANCE))
+        max_dd = max(0, float(((peak - balance) / peak * 100).max()))
+
+        results = np.where(win, 'WIN', np.where(max_hit, 'MAX_LOSS', 'STOP_LOSS')).tolist()
+        trades = [{
+            'date': history[i].get('date', ''), 'symbol': symbol,
+            'entry': history[i].get('close', 0), 'short': s, 'long': l,
+            'credit': credit, 'min_price': round(m, 2),
+            'pnl': x, 'result': r, 'balance': round(b, 2)
+        } for i, s, l, m, x, r, b in zip(entries.tolist(), short_strike.tolist(), long_strike.tolist(),
+                                         min_price.tolist(), pnl.tolist(), results, balance.tolist())]
+        wins = int(win.sum())
+        result = self._compile_results(symbol, days, trades, wins, len(trades) - wins, float(balance[-1]), max_dd, daily_returns)
+        if robust:
+            # Entry-offset resamples draw from a trade opened on every valid day
+            every_day = np.flatnonzero(close[:len(history) - 25] > 0)
+            result['robustness'] = analyze(pnl, self._spread_pnl(close, window_low, every_day, width, credit)[0])
+        return result
+
+    @staticmethod
+    def _spread_pnl(close, window_low, entries, width, credit):
+        """P&L per entry: WIN keeps half the credit, past the long strike is max loss,
+        in between loses in proportion to how far price got into the spread"""
+        max_loss = width - credit
+        price = close[entries]
+        min_price = np.minimum(price, window_low[entries])
+        short_strike = np.array([round(p * 0.95, 2) for p in price.tolist()])
+        long_strike = short_strike - width
+        win = min_price > short_strike
+        max_hit = ~win & (min_price <= long_strike)
+        intrusion = (short_strike - min_price) / width
+        raw = np.where(win, credit * 0.50 * 100, np.where(max_hit, -max_loss * 100, -(intrusion * max_loss) * 100))
+        pnl = np.array([round(x, 2) for x in raw.tolist()])
+        return pnl, win, max_hit, min_price, short_strike, long_strike
+
+    @staticmethod
+    def _history_arrays(history):
+        """Closes and lows as float arrays; a missing low never sets the window low (the entry close bounds it)"""
+        close = np.array([h.get('close', 0) for h in history], dtype=float)
+        low = np.array([h.get('low', np.inf) for h in history], dtype=float)
+        return close, low
+
+    @staticmethod
+    def _entry_days(close):
+        """Entry indices: a spread opens on a day with a valid close, then the next one 5 trading days later"""
+        entries = []; i = 0; n = len(close)
+        valid = (close > 0).tolist()
+        while i < n:
+            if valid[i]: entries.append(i); i += 5
+            else: i += 1
+        return np.array(entries, dtype=np.int64)
+
+    def run_path_backtest(self, symbol='SPY', days=365, rules=None, robust=False):
+        """Simulate spreads with daily Black-Scholes repricing and PositionManager's exit rules"""
+        history = self.api.get_history(symbol, days)
+        if not history or len(history) < 30:
+            return {'error': f'Insufficient data for {symbol}', 'symbol': symbol}
+        simulator = PathSimulator(rules)
+        sim = simulator.simulate(history)
+        # Realized in exit order; spreads still open at the end of the data are left out
+        closed = sorted((t for t in sim['trades'] if t['reason'] != 'OPEN'), key=lambda t: t['exit_date'])
+        balance = peak = config.BACKTEST_INITIAL_BALANCE
+        max_dd = 0; daily_returns = []; trades = []
+        for t in closed:
+            balance += t['pnl']
+            daily_returns.append(t['pnl'] / max(balance, 1))
             if balance > peak: peak = balance
             dd = ((peak - balance) / peak * 100) if peak > 0 else 0
             if dd > max_dd: max_dd = dd
-
-            trades.append({
-                'date': entry.get('date', ''), 'symbol': symbol,
-                'entry': price, 'short': short_strike, 'long': long_strike,
-                'credit': credit, 'min_price': round(min_price, 2),
-                'pnl': pnl, 'result': result, 'balance': round(balance, 2)
-            })
-            i += 5
-
-        return self._compile_results(symbol, days, trades, wins, losses, balance, max_dd, daily_returns)
+            trades.append({**t, 'symbol': symbol, 'result': t['reason'], 'balance': round(balance, 2)})
+        wins = sum(1 for t in trades if t['pnl'] > 0)
+        result = self._compile_results(symbol, days, trades, wins, len(trades) - wins, balance, max_dd, daily_returns)
+        result['model'] = 'path'
+        result['exit_reasons'] = sim['summary']['exit_reasons']
+        result['avg_days_held'] = sim['summary']['avg_days_held']
+        result['rules'] = sim['summary']['rules']
+        if robust:
+            every_day = PathSimulator({**simulator.rules, 'entry_every': 1}).simulate(history)['trades']
+            result['robustness'] = analyze([t['pnl'] for t in trades],
+                                           [t['pnl'] for t in every_day if t['reason'] != 'OPEN'],
+                                           every=max(1, int(simulator.rules['entry_every'])))
+        return result
+
+    def run_portfolio_backtest(self, symbols=None, days=730, robust=False, progress=None):
+        """Whole-watchlist replay under the live portfolio limits (see portfolio_backtest)"""
+        return PortfolioBacktester(self.api).run(symbols, days, robust=robust, progress=progress)
+
+    def run_archive_backtest(self, symbols=None, days=365, robust=False, progress=None):
+        """Live scanner and exit rules over the recorded chain archive (see archive_backtest)"""
+        archive = getattr(self.api, 'archive', None) or ChainArchive()
+        start = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+        return ArchiveBacktester(archive, history_api=self.api).run(symbols, start=start, robust=robust, progress=progress)
 
     def run_full_backtest(self, symbols=None, days=365):
         """Run backtest across top symbols for both strategies"""
@@ -148,7 +202,8 @@ class Backtester:
             'avg_loss': round(sum(l_trades)/len(l_trades), 2) if l_trades else 0,
             'max_win_streak': max_ws, 'max_loss_streak': max_ls,
             'monthly': [{'month': k, 'pnl': round(v, 2)} for k, v in sorted(monthly.items())],
-            'equity_curve': [{'date': t['date'], 'bal': t['balance']} for t in trades],
+            'equity_curve': [{'date': trades[i]['date'], 'bal': trades[i]['balance']}
+                             for i in downsample(range(len(trades)), [t['balance'] for t in trades], config.CHART_REPORT_POINTS)],
             'trades': trades[-30:]
         }
 
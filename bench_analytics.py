@@ -0,0 +1,49 @@
+"""
+PROJECT HOPE v3.0 - Analytics Benchmark
+Times loading a large synthetic trade history into Analytics and building reports.
+Usage: python bench_analytics.py [trades]
+"""
+import random, sys, time
+from datetime import date, timedelta
+from analytics import Analytics
+
+SYMBOLS = ['SPY', 'QQQ', 'IWM', 'AAPL', 'MSFT', 'NVDA', 'AMZN', 'META', 'TSLA', 'AMD']
+SETUPS = ['bull_put', 'bear_call', 'iron_condor', '']
+
+
+def synthetic_trades(n, seed=7):
+    rng = random.Random(seed)
+    start = date(2020, 1, 1)
+    trades = []
+    for i in range(n):
+        day = start + timedelta(days=i * 2000 // n)
+        trades.append({'symbol': rng.choice(SYMBOLS), 'type': rng.choice(['bull_put_spread', 'bear_call_spread']),
+                       'pnl': round(rng.gauss(15, 90), 2), 'contracts': rng.randint(1, 5),
+                       'closed_at': f'{day.isoformat()}T15:{rng.randint(10, 59)}:00',
+                       'setup_type': rng.choice(SETUPS), 'close_reason': rng.choice(['TP', 'SL', 'DTE'])})
+    return trades
+
+
+class _MemoryStorage:
+    def __init__(self, trades): self.trades = trades
+    def load_trade_history(self): return list(self.trades)
+    def save_trade(self, t): self.trades.append(t)
+
+
+def _timed(label, fn, repeat=1):
+    t = time.perf_counter()
+    for _ in range(repeat): result = fn()
+    ms = (time.perf_counter() - t) * 1000 / repeat
+    print(f"  {label:<28} {ms:9.2f} ms")
+    return result
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    trades = synthetic_trades(n)
+    print(f"[BENCH] {n:,} synthetic trades")
+    a = _timed('load (vectorized seed)', lambda: Analytics(_MemoryStorage(trades)))
+    _timed('columns()', lambda: Analytics.columns(trades))
+    _timed('get_full_report()', a.get_full_report, repeat=20)
+    _timed('get_rolling(30,90,365)', lambda: a.get_rolling(end='2025-06-30'), repeat=20)
+    _timed('record_trade()', lambda: a.record_trade(dict(trades[-1])), repeat=1000)
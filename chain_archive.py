@@ -0,0 +1,215 @@
+"""
+PROJECT HOPE v3.0 - Option Chain Archive
+Every option chain fetched from Tradier is appended to a compressed, columnar,
+date-partitioned archive:  <root>/YYYY/MM/DD/SYMBOL.chn
+
+Each file is a sequence of records, one per chain snapshot:
+    b'CHN1' | uint32 header length | uint32 body length | JSON header | column blocks
+Values are quantized to int64 (prices in cents, greeks x1e4...) and each column is a
+separate zlib block, so a reader decompresses only the columns it asks for. Rows are
+sorted by (type, strike); a strike slice decompresses only up to its last row.
+A keyframe stores absolute values plus contract symbols/types/strikes; following
+snapshots of the same expiration store only the difference from the previous one
+(mostly zeros) until the contract set changes or CHAIN_KEYFRAME_EVERY is reached.
+Readers memory-map the file and hop between record headers. Parsed headers are cached per
+file for the CHAIN_INDEX_CACHE_FILES most recently read files only.
+"""
+import json, mmap, os, struct, threading, time, zlib
+from collections import OrderedDict
+from datetime import datetime
+import numpy as np
+import config
+import storage
+
+MAGIC = b'CHN1'
+PREFIX = struct.Struct('<4sII')
+MISSING = -(1 << 62)
+OPTION_TYPES = ('put', 'call')
+# column -> quantization scale; greeks are nested under 'greeks' in Tradier's chain
+VALUE_COLUMNS = {'bid': 100, 'ask': 100, 'last': 100, 'volume': 1, 'open_interest': 1}
+GREEK_COLUMNS = {'delta': 10000, 'gamma': 100000, 'theta': 10000, 'vega': 10000, 'mid_iv': 10000, 'smv_vol': 10000}
+SCALES = {**VALUE_COLUMNS, **GREEK_COLUMNS}
+
+
+def _quantize(values, scale):
+    return np.array([MISSING if v is None else int(round(float(v) * scale)) for v in values], dtype='<i8')
+
+
+def _dequantize(arr, scale):
+    out = arr.astype(float) / scale
+    out[arr == MISSING] = np.nan
+    return out
+
+
+class ChainArchive:
+    def __init__(self, root=None, keyframe_every=None):
+        self.root = root or config.CHAIN_ARCHIVE_DIR or os.path.join(storage.STORAGE_DIR, 'chains')
+        self.keyframe_every = keyframe_every or config.CHAIN_KEYFRAME_EVERY
+        self._lock = threading.Lock()
+        self._prev = {}     # (path, expiration) -> previous snapshot, for delta encoding
+        self._indexes = OrderedDict()  # path -> (size, [(offset, header)]), least recently read first
+        self._index_lock = threading.Lock()
+        self.records = 0
+        self.bytes_written = 0
+
+    # ========== WRITE ==========
+
+    def record(self, symbol, expiration, chain, ts=None, underlying=None):
+        """Append one chain snapshot; returns bytes written (0 if nothing to record)"""
+        if not chain: return 0
+        ts = ts or time.time()
+        rows = sorted(chain, key=lambda o: (o.get('option_type') != 'put', o.get('strike', 0), o.get('symbol', '')))
+        symbols = tuple(o.get('symbol', '') for o in rows)
+        values = {c: _quantize([o.get(c) for o in rows], s) for c, s in VALUE_COLUMNS.items()}
+        values.update({c: _quantize([(o.get('greeks') or {}).get(c) for o in rows], s) for c, s in GREEK_COLUMNS.items()})
+        path = self.path_for(symbol, datetime.fromtimestamp(ts).strftime('%Y-%m-%d'))
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            offset = os.path.getsize(path) if os.path.exists(path) else 0
+            prev = self._prev.get((path, expiration))
+            keyframe = (not prev or prev['symbols'] != symbols or prev['since_kf'] >= self.keyframe_every
+                        or prev['offset'] >= offset)
+            blocks = {}
+            if keyframe:
+                blocks['symbols'] = zlib.compress('\n'.join(symbols).encode())
+                blocks['type'] = zlib.compress(np.array([o.get('option_type') == 'call' for o in rows], dtype='i1').tobytes())
+                blocks['strike'] = zlib.compress(_quantize([o.get('strike') for o in rows], 1000).tobytes())
+            for c, arr in values.items():
+                blocks[c] = zlib.compress((arr if keyframe else arr - prev['values'][c]).tobytes())
+            cols, pos = {}, 0
+            for c, b in blocks.items():
+                cols[c] = [pos, len(b)]; pos += len(b)
+            header = json.dumps({'ts': round(ts, 3), 'symbol': symbol, 'exp': expiration, 'n': len(rows), 'kf': keyframe,
+                                 'ref': None if keyframe else prev['offset'], 'underlying': underlying,
+                                 'cols': cols}, separators=(',', ':')).encode()
+            with open(path, 'ab') as f:
+                f.write(PREFIX.pack(MAGIC, len(header), pos) + header + b''.join(blocks.values()))
+            if len(self._prev) > 5000: self._prev.clear()  # old days; next snapshots start with keyframes
+            self._prev[(path, expiration)] = {'symbols': symbols, 'values': values, 'offset': offset,
+                                              'since_kf': 0 if keyframe else prev['since_kf'] + 1}
+            size = PREFIX.size + len(header) + pos
+            self.records += 1; self.bytes_written += size
+            return size
+
+    # ========== READ ==========
+
+    def path_for(self, symbol, day):
+        y, m, d = day[:10].split('-')
+        return os.path.join(self.root, y, m, d, f'{symbol.upper()}.chn')
+
+    def days(self):
+        """All archived days, oldest first"""
+        out = []
+        for dirpath, _, files in os.walk(self.root):
+            if any(f.endswith('.chn') for f in files):
+                parts = os.path.relpath(dirpath, self.root).split(os.sep)
+                if len(parts) == 3: out.append('-'.join(parts))
+        return sorted(out)
+
+    def symbols(self, day):
+        d = os.path.dirname(self.path_for('X', day))
+        return sorted(f[:-4] for f in os.listdir(d) if f.endswith('.chn')) if os.path.isdir(d) else []
+
+    def snapshots(self, symbol, day, expiration=None):
+        """Headers of one symbol-day's snapshots: ts, exp, n, underlying, keyframe"""
+        return [{'ts': h['ts'], 'expiration': h['exp'], 'n': h['n'], 'underlying': h.get('underlying'), 'keyframe': h['kf']}
+                for _, h in self._index(self.path_for(symbol, day)) if not expiration or h['exp'] == expiration]
+
+    def load(self, symbol, day, expiration=None, columns=None, strikes=None, start_ts=None, end_ts=None):
+        """Decoded snapshots for one symbol-day, oldest first
+
+        columns limits which value columns are decompressed (default all);
+        strikes=(lo, hi) keeps only contracts with lo <= strike <= hi.
+        Each snapshot: {'ts','expiration','underlying','symbol','option_type','strike', <column>: float array}
+        """
+        path = self.path_for(symbol, day)
+        index = self._index(path)
+        if not index: return []
+        columns = list(columns or SCALES)
+        out = []
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            by_offset = dict(index)
+            for offset, h in index:
+                if expiration and h['exp'] != expiration: continue
+                if (start_ts and h['ts'] < start_ts) or (end_ts and h['ts'] > end_ts): continue
+                out.append(self._decode(mm, by_offset, offset, columns, strikes))
+        return out
+
+    def snapshot_at(self, symbol, expiration, ts, columns=None, strikes=None):
+        """Latest snapshot of an expiration at or before `ts` on that day, or None"""
+        path = self.path_for(symbol, datetime.fromtimestamp(ts).strftime('%Y-%m-%d'))
+        index = [(o, h) for o, h in self._index(path) if h['exp'] == expiration and h['ts'] <= ts]
+        if not index: return None
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return self._decode(mm, dict(self._index(path)), index[-1][0], list(columns or SCALES), strikes)
+
+    @staticmethod
+    def to_chain(snap):
+        """Snapshot back to Tradier chain dicts (missing values dropped)"""
+        chain = []
+        for i, sym in enumerate(snap['symbol']):
+            o = {'symbol': sym, 'option_type': snap['option_type'][i], 'strike': float(snap['strike'][i]), 'greeks': {}}
+            for c in SCALES:
+                if c not in snap or np.isnan(snap[c][i]): continue
+                v = float(snap[c][i])
+                if c in GREEK_COLUMNS: o['greeks'][c] = v
+                else: o[c] = int(v) if c in ('volume', 'open_interest') else v
+            chain.append(o)
+        return chain
+
+    def get_stats(self):
+        return {'root': self.root, 'records': self.records, 'bytes_written': self.bytes_written}
+
+    # ========== INTERNAL ==========
+
+    def _index(self, path):
+        """[(offset, header)] for every complete record in a file; extended incrementally as it grows"""
+        try: size = os.path.getsize(path)
+        except OSError: return []
+        with self._index_lock:
+            cached_size, entries = self._indexes.get(path, (0, []))
+            if path in self._indexes: self._indexes.move_to_end(path)
+        if size == cached_size: return entries
+        entries = list(entries); pos = cached_size
+        with open(path, 'rb') as f:
+            f.seek(pos)
+            while pos + PREFIX.size <= size:
+                magic, hlen, blen = PREFIX.unpack(f.read(PREFIX.size))
+                if magic != MAGIC or pos + PREFIX.size + hlen + blen > size: break  # torn tail
+                h = json.loads(f.read(hlen))
+                h['_body'] = pos + PREFIX.size + hlen
+                entries.append((pos, h))
+                f.seek(blen, 1); pos += PREFIX.size + hlen + blen
+        with self._index_lock:
+            self._indexes[path] = (pos, entries); self._indexes.move_to_end(path)
+            while len(self._indexes) > config.CHAIN_INDEX_CACHE_FILES: self._indexes.popitem(last=False)
+        return entries
+
+    @staticmethod
+    def _block(mm, h, name, nbytes=None):
+        off, length = h['cols'][name]
+        raw = mm[h['_body'] + off:h['_body'] + off + length]
+        # Partial decompression: a strike slice stops at its last row
+        return zlib.decompressobj().decompress(raw, nbytes) if nbytes else zlib.decompress(raw)
+
+    def _decode(self, mm, by_offset, offset, columns, strikes=None):
+        chain = [by_offset[offset]]
+        while not chain[-1]['kf']: chain.append(by_offset[chain[-1]['ref']])
+        kf = chain[-1]; chain.reverse()
+        strike = np.frombuffer(self._block(mm, kf, 'strike'), dtype='<i8') / 1000
+        is_call = np.frombuffer(self._block(mm, kf, 'type'), dtype='i1').astype(bool)
+        rows = np.arange(kf['n'])
+        if strikes:
+            rows = rows[(strike >= strikes[0]) & (strike <= strikes[1])]
+        stop = int(rows[-1]) + 1 if len(rows) else 0
+        symbols = self._block(mm, kf, 'symbols').decode().split('\n')
+        head = chain[-1]
+        snap = {'ts': head['ts'], 'expiration': head['exp'], 'underlying': head.get('underlying'),
+                'symbol': [symbols[i] for i in rows], 'option_type': [OPTION_TYPES[int(is_call[i])] for i in rows],
+                'strike': strike[rows]}
+        for c in columns:
+            total = np.zeros(stop, dtype='<i8')
+            for h in chain:
+                total += np.frombuffer(self._block(mm, h, c, stop * 8), dtype='<i8')[:stop] if stop else 0
+            snap[c] = _dequantize(total[rows], SCALES[c])
+        return snap
@@ -0,0 +1,145 @@
+"""
+PROJECT HOPE v3.0 - Chart Series
+Downsampled curves for charts, so payloads scale with the chart's pixel width
+rather than with trade history.
+
+A SeriesPyramid keeps the raw points plus min/max-per-bucket levels (bucket width
+x1, x4, x16, ...), each updated in O(levels) per appended point. A query for N points
+reads the coarsest level with at least N/2 buckets and reduces those buckets' extremes
+to N: every bucket contributes its min and max, so peaks and drawdown troughs survive
+downsampling. LTTB (largest triangle three buckets) is available for a smoother visual
+shape and is computed on demand.
+"""
+import threading
+import numpy as np
+import config
+
+LEVEL_FACTOR = 4
+
+
+def minmax_indices(y, points):
+    """Indices of the min and max of each of ~points/2 equal buckets, plus both ends, in order"""
+    n = len(y)
+    if n <= max(points, 2): return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    buckets = max(1, (points - 2) // 2)
+    seg = np.arange(n) * buckets // n  # bucket of each point
+    starts = np.flatnonzero(np.r_[True, seg[1:] != seg[:-1]])
+    # First row of each bucket after sorting by (bucket, value) is its min; by (bucket, -value) its max
+    lows = np.lexsort((y, seg))[starts]; highs = np.lexsort((-y, seg))[starts]
+    return np.unique(np.concatenate(([0, n - 1], lows, highs)))
+
+
+def lttb_indices(x, y, points):
+    """Largest-Triangle-Three-Buckets: `points` indices that preserve the visual shape of (x, y)"""
+    n = len(y)
+    if n <= max(points, 3): return np.arange(n)
+    x = np.asarray(x, dtype=float); y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, points - 1).astype(int)  # points-2 buckets between the fixed ends
+    out = [0]; a = 0
+    for b in range(points - 2):
+        lo, hi = edges[b], edges[b + 1]
+        if b + 2 < len(edges): nlo, nhi = edges[b + 1], edges[b + 2]
+        else: nlo, nhi = n - 1, n
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()  # average of the next bucket
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax()); out.append(a)
+    out.append(n - 1)
+    return np.array(out)
+
+
+def downsample(x, y, points, method='minmax'):
+    """Indices to keep when drawing (x, y) with about `points` points"""
+    return lttb_indices(x, y, points) if method == 'lttb' else minmax_indices(y, points)
+
+
+class SeriesPyramid:
+    """One append-only series with min/max levels maintained as points arrive"""
+
+    def __init__(self, min_buckets=64):
+        self.x = []; self.y = []; self.labels = []
+        self.min_buckets = min_buckets
+        self.levels = []  # [(bucket width, [[min idx, max idx], ...])], finest first
+
+    def __len__(self):
+        return len(self.y)
+
+    def append(self, x, y, label=''):
+        i = len(self.y)
+        self.x.append(x); self.y.append(y); self.labels.append(label)
+        for width, buckets in self.levels:
+            b = i // width
+            if b == len(buckets): buckets.append([i, i]); continue
+            lo, hi = buckets[b]
+            if y < self.y[lo]: buckets[b][0] = i
+            if y > self.y[hi]: buckets[b][1] = i
+        # Add a coarser level once the coarsest one has grown past what it summarizes well
+        width = self.levels[-1][0] * LEVEL_FACTOR if self.levels else LEVEL_FACTOR
+        if len(self.y) >= width * self.min_buckets: self.levels.append((width, self._build(width)))
+
+    def extend(self, xs, ys, labels=None):
+        """Bulk load; levels are built with reshaped argmin/argmax instead of per point"""
+        self.x.extend(xs); self.y.extend(ys)
+        self.labels.extend(labels if labels is not None else [''] * (len(self.y) - len(self.labels)))
+        self.levels = []
+        width = LEVEL_FACTOR
+        while len(self.y) >= width * self.min_buckets:
+            self.levels.append((width, self._build(width))); width *= LEVEL_FACTOR
+
+    def query(self, points, method='minmax', start=0):
+        """Indices for about `points` points (from index `start` on)"""
+        n = len(self.y)
+        points = max(points, 3)
+        if n - start <= points: return list(range(start, n))
+        if method == 'lttb' or start:
+            return (downsample(self.x[start:], self.y[start:], points, method) + start).tolist()
+        if not self.levels: return minmax_indices(self.y, points).tolist()
+        # Coarsest level that still has enough buckets, then reduce its extremes to `points`
+        buckets = self.levels[0][1]
+        for width, level in reversed(self.levels):
+            if 2 * len(level) >= points: buckets = level; break
+        idx = sorted({i for pair in buckets for i in pair} | {0, n - 1})
+        if len(idx) > points:
+            keep = minmax_indices([self.y[i] for i in idx], points)
+            idx = [idx[k] for k in keep]
+        return idx
+
+    def _build(self, width):
+        y = np.asarray(self.y, dtype=float)
+        full = len(y) // width
+        blocks = y[:full * width].reshape(full, width)
+        base = np.arange(full) * width
+        buckets = np.stack([base + blocks.argmin(1), base + blocks.argmax(1)], 1).tolist()
+        if len(y) > full * width:
+            tail = y[full * width:]
+            buckets.append([full * width + int(tail.argmin()), full * width + int(tail.argmax())])
+        return buckets
+
+
+class ChartSeries:
+    """Named series (equity, drawdown, ...) with downsampled reads"""
+
+    def __init__(self, names=()):
+        self._lock = threading.Lock()
+        self.series = {name: SeriesPyramid() for name in names}
+
+    def append(self, name, x, y, label=''):
+        with self._lock:
+            self.series.setdefault(name, SeriesPyramid()).append(x, y, label)
+
+    def extend(self, name, xs, ys, labels=None):
+        with self._lock:
+            self.series.setdefault(name, SeriesPyramid()).extend(xs, ys, labels)
+
+    def get(self, name, points=None, method='minmax', start=0):
+        """{'name','total','x','y','label'} with about `points` points (default CHART_REPORT_POINTS)"""
+        points = max(3, min(int(points or config.CHART_REPORT_POINTS), config.CHART_MAX_POINTS))
+        with self._lock:
+            s = self.series.get(name)
+            if s is None: raise KeyError(name)
+            idx = s.query(points, method, start)
+            return {'name': name, 'total': len(s), 'points': len(idx),
+                    'x': [s.x[i] for i in idx], 'y': [s.y[i] for i in idx], 'label': [s.labels[i] for i in idx]}
+
+    def names(self):
+        return sorted(self.series)
@@ -124,10 +124,88 @@ POSITION_CHECK_INTERVAL = 5
 SPREAD_SCAN_INTERVAL = 30
 ACCOUNT_REFRESH_INTERVAL = 10
 
+# ============ SHARED MARKET DATA ============
+MARKET_QUOTE_TTL = 3           # seconds - quotes shared across accounts
+MARKET_CHAIN_TTL = 60
+MARKET_EXPIRATIONS_TTL = 3600
+MARKET_HISTORY_TTL = 3600
+MARKET_CACHE_MAX_ENTRIES = 5000
+
+# ============ MULTI-ACCOUNT ============
+# JSON list of {"id", "name", "tier", "api_key", "account_id"}; empty = single account from the vars above
+ACCOUNTS_JSON = os.environ.get('HOPE_ACCOUNTS', '')
+
+# ============ ENGINE PROCESS ============
+# embedded: app.py runs the engine in-process (single gunicorn worker)
+# remote: engine runs via `python engine_bridge.py`, web workers talk to it over a local socket
+ENGINE_MODE = os.environ.get('HOPE_ENGINE_MODE', 'embedded').lower()
+ENGINE_SOCKET = os.environ.get('HOPE_ENGINE_SOCKET', '')  # unix socket path; empty = <storage>/engine.sock
+# Empty: the engine generates a random key at startup and writes it (0600) to ENGINE_AUTHKEY_FILE for the workers
+ENGINE_AUTHKEY = os.environ.get('HOPE_ENGINE_AUTHKEY', '').encode()
+ENGINE_AUTHKEY_FILE = os.environ.get('HOPE_ENGINE_AUTHKEY_FILE', '')  # empty = <storage>/engine.key
+
+# ============ DASHBOARD ============
+DASHBOARD_TICK = 1  # seconds between dashboard snapshot producer passes
+STREAM_HEARTBEAT = 15  # seconds between SSE keep-alive comments on /api/stream
+# Each open /api/stream holds a server thread; past this many per worker, clients fall back to polling.
+# Keep it well under the worker's thread count (gunicorn --threads)
+STREAM_MAX_PER_WORKER = int(os.environ.get('HOPE_STREAM_MAX', '8'))
+
+# ============ STATIC / COMPRESSION ============
+STATIC_CACHE_MAX_AGE = 86400  # seconds browsers may reuse an HTML page before revalidating
+COMPRESS_MIN_SIZE = 1024      # bytes; smaller JSON responses go out uncompressed
+
+# ============ STORAGE BACKEND ============
+# json: JSON files + append-only logs; sqlite: hope.db in WAL mode (migrates the JSON data on first start)
+STORAGE_BACKEND = os.environ.get('HOPE_STORAGE_BACKEND', 'json').lower()
+
+# ============ STATE PERSISTENCE ============
+STATE_SAVE_WINDOW = 2     # seconds; max delay between a save request and the write
+STATE_SAVE_INTERVAL = 30  # seconds between checks for unrequested state changes
+
+# ============ STORAGE LOGS ============
+# Trades, agreements and backtests are append-only JSONL logs (see trade_log.py)
+LOG_SEGMENT_RECORDS = 10000  # records per segment file before a new one is started
+LOG_FSYNC_INTERVAL = 1.0     # seconds; max time an appended record waits for fsync
+LOG_FSYNC_BATCH = 32         # appends between forced fsyncs
+
+# ============ CHAIN ARCHIVE ============
+# Every fetched option chain is recorded to <storage>/chains/YYYY/MM/DD/SYMBOL.chn (see chain_archive.py)
+CHAIN_ARCHIVE_ENABLED = os.environ.get('HOPE_CHAIN_ARCHIVE', '1') == '1'
+CHAIN_ARCHIVE_DIR = os.environ.get('HOPE_CHAIN_ARCHIVE_DIR', '')
+CHAIN_KEYFRAME_EVERY = 30  # delta-encoded snapshots between full keyframes
+CHAIN_INDEX_CACHE_FILES = 512  # symbol-day files whose parsed record headers stay cached (LRU); ~a day of the watchlist
+# Recorder (opt-in): snapshot expirations out to CS_MAX_DTE during market hours, so archive
+# backtests (see archive_backtest.py) can price both entries and exits. Seconds between passes; 0 = off
+CHAIN_RECORD_INTERVAL = int(os.environ.get('HOPE_CHAIN_RECORD_INTERVAL', '0'))
+# active: symbols with open/pending spreads or current candidates; watchlist: all of WATCHLIST
+CHAIN_RECORD_SCOPE = os.environ.get('HOPE_CHAIN_RECORD_SCOPE', 'active').lower()
+CHAIN_RECORD_PACE = float(os.environ.get('HOPE_CHAIN_RECORD_PACE', '0.5'))  # seconds between chain requests
+
+# ============ CHART SERIES ============
+# Equity/drawdown curves are downsampled for charts (see chart_series.py)
+CHART_REPORT_POINTS = 300  # points in the dashboard's equity curve and backtest curves
+CHART_MAX_POINTS = 5000    # cap on /api/analytics/series?points=
+
 # ============ BACKTESTING ============
 BACKTEST_INITIAL_BALANCE = 6000
+# Robustness: resampled confidence intervals attached to /api/backtest results (see robustness.py)
+ROBUST_SAMPLES = 2000  # bootstrap / entry-offset resamples each
+ROBUST_RUIN_DD = 50    # % of the starting balance lost that counts as ruin
+# Jobs: /api/backtest runs on a worker pool; results cached by content address (see backtest_jobs.py)
+BACKTEST_WORKERS = int(os.environ.get('HOPE_BACKTEST_WORKERS', 2))
+BACKTEST_CACHE_DIR = os.environ.get('HOPE_BACKTEST_CACHE_DIR', '')  # default <storage>/backtests
+BACKTEST_CACHE_KEEP = 100  # cached backtest results kept on disk
+BACKTEST_JOBS_KEEP = 100   # finished jobs kept for status queries
 RISK_FREE_RATE = 0.05
 
+# ============ PARAMETER SWEEPS ============
+# Grid/random searches over spread rules run on a process pool (see sweep.py)
+SWEEP_WORKERS = int(os.environ.get('HOPE_SWEEP_WORKERS', 0))  # 0 = one per CPU
+SWEEP_MAX_COMBOS = 2000  # grid size limit; random mode samples at most this many
+SWEEP_CACHE_DIR = os.environ.get('HOPE_SWEEP_CACHE_DIR', '')  # default <storage>/sweeps
+SWEEP_CACHE_KEEP = 50    # cached sweep results kept on disk
+
 # ============ GREEKS THRESHOLDS ============
 GREEKS_DELTA_WARNING = 0.40
 GREEKS_THETA_TARGET = 5.0
@@ -5,11 +5,13 @@ from datetime import datetime
 import config
 
 class CreditSpreadScanner:
-    def __init__(self, api, state):
+    def __init__(self, api, state, wal=None):
         self.api = api
         self.state = state
+        self.wal = wal
 
-    def scan(self):
+    def scan(self, candidates=None):
+        """Scan the watchlist, or filter a shared pre-scanned candidate list for this account"""
         opportunities = []
         # Get sectors already in use
         open_sectors = {}
@@ -18,6 +20,10 @@ class CreditSpreadScanner:
                 sec = config.SECTOR_MAP.get(s['symbol'], 'Other')
                 open_sectors[sec] = open_sectors.get(sec, 0) + 1
 
+        if candidates is not None:
+            return [c for c in candidates
+                    if open_sectors.get(config.SECTOR_MAP.get(c['symbol'], 'Other'), 0) < config.MAX_SAME_SECTOR]
+
         for symbol in config.WATCHLIST:
             try:
                 # Sector correlation check
@@ -118,5 +124,6 @@ class CreditSpreadScanner:
                    'stop_loss_price': round(opp['credit'] * (config.CS_STOP_LOSS_PCT / 100), 2), 'manual_override': False}
             self.state['credit_spreads'].append(rec)
             self.state['cs_trades_today'] += 1
+            if self.wal: self.wal.position_opened(self.state, rec)
             return rec
         return None
@@ -0,0 +1,186 @@
+"""
+PROJECT HOPE v3.0 - Dashboard Snapshot
+Background producers assemble /api/dashboard into a versioned, pre-serialized
+payload. Cheap state-derived sections refresh every tick; expensive ones
+(analytics, storage stats, earnings, IV rank, heatmap) on their own schedule
+or when their inputs change. Requests just serve the bytes, with an ETag.
+"""
+import hashlib, json, threading, time
+import config
+
+
+class DashboardSnapshot:
+    def __init__(self, engine, tick=None):
+        self.engine = engine
+        self.tick = tick or config.DASHBOARD_TICK
+        # name -> (min refresh seconds, producer, change key or None)
+        self.producers = [
+            ('account', 0, self._account, None),
+            ('positions', 0, self._positions, None),
+            ('activity', 0, self._activity, None),
+            ('greeks', 0, self._greeks, None),
+            ('screener', 0, self._screener, None),
+            ('backtest', 0, self._backtest, None),
+            ('analytics', 60, self._analytics, lambda: len(self.engine.analytics.trade_history)),
+            ('storage', 60, self._storage, lambda: self.engine.storage.save_count),
+            ('journal', 60, self._journal, lambda: len(self.engine.journal.entries)),
+            ('earnings', 60, self._earnings, None),
+            ('iv_rank', 60, self._iv_rank, None),
+            ('calendar', 300, self._calendar, None),
+            ('heatmap', 60, self._heatmap, None),
+        ]
+        self.sections = {}       # name -> payload fragment
+        self.section_versions = {}
+        self._section_json = {}  # name -> serialized fragment, for change detection
+        self._ran_at = {}
+        self._keys = {}
+        self.version = 0
+        self.etag = ''
+        self._body = b'{}'
+        self._cond = threading.Condition()
+        self._refresh_lock = threading.Lock()
+        self.running = False
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._loop, daemon=True).start()
+
+    def get(self):
+        """(version, etag, JSON bytes) of the latest snapshot"""
+        if not self.version: self.refresh()
+        with self._cond:
+            return self.version, self.etag, self._body
+
+    def get_data(self):
+        return json.loads(self.get()[2])
+
+    def wait_for_change(self, version, timeout=None):
+        """Block until the snapshot moves past `version`; returns the current version"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def changes_since(self, version, timeout=None):
+        """Wait for a newer snapshot, then return (version, {section: JSON}) for sections changed after `version`"""
+        if not self.version: self.refresh()
+        if version > self.version: version = 0  # client saw a previous engine process; resend everything
+        self.wait_for_change(version, timeout)
+        with self._cond:
+            changed = {name: self._section_json[name] for name, v in self.section_versions.items() if v > version}
+            return self.version, changed
+
+    def refresh(self, force=False):
+        """Run due producers; bump the version only if some section actually changed"""
+        with self._refresh_lock:
+            return self._refresh(force)
+
+    # ========== INTERNAL ==========
+
+    def _refresh(self, force):
+        changed = []
+        now = time.time()
+        for name, every, produce, key_fn in self.producers:
+            try:
+                key = key_fn() if key_fn else None
+                due = force or name not in self.sections or now - self._ran_at.get(name, 0) >= every
+                if key_fn and key != self._keys.get(name): due = True
+                if not due: continue
+                fragment = produce()
+                self._ran_at[name] = now; self._keys[name] = key
+                raw = json.dumps(fragment, default=str, separators=(',', ':'))
+                if raw != self._section_json.get(name):
+                    self._section_json[name] = raw
+                    self.sections[name] = fragment
+                    changed.append(name)
+            except Exception as e:
+                print(f"[SNAPSHOT ERR] {name}: {e}")
+        if changed: self._publish(changed)
+        return changed
+
+    def _publish(self, changed):
+        with self._cond:
+            self.version += 1
+            for name in changed: self.section_versions[name] = self.version
+            payload = {'snapshot_version': self.version}
+            for name, *_ in self.producers:
+                payload.update(self.sections.get(name, {}))
+            self._body = json.dumps(payload, default=str, separators=(',', ':')).encode()
+            self.etag = hashlib.sha1(self._body).hexdigest()[:20]
+            self._cond.notify_all()
+
+    def _loop(self):
+        while self.running:
+            try: self.refresh()
+            except Exception as e: print(f"[SNAPSHOT ERR] {e}")
+            time.sleep(self.tick)
+
+    # ========== PRODUCERS ==========
+
+    def _account(self):
+        st = self.engine.state; tier = self.engine.tier
+        os_ = [s for s in st['credit_spreads'] if s['status'] in ['open','pending']]
+        w=st['wins'];l=st['losses']
+        wr=round((w/(w+l))*100,1) if (w+l)>0 else 0
+        used=sum((config.CS_SPREAD_WIDTH-s['credit'])*s['contracts']*100 for s in os_)
+        return {
+            'autopilot':st['autopilot'],'connected':st['connected'],
+            'market_open':st['market_open'],'in_window':st['in_window'],
+            'vix':st['vix'],'account_value':round(config.VIRTUAL_ACCOUNT_SIZE + st.get('total_pnl', 0),2),
+            'buying_power':round(config.VIRTUAL_ACCOUNT_SIZE-used,2),
+            'daily_pnl':st['daily_pnl'],'total_pnl':st['total_pnl'],
+            'win_rate':wr,'wins':w,'losses':l,
+            'cs_trades_today':st['cs_trades_today'],
+            'consecutive_losses':st.get('consecutive_losses',0),
+            'watchlist_count':len(config.WATCHLIST),
+            'theme':st.get('theme','dark'),
+            'tier': tier, 'tier_name': tier['name'],
+            'account_id': self.engine.account['id'],
+            'overnight_hold': st.get('overnight_hold', False),
+            'auto_close': not st.get('overnight_hold', False),
+        }
+
+    def _positions(self):
+        st = self.engine.state
+        os_ = [s for s in st['credit_spreads'] if s['status'] in ['open','pending']]
+        return {'open_positions':len(os_),'credit_spreads':os_,
+                'spread_opportunities':st.get('spread_opportunities',[])}
+
+    def _activity(self):
+        return {'activity_log': self.engine.state['activity_log'][:50]}
+
+    def _greeks(self):
+        return {'portfolio_greeks': self.engine.state.get('portfolio_greeks',{})}
+
+    def _screener(self):
+        return {'screener_results': self.engine.state.get('screener_results',{})}
+
+    def _backtest(self):
+        st = self.engine.state
+        # This account's unfinished jobs from the shared pool, so progress is pushed while they run
+        jobs = [self.engine.backtest_jobs.get(j) for j in sorted(st.get('backtest_jobs', ()))]
+        return {'backtest_results':st.get('backtest_results'),'backtest_running':st.get('backtest_running',False),
+                'backtest_jobs':[{k: j[k] for k in ('id','status','progress','message')} for j in jobs if j]}
+
+    def _analytics(self):
+        return {'analytics': self.engine.analytics.get_full_report()}
+
+    def _storage(self):
+        return {'storage_stats': self.engine.storage.get_storage_stats()}
+
+    def _journal(self):
+        return {'journal_stats': self.engine.journal.get_stats()}
+
+    def _earnings(self):
+        return {'earnings': self.engine.earnings.get_data()}
+
+    def _iv_rank(self):
+        return {'iv_rank': self.engine.iv_rank.get_data()}
+
+    def _calendar(self):
+        return {'econ_calendar': self.engine.econ_cal.get_data()}
+
+    def _heatmap(self):
+        heatmap = []
+        try: heatmap = self.engine.risk.get_sector_heatmap()
+        except: pass
+        return {'sector_heatmap': heatmap}
@@ -180,9 +180,7 @@ class EarningsCalendar:
                 'source': 'manual'
             }
         if self.storage:
-            earnings_all = self.storage._read(self.storage.STORAGE_DIR + '/earnings.json') or {}
-            earnings_all[symbol] = {'date': date_str, 'timing': timing}
-            self.storage._write(self.storage.STORAGE_DIR + '/earnings.json', earnings_all)
+            self.storage.save_earnings(symbol, {'date': date_str, 'timing': timing})
 
     def get_upcoming(self, days_ahead=14):
         """Get all upcoming earnings within N days"""
@@ -1,5 +1,5 @@
 """PROJECT HOPE v3.0 FINAL - Trading Engine - All Systems Integrated"""
-import threading, time, csv, io
+import threading, time
 from datetime import datetime, date
 from tradier_api import TradierAPI
 from credit_spread_scanner import CreditSpreadScanner
@@ -8,21 +8,27 @@ from protections import Protections
 from alerts import Alerts
 from analytics import Analytics
 from greeks import GreeksDashboard
-from screener import OptionsScreener
-from backtester import Backtester
-from storage import Storage, AutoSaver
-from earnings import EarningsCalendar
-from iv_rank import IVRankCalculator
-from risk_analyzer import RiskAnalyzer
+from state_wal import StateWAL
+from storage import create_storage, StatePersister
 from journal import TradeJournal
-from economic_calendar import EconomicCalendar
+from market_data import AccountAPI, SharedServices
+from dashboard_snapshot import DashboardSnapshot
 import config
 
 class TradingEngine:
-    def __init__(self):
-        self.api = TradierAPI()
+    def __init__(self, account=None, shared=None, storage=None):
+        # account: {'id','name','tier','api_key','account_id','storage_dir'}; None = single-account config
+        # storage: an already-open Storage for this account's dir (the default account shares its own with SharedServices)
+        self.account = account or {'id': 'default', 'name': 'Default', 'tier': config.TIER}
+        self.tier = config.TIER_CONFIG.get(str(self.account.get('tier', config.TIER)).lower(), config.ACTIVE_TIER)
+        self.storage = storage or create_storage(self.account.get('storage_dir'))
+        # Market data and market-wide analytics are shared; pass one SharedServices to many engines
+        self.owns_shared = shared is None
+        self.shared = shared or SharedServices(storage=self.storage)
+        broker = TradierAPI(self.account.get('api_key'), self.account.get('account_id'))
+        self.api = AccountAPI(broker, self.shared.market)
         self.alerts = Alerts()
-        self.storage = Storage()
+        self._backtest_lock = threading.Lock()
         self.state = {
             'autopilot':True,'connected':False,'balance':{},'vix':20,
             'daily_pnl':0,'last_trade_time':None,
@@ -35,41 +41,53 @@ class TradingEngine:
             'portfolio_greeks':{'delta':0,'gamma':0,'theta':0,'vega':0,'positions':[]},
             'screener_results':{'spreads':[],'scan_time':None,'symbols_scanned':0},
             'backtest_results':None,'backtest_running':False,
+            'backtest_jobs':set(),  # ids of this account's unfinished jobs (the job pool is shared by all accounts)
+            'sweep_results':None,'sweep_running':False,
             'theme':'dark',
-            'tier': config.TIER,
+            'tier': self.account.get('tier', config.TIER),
             'auto_close': config.AUTO_CLOSE_ENABLED,
             'overnight_hold': False,  # User can toggle this on
         }
 
-        # === RESTORE SAVED STATE ===
+        # === RESTORE SAVED STATE: last snapshot + write-ahead log since ===
         saved = self.storage.load_state()
+        self.wal = StateWAL(self.storage.STORAGE_DIR, (saved or {}).get('wal_seq', 0))
         if saved:
             for key in ['credit_spreads','wins','losses',
                         'consecutive_losses','total_pnl','daily_pnl',
-                        'cs_trades_today','theme','autopilot']:
+                        'cs_trades_today','theme','autopilot','overnight_hold']:
                 if key in saved: self.state[key] = saved[key]
-            if saved.get('today','') != str(date.today()):
-                self.state.update({'cs_trades_today':0,'daily_pnl':0,'consecutive_losses':0})
-            self._log('system', f"RESTORED: {self.state['wins']}W/{self.state['losses']}L | P&L: ${self.state['total_pnl']:.2f}")
+            self.state['today'] = saved.get('today','')
+        replayed = self.wal.replay(self.state, (saved or {}).get('wal_seq', 0))
+        if saved or replayed:
+            if self.state['today'] != str(date.today()):
+                self.state.update({'cs_trades_today':0,'daily_pnl':0,'consecutive_losses':0,'today':str(date.today())})
+            self._log('system', f"RESTORED: {self.state['wins']}W/{self.state['losses']}L | P&L: ${self.state['total_pnl']:.2f}"
+                                + (f" | {replayed} WAL records replayed" if replayed else ''))
         else:
             self._log('system', 'Fresh start - no saved state')
 
         # === INIT ALL MODULES ===
-        self.spread_scanner = CreditSpreadScanner(self.api, self.state)
+        self.spread_scanner = CreditSpreadScanner(self.api, self.state, wal=self.wal)
         self.protections = Protections(self.api, self.state)
         self.analytics = Analytics(self.storage)
-        self.position_manager = PositionManager(self.api, self.state, self.alerts, self.analytics)
+        self.position_manager = PositionManager(self.api, self.state, self.alerts, self.analytics, wal=self.wal)
         self.greeks_dash = GreeksDashboard(self.api)
-        self.screener = OptionsScreener(self.api)
-        self.backtester = Backtester(self.api)
-        self.autosaver = AutoSaver(self.storage, self, interval=30)
-        self.earnings = EarningsCalendar(self.api, self.storage)
-        self.iv_rank = IVRankCalculator(self.api)
-        self.risk = RiskAnalyzer(self.api)
+        self.persister = StatePersister(self.storage, self, wal=self.wal)
         self.journal = TradeJournal(self.storage)
-        self.econ_cal = EconomicCalendar()
+        # Shared, market-wide components
+        self.screener = self.shared.screener
+        self.backtester = self.shared.backtester
+        self.sweeper = self.shared.sweeper
+        self.backtest_jobs = self.shared.backtest_jobs
+        self.earnings = self.shared.earnings
+        self.iv_rank = self.shared.iv_rank
+        self.risk = self.shared.risk
+        self.econ_cal = self.shared.econ_cal
+        self.shared.attach(self.state)
+        self.dashboard = DashboardSnapshot(self)
         self._log('system', f'Engine initialized. {len(config.WATCHLIST)} symbols. {len(self.analytics.trade_history)} trades loaded.')
-        self._log('system', f'Tier: {config.ACTIVE_TIER["name"]} | Max Positions: {config.ACTIVE_TIER["max_positions"]} | Spreads: {"YES" if config.ACTIVE_TIER["allow_spreads"] else "NO"}')
+        self._log('system', f'Account: {self.account.get("name", self.account["id"])} | Tier: {self.tier["name"]} | Max Positions: {self.tier["max_positions"]} | Spreads: {"YES" if self.tier["allow_spreads"] else "NO"}')
 
     def start(self):
         self.state['engine_running'] = True
@@ -80,13 +98,13 @@ class TradingEngine:
         else:
             self._log('alert', 'API connection - using virtual balance')
 
-        self.autosaver.start()
-        self.earnings.start_refresh_loop()
-        self.iv_rank.start_refresh_loop()
+        self.persister.start()
+        if self.owns_shared: self.shared.start()
+        self.dashboard.start()
 
         for fn in [self._position_loop, self._spread_loop,
                    self._account_loop, self._clock_loop, self._reset_loop,
-                   self._greeks_loop, self._screener_loop]:
+                   self._greeks_loop]:
             threading.Thread(target=fn, daemon=True).start()
 
         # Check economic calendar on start
@@ -95,7 +113,7 @@ class TradingEngine:
             names = ', '.join(e['event'] for e in events)
             self._log('alert', f"HIGH IMPACT DAY: {names}")
 
-        self._log('system', 'All 9 threads started + earnings + IV rank active')
+        self._log('system', 'All 6 account threads started; screener, earnings + IV rank run on the shared plane')
 
     def _position_loop(self):
         while self.state['engine_running']:
@@ -113,17 +131,17 @@ class TradingEngine:
             try:
                 if self.state['autopilot'] and self.state['market_open']:
                     # Tier check - Starter cannot trade spreads
-                    if not config.ACTIVE_TIER['allow_spreads']:
+                    if not self.tier['allow_spreads']:
                         time.sleep(config.SPREAD_SCAN_INTERVAL)
                         continue
                     # Position limit check based on tier
                     total_open = len([s for s in self.state['credit_spreads'] if s['status'] in ['open','pending']])
-                    if total_open >= config.ACTIVE_TIER['max_positions']:
+                    if total_open >= self.tier['max_positions']:
                         time.sleep(config.SPREAD_SCAN_INTERVAL)
                         continue
                     passed, reason = self.protections.check_all('spread')
                     if passed:
-                        opps = self.spread_scanner.scan()
+                        opps = self.spread_scanner.scan(candidates=self.shared.spread_candidates())
                         self.state['spread_opportunities'] = opps[:5]
                         if opps:
                             best = opps[0]
@@ -140,15 +158,15 @@ class TradingEngine:
                                     if iv_ok:
                                         # Tier spread width check
                                         spread_w = best.get('width', config.CS_SPREAD_WIDTH)
-                                        if spread_w > config.ACTIVE_TIER['max_spread_width']:
-                                            self._log('system', f"Tier {config.ACTIVE_TIER['name']}: spread too wide (${spread_w} > ${config.ACTIVE_TIER['max_spread_width']})")
+                                        if spread_w > self.tier['max_spread_width']:
+                                            self._log('system', f"Tier {self.tier['name']}: spread too wide (${spread_w} > ${self.tier['max_spread_width']})")
                                         else:
                                             result = self.spread_scanner.execute_spread(best)
                                             if result:
                                                 self.state['last_trade_time'] = datetime.now()
                                                 self._log('entry', f"SPREAD: {best['symbol']} ${best['credit']} credit")
                                                 self.alerts.send(f"NEW SPREAD: {best['symbol']}\nCredit: ${best['credit']}")
-                                                self.storage.save_state(self.state)
+                                                self.persister.flush()
                                     else:
                                         self._log('system', f"IV skip: {iv_msg}")
             except Exception as e: print(f"[SPREAD ERR] {e}")
@@ -172,24 +190,6 @@ class TradingEngine:
             except: pass
             time.sleep(15)
 
-    def _screener_loop(self):
-        while self.state['engine_running']:
-            try:
-                if self.state['market_open']:
-                    syms = config.WATCHLIST; all_sp = []; all_dr = []
-                    for i in range(0, len(syms), 20):
-                        r = self.screener.full_scan(syms[i:i+20])
-                        all_sp.extend(r.get('spreads',[]))
-                        time.sleep(2)
-                    all_sp.sort(key=lambda x:x.get('score',0), reverse=True)
-                    all_dr.sort(key=lambda x:x.get('score',0), reverse=True)
-                    self.state['screener_results'] = {
-                        'spreads':all_sp[:20],
-                        'scan_time':datetime.now().isoformat(),'symbols_scanned':len(syms),
-                        'total_spread_opps':len(all_sp)}
-            except Exception as e: print(f"[SCR ERR] {e}")
-            time.sleep(120)
-
     def _clock_loop(self):
         while self.state['engine_running']:
             try:
@@ -214,9 +214,10 @@ class TradingEngine:
                         self.state['wins'], self.state['losses'], self.state['daily_pnl'])
                     self.state.update({'today':today,'cs_trades_today':0,
                                        'daily_pnl':0,'consecutive_losses':0})
+                    self.wal.counters_reset(self.state)
                     self.state.pop('eod_closed_today', None)
                     self._log('system', f'New day: {today}')
-                    self.storage.save_state(self.state)
+                    self.persister.request()
             except: pass
             time.sleep(60)
 
@@ -243,8 +244,10 @@ class TradingEngine:
                         s['take_profit_price'] = round(fill_credit * (config.CS_TAKE_PROFIT_PCT / 100), 2)
                         s['stop_loss_price'] = round(fill_credit * (config.CS_STOP_LOSS_PCT / 100), 2)
                         self._log('system', f"FILL: {s['symbol']} credit ${fill_credit} (quoted ${s['quoted_credit']})")
-                elif status in ['rejected', 'canceled']:
+                    self.wal.status_changed(s)
+                elif status in ['rejected', 'canceled'] and s['status'] != 'rejected':
                     s['status'] = 'rejected'
+                    self.wal.status_changed(s)
         except Exception as e: print(f"[SYNC ERR] {e}")
 
     def _get_fill_credit(self, order):
@@ -290,96 +293,137 @@ class TradingEngine:
                 return
             # Credit spreads managed by position_manager, no EOD force-close needed
             self.state['eod_closed_today'] = True
-            self.storage.save_state(self.state)
+            self.persister.request()
 
     def toggle_autopilot(self):
         self.state['autopilot'] = not self.state['autopilot']
+        self.wal.field_set('autopilot', self.state['autopilot'])
         s = "ON" if self.state['autopilot'] else "OFF"
         self._log('system', f'Autopilot {s}'); self.alerts.send(f"Autopilot {s}")
-        self.storage.save_state(self.state)
+        self.persister.request()
         return self.state['autopilot']
 
     def toggle_overnight(self):
         self.state['overnight_hold'] = not self.state.get('overnight_hold', False)
+        self.wal.field_set('overnight_hold', self.state['overnight_hold'])
         s = "ON" if self.state['overnight_hold'] else "OFF"
         self._log('system', f'Overnight hold {s} — {"positions will NOT auto-close at 3:55 PM" if self.state["overnight_hold"] else "positions WILL auto-close at 3:55 PM"}')
-        self.storage.save_state(self.state)
+        self.persister.request()
         return self.state['overnight_hold']
 
     def set_theme(self, theme):
         self.state['theme'] = theme
-        self.storage.save_state(self.state)
+        self.wal.field_set('theme', theme)
+        self.persister.request()
 
-    def run_backtest(self, symbol='SPY', days=365):
-        self.state['backtest_running'] = True
-        try:
-            r = self.backtester.run_credit_spread_backtest(symbol, days)
+    def close_position(self, trade_id, ttype='spread'):
+        r = self.position_manager.manual_close_position(trade_id, ttype)
+        self.persister.flush()
+        return r
+
+    def toggle_override(self, trade_id, ttype='spread'):
+        return self.position_manager.toggle_manual_override(trade_id, ttype)
+
+    def close_all(self):
+        c = 0
+        for s in self.state['credit_spreads']:
+            if s['status'] == 'open': self.position_manager.manual_close_position(s['order_id'],'spread'); c += 1
+        self.persister.flush()
+        return c
+
+    def reset_breaker(self):
+        self.state['consecutive_losses'] = 0
+        self.wal.field_set('consecutive_losses', 0)
+        self._log('system', 'Loss breaker reset')
+        return True
+
+    def save_state(self):
+        return self.persister.flush()
+
+    def get_state_value(self, key, default=None):
+        return self.state.get(key, default)
+
+    def get_risk(self):
+        return self.risk.stress_test(self.state)
+
+    def get_correlations(self):
+        open_syms = [s['symbol'] for s in self.state['credit_spreads'] if s['status'] in ['open','pending']]
+        if not open_syms: open_syms = ['SPY','QQQ','AAPL','MSFT','NVDA']
+        return self.risk.calculate_correlations(list(set(open_syms)))
+
+    def start_backtest(self, symbol='SPY', days=365, model='simple', robust=True):
+        """Queue a backtest job; returns the job (status, progress, key). model: 'simple' (21-day low vs
+        short strike), 'path' (daily repricing with the live exit rules), 'portfolio' (whole watchlist
+        under the live protections) or 'archive' (live scanner on recorded chains); the last two ignore
+        symbol. robust attaches bootstrap confidence intervals"""
+        # Held until the id is recorded, so a job that finishes at once can't be discarded before it is added
+        with self._backtest_lock:
+            job = self.backtest_jobs.submit(model, symbol, days, robust, on_done=self._backtest_done)
+            self.state['backtest_jobs'].add(job['id'])
+            self.state['backtest_running'] = True
+        return job
+
+    def get_backtest_status(self, job_id=None, wait=0):
+        """One job with its result, or the latest result plus every job"""
+        if job_id: return self.backtest_jobs.get(job_id, wait=min(float(wait or 0), 5))
+        return {'results': self.state.get('backtest_results'), 'running': self.state['backtest_running'],
+                'jobs': self.backtest_jobs.list(), 'stats': self.backtest_jobs.get_stats()}
+
+    def cancel_backtest(self, job_id):
+        return self.backtest_jobs.cancel(job_id)
+
+    def run_backtest(self, symbol='SPY', days=365, model='simple', robust=True):
+        """Run a backtest job and wait for it"""
+        job = self.start_backtest(symbol, days, model, robust)
+        while True:
+            job = self.backtest_jobs.get(job['id'], wait=1)
+            if job['status'] in ('done', 'error', 'cancelled'): return job['result'] or {'error': job['message']}
+
+    def _backtest_done(self, job):
+        r = job['result'] or {'error': job['message']}
+        with self._backtest_lock:
+            self.state['backtest_jobs'].discard(job['id'])
             self.state['backtest_results'] = r
-            if 'error' not in r:
-                self.storage.save_backtest(r)
-                self._log('system', f"Backtest: {r['win_rate']}% WR | ${r['total_pnl']} | Sharpe {r['sharpe']}")
+            self.state['backtest_running'] = bool(self.state['backtest_jobs'])
+        if job['status'] == 'done' and not job['cached']:
+            self.storage.save_backtest(r)
+            self._log('system', f"Backtest: {r['win_rate']}% WR | ${r['total_pnl']} | Sharpe {r.get('sharpe', '-')}")
+
+    def start_sweep(self, symbols=None, days=365, space=None, mode='grid', samples=None, rank_by='sharpe'):
+        """Kick off a parameter sweep thread; returns False if one is already running"""
+        if self.state.get('sweep_running'): return False
+        self.sweeper.combos(space, mode, samples)  # raise on a bad grid before the thread starts
+        self.state['sweep_running'] = True
+        threading.Thread(target=self.run_sweep, args=(symbols, days, space, mode, samples, rank_by), daemon=True).start()
+        return True
+
+    def get_sweep_status(self):
+        return {'results': self.state.get('sweep_results'), 'running': self.state.get('sweep_running', False)}
+
+    def run_sweep(self, symbols=None, days=365, space=None, mode='grid', samples=None, rank_by='sharpe'):
+        self.state['sweep_running'] = True
+        try:
+            r = self.sweeper.run(symbols, days, space, mode, samples, rank_by=rank_by)
+            self.state['sweep_results'] = r
+            if 'error' not in r and r['ranked']:
+                best = r['ranked'][0]
+                self._log('system', f"Sweep: {r['combos']} combos x {len(r['symbols'])} symbols | best {rank_by} {best[rank_by]}")
         except Exception as e:
-            self.state['backtest_results'] = {'error': str(e)}
-        self.state['backtest_running'] = False
-        return self.state['backtest_results']
-
-    def export_trades_csv(self):
-        """Export all trades to CSV string"""
-        history = self.storage.load_trade_history()
-        if not history: return ""
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['Date','Symbol','Type','Direction','Entry','Exit','P&L','Reason','Setup'])
-        for t in history:
-            writer.writerow([
-                t.get('closed_at','')[:10], t.get('symbol',''), t.get('type',''),
-                t.get('direction',''), t.get('entry_price',''), t.get('exit_price',''),
-                t.get('pnl',0), t.get('close_reason',''), t.get('setup_type',''),
-            ])
-        return output.getvalue()
+            self.state['sweep_results'] = {'error': str(e)}
+        self.state['sweep_running'] = False
+        return self.state['sweep_results']
 
     def get_dashboard_data(self):
-        vv = config.VIRTUAL_ACCOUNT_SIZE + self.state.get('total_pnl', 0)
-        os_ = [s for s in self.state['credit_spreads'] if s['status'] in ['open','pending']]
-        w=self.state['wins'];l=self.state['losses']
-        wr=round((w/(w+l))*100,1) if (w+l)>0 else 0
-        used=sum((config.CS_SPREAD_WIDTH-s['credit'])*s['contracts']*100 for s in os_)
-        
-        # Sector heatmap (cached, only refresh occasionally)
-        heatmap = []
-        try: heatmap = self.risk.get_sector_heatmap()
-        except: pass
-
-        return {
-            'autopilot':self.state['autopilot'],'connected':self.state['connected'],
-            'market_open':self.state['market_open'],'in_window':self.state['in_window'],
-            'vix':self.state['vix'],'account_value':round(vv,2),
-            'buying_power':round(config.VIRTUAL_ACCOUNT_SIZE-used,2),
-            'daily_pnl':self.state['daily_pnl'],'total_pnl':self.state['total_pnl'],
-            'open_positions':len(os_),'win_rate':wr,'wins':w,'losses':l,
-            'credit_spreads':os_,
-            'spread_opportunities':self.state.get('spread_opportunities',[]),
-                        'activity_log':self.state['activity_log'][:50],
-            'cs_trades_today':self.state['cs_trades_today'],
-            'consecutive_losses':self.state.get('consecutive_losses',0),
-            'portfolio_greeks':self.state.get('portfolio_greeks',{}),
-            'screener_results':self.state.get('screener_results',{}),
-            'backtest_results':self.state.get('backtest_results'),
-            'backtest_running':self.state.get('backtest_running',False),
-            'analytics':self.analytics.get_full_report(),
-            'watchlist_count':len(config.WATCHLIST),
-            'storage_stats':self.storage.get_storage_stats(),
-            'earnings':self.earnings.get_data(),
-            'iv_rank':self.iv_rank.get_data(),
-            'econ_calendar':self.econ_cal.get_data(),
-            'journal_stats':self.journal.get_stats(),
-            'sector_heatmap':heatmap,
-            'theme':self.state.get('theme','dark'),
-            'tier': config.ACTIVE_TIER,
-            'tier_name': config.ACTIVE_TIER['name'],
-            'overnight_hold': self.state.get('overnight_hold', False),
-            'auto_close': not self.state.get('overnight_hold', False),
-        }
+        return self.dashboard.get_data()
+
+    def dashboard_snapshot(self, etag=None):
+        """(version, etag, body) of the pre-serialized dashboard; body is None if the caller's etag is current"""
+        version, cur, body = self.dashboard.get()
+        return version, cur, (None if etag == cur else body)
+
+    def dashboard_changes(self, since_version=0, timeout=15):
+        """Sections changed since a snapshot version, for the /api/stream push channel"""
+        return self.dashboard.changes_since(since_version, timeout)
 
     def _log(self, lt, msg):
         self.state['activity_log'].insert(0, {'time':datetime.now().strftime('%H:%M:%S'),'type':lt,'message':msg})
@@ -0,0 +1,276 @@
+"""
+PROJECT HOPE v3.0 - Engine Bridge
+Runs the trading engines as their own process and serves them over a local socket
+Web workers read each engine's pre-serialized dashboard snapshot and forward commands here,
+so gunicorn can run N workers without starting N trading engines
+
+Start the engine:   python engine_bridge.py
+Start the web tier: HOPE_ENGINE_MODE=remote gunicorn app:app --workers 4
+
+`python engine_bridge.py` is a small supervisor: it runs the engines in a child process
+(`--serve`) and restarts that child if it dies. SIGTERM/SIGINT are passed on, and the child
+stops the engines and writes their final state before exiting.
+
+The socket is a unix socket only its owner can open (0600). Connections authenticate with
+HOPE_ENGINE_AUTHKEY, or when that is unset, a random key the engine writes to an owner-only
+key file at startup and the workers read from it.
+"""
+import json
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+import config
+import storage
+
+# Only these engine paths can be called from the web tier
+EXPOSED = {
+    'get_dashboard_data', 'dashboard_snapshot', 'dashboard_changes', 'toggle_autopilot', 'toggle_overnight', 'set_theme',
+    'close_position', 'toggle_override', 'close_all', 'reset_breaker', 'save_state',
+    'get_state_value', 'get_risk', 'get_correlations', 'start_backtest', 'get_backtest_status',
+    'cancel_backtest', 'start_sweep', 'get_sweep_status',
+    'analytics.get_full_report', 'analytics.get_rolling', 'analytics.get_series', 'analytics.query',
+    'storage.get_storage_stats', 'storage.query_trades', 'storage.load_daily_logs',
+    'storage.save_agreement', 'storage.load_agreements', 'storage.search_agreements', 'storage.symbol_stats',
+    'earnings.get_data', 'earnings.add_manual_earnings',
+    'iv_rank.get_data', 'iv_rank.get_top_iv_symbols',
+    'risk.get_sector_heatmap',
+    'journal.get_data', 'journal.add_entry', 'journal.update_entry',
+    'econ_cal.get_data',
+}
+# Hub-level calls that aren't tied to one account
+HUB_EXPOSED = {'list_accounts', 'get_market_stats'}
+
+
+class UnknownAccount(LookupError):
+    """No engine for the requested account id (the web tier's 404); the only error re-raised by type across the socket"""
+
+
+def socket_path():
+    return config.ENGINE_SOCKET or os.path.join(storage.STORAGE_DIR, 'engine.sock')
+
+
+def key_path():
+    return config.ENGINE_AUTHKEY_FILE or os.path.join(storage.STORAGE_DIR, 'engine.key')
+
+
+def _new_authkey():
+    """Random per-start key, written owner-only for the web workers"""
+    key = secrets.token_hex(32)
+    path = key_path()
+    try: os.unlink(path)  # O_CREAT's mode only applies to a new file
+    except FileNotFoundError: pass
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w') as f: f.write(key)
+    return key.encode()
+
+
+def _read_authkey():
+    try:
+        with open(key_path()) as f: return f.read().strip().encode()
+    except OSError as e:
+        raise ConnectionError(f'Engine authkey unavailable (set HOPE_ENGINE_AUTHKEY or start the engine): {e}')
+
+
+class EngineServer:
+    """Serves engine calls, including each account's dashboard snapshot, on a local socket"""
+
+    def __init__(self, hub, address=None, authkey=None):
+        self.hub = hub
+        self.address = address or socket_path()
+        self.authkey = authkey or config.ENGINE_AUTHKEY or _new_authkey()
+        self.running = False
+
+    def start(self):
+        self.running = True
+        if os.path.exists(self.address): os.unlink(self.address)  # stale socket from a previous run
+        umask = os.umask(0o177)  # created 0600, no window where others can connect
+        try: self._listener = Listener(self.address, family='AF_UNIX', authkey=self.authkey)
+        finally: os.umask(umask)
+        os.chmod(self.address, 0o600)
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        print(f"[BRIDGE] Engine serving on {self.address}")
+
+    def stop(self):
+        self.running = False
+        try: self._listener.close()
+        except: pass
+
+    # ========== INTERNAL ==========
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn = self._listener.accept()
+            except Exception as e:
+                if self.running: print(f"[BRIDGE ERR] accept: {e}")
+                continue
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        with conn:
+            while self.running:
+                try:
+                    account_id, path, args, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    conn.send(('ok', self._dispatch(account_id, path, args, kwargs)))
+                except UnknownAccount as e:
+                    conn.send(('unknown_account', str(e)))
+                except Exception as e:
+                    conn.send(('error', f"{type(e).__name__}: {e}"))
+
+    def _dispatch(self, account_id, path, args, kwargs):
+        if path in HUB_EXPOSED: return getattr(self.hub, path)(*args, **kwargs)
+        if path not in EXPOSED: raise PermissionError(f"{path} is not exposed")
+        target = self.hub.get(account_id)
+        for part in path.split('.'): target = getattr(target, part)
+        return target(*args, **kwargs)
+
+
+class EngineClient:
+    """Web-tier stand-in for MultiAccountEngine; `hub.get(acct).journal.get_data()` becomes an RPC"""
+
+    def __init__(self, address=None, authkey=None):
+        self.address = address or socket_path()
+        self.authkey = authkey or config.ENGINE_AUTHKEY  # empty: read the engine's key file per connect
+        self._local = threading.local()
+        self._snapshots = {}  # account -> (version, etag, body); lets workers skip unchanged transfers
+
+    def get(self, account_id=None):
+        return _AccountClient(self, account_id)
+
+    def list_accounts(self):
+        return self.call(None, 'list_accounts')
+
+    def get_market_stats(self):
+        return self.call(None, 'get_market_stats')
+
+    def call(self, account_id, path, *args, **kwargs):
+        # One retry so a restarted engine process doesn't fail the first request
+        for attempt in range(2):
+            conn = self._conn()
+            try:
+                conn.send((account_id, path, args, kwargs))
+                status, result = conn.recv()
+                break
+            except (EOFError, OSError):
+                self._drop()
+                if attempt: raise ConnectionError('Engine process unavailable')
+        if status == 'unknown_account': raise UnknownAccount(result)
+        if status == 'error': raise RuntimeError(result)
+        return result
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            try:
+                conn = Client(self.address, family='AF_UNIX', authkey=self.authkey or _read_authkey())
+            except (OSError, AuthenticationError) as e:  # not up yet, or restarted with a new key
+                raise ConnectionError(f'Engine process unavailable: {e}')
+            self._local.conn = conn
+        return conn
+
+    def _drop(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn:
+            try: conn.close()
+            except: pass
+
+
+class _AccountClient:
+    """One account's engine as seen from a web worker"""
+
+    def __init__(self, client, account_id):
+        self._client = client; self._account = account_id
+
+    def call(self, path, *args, **kwargs):
+        return self._client.call(self._account, path, *args, **kwargs)
+
+    def dashboard_snapshot(self):
+        """(version, etag, body) of the engine's dashboard; bytes only cross the socket when they changed"""
+        cached = self._client._snapshots.get(self._account)
+        version, etag, body = self.call('dashboard_snapshot', cached[1] if cached else None)
+        if body is None: return cached
+        self._client._snapshots[self._account] = (version, etag, body)
+        return version, etag, body
+
+    def get_dashboard_data(self):
+        return json.loads(self.dashboard_snapshot()[2])
+
+    def __getattr__(self, name):
+        if name.startswith('_'): raise AttributeError(name)
+        return _RemotePath(self, name)
+
+
+class _RemotePath:
+    def __init__(self, account_client, path):
+        self._account_client = account_client; self._path = path
+
+    def __getattr__(self, name):
+        if name.startswith('_'): raise AttributeError(name)
+        return _RemotePath(self._account_client, f"{self._path}.{name}")
+
+    def __call__(self, *args, **kwargs):
+        return self._account_client.call(self._path, *args, **kwargs)
+
+
+# ========== PROCESS ==========
+
+def pid_path():
+    return os.path.join(storage.STORAGE_DIR, 'engine.pid')
+
+
+def _on_stop_signals(handler):
+    for sig in (signal.SIGTERM, signal.SIGINT): signal.signal(sig, handler)
+
+
+def serve():
+    """Run the engines and serve them until SIGTERM/SIGINT, then stop them with a final state write"""
+    from accounts import MultiAccountEngine
+    stop = threading.Event()
+    _on_stop_signals(lambda *_: stop.set())
+    hub = MultiAccountEngine()
+    hub.start()
+    server = EngineServer(hub)
+    server.start()
+    stop.wait()
+    print("[BRIDGE] Stopping engines")
+    server.stop()
+    hub.stop()
+
+
+def supervise():
+    """Restart loop around `engine_bridge.py --serve`; backs off while the child keeps dying young"""
+    stop = threading.Event()
+    proc = {'child': None}
+    def on_stop(*_):
+        stop.set()
+        if proc['child'] and proc['child'].poll() is None: proc['child'].terminate()
+    _on_stop_signals(on_stop)
+    with open(pid_path(), 'w') as f: f.write(str(os.getpid()))
+    backoff = 1
+    try:
+        while not stop.is_set():
+            started = time.time()
+            proc['child'] = child = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve'])
+            if stop.is_set(): child.terminate()  # signal landed before the child existed
+            code = child.wait()
+            if stop.is_set(): break
+            backoff = 1 if time.time() - started > 60 else min(backoff * 2, 60)
+            print(f"[BRIDGE ERR] Engine process exited ({code}); restarting in {backoff}s")
+            stop.wait(backoff)
+    finally:
+        try: os.unlink(pid_path())
+        except OSError: pass
+
+
+if __name__ == '__main__':
+    serve() if '--serve' in sys.argv[1:] else supervise()
@@ -0,0 +1,18 @@
+"""PROJECT HOPE v3.0 - Gunicorn Hooks (loaded automatically from the working directory)"""
+
+
+def post_worker_init(worker):
+    # Engines (or the bridge client) start once the worker is up, not when app.py is imported
+    from app import create_hub
+    create_hub()
+
+
+def on_exit(server):
+    # render.yaml runs the engine supervisor next to gunicorn; stop it with the web tier so the
+    # engines write their final state instead of being killed with the container
+    import os, signal, config
+    if config.ENGINE_MODE != 'remote': return
+    from engine_bridge import pid_path
+    try:
+        with open(pid_path()) as f: os.kill(int(f.read()), signal.SIGTERM)
+    except (OSError, ValueError): pass
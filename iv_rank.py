@@ -2,10 +2,123 @@
 PROJECT HOPE v3.0 - IV Rank Calculator
 Calculates per-symbol IV Rank and IV Percentile
 IV Rank = (Current IV - 52wk Low IV) / (52wk High IV - 52wk Low IV)
+
+The 52-week IV range is estimated from realized vol over rolling 21-close windows.
+RealizedVolSeries keeps each symbol's windows with running sums of returns and squared
+returns, persisted to disk: a new daily bar costs O(1), and symbols that need a full
+rebuild are computed together as one padded cumulative-sum matrix.
 """
-import threading, time
+import bisect, json, math, os, threading, time
 from datetime import datetime
+import numpy as np
 import config
+import storage
+
+WINDOW = 21        # closes per realized-vol window (20 returns)
+IV_PREMIUM = 1.15  # IV typically trades at ~1.1-1.3x realized vol
+
+
+def rolling_ivs(closes):
+    """IV estimates for every 21-close window of each row: annualized sample stdev of the
+    window's 20 log returns, times IV_PREMIUM
+
+    closes: one series or a list of them (any lengths). Window i covers closes[i-21:i] for
+    i in 21..len-1 (the window ending at the latest close is not included). Sums of returns
+    and squared returns come from cumulative sums, so each window costs O(1) and all rows
+    are computed in one pass. Returns a list of arrays.
+    """
+    rows = [np.asarray(c, dtype=float) for c in ([closes] if np.ndim(closes[0]) == 0 else closes)] if len(closes) else []
+    if not rows: return []
+    k = WINDOW - 1
+    c = np.full((len(rows), max(len(r) for r in rows)), np.nan)
+    for i, r in enumerate(rows): c[i, :len(r)] = r
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = np.log(c[:, 1:] / c[:, :-1])
+    # Shift by each row's mean return before summing so the variance doesn't cancel
+    valid = np.isfinite(r)
+    shift = np.where(valid, r, 0).sum(axis=1, keepdims=True) / np.maximum(valid.sum(axis=1, keepdims=True), 1)
+    x = np.where(valid, r - shift, 0)
+    s1 = np.concatenate([np.zeros((len(rows), 1)), np.cumsum(x, axis=1)], axis=1)
+    s2 = np.concatenate([np.zeros((len(rows), 1)), np.cumsum(x * x, axis=1)], axis=1)
+    w1 = s1[:, k:] - s1[:, :-k]; w2 = s2[:, k:] - s2[:, :-k]
+    ivs = np.sqrt(np.maximum((w2 - w1 * w1 / k) / (k - 1), 0) * 252) * IV_PREMIUM
+    return [ivs[i, :max(0, len(row) - WINDOW)] for i, row in enumerate(rows)]
+
+
+def _window_iv(s1, s2):
+    k = WINDOW - 1
+    return math.sqrt(max((s2 - s1 * s1 / k) / (k - 1), 0) * 252) * IV_PREMIUM
+
+
+class RealizedVolSeries:
+    """Per-symbol realized-vol IV series kept current bar by bar and saved between runs"""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(storage.STORAGE_DIR, 'iv_series.json')
+        self._lock = threading.Lock()
+        self.series = {}  # symbol -> {'dates', 'closes', 'ivs', 's1', 's2'}; s1/s2 sum the last 20 returns
+        self.appended = 0; self.rebuilt = 0
+        self.load()
+
+    def get(self, symbol, history):
+        """IV estimates for this history's windows (updated from it first)"""
+        self.update_many({symbol: history})
+        with self._lock:
+            st = self.series.get(symbol)
+            return list(st['ivs']) if st and len(st['closes']) >= 30 else []
+
+    def update_many(self, histories):
+        """Bring every symbol's series up to its history: new bars are O(1) each, the rest rebuild together"""
+        rebuild = {}
+        with self._lock:
+            for symbol, history in histories.items():
+                bars = [(d.get('date', ''), d.get('close', 0)) for d in history or [] if d.get('close', 0) > 0]
+                if not self._extend(symbol, bars): rebuild[symbol] = bars
+            if rebuild:
+                for (symbol, bars), ivs in zip(rebuild.items(), rolling_ivs([[c for _, c in b] for b in rebuild.values()])):
+                    closes = [c for _, c in bars]
+                    rets = [math.log(closes[j] / closes[j - 1]) for j in range(max(1, len(closes) - WINDOW + 1), len(closes))]
+                    self.series[symbol] = {'dates': [d for d, _ in bars], 'closes': closes, 'ivs': ivs.tolist(),
+                                           's1': sum(rets), 's2': sum(r * r for r in rets)}
+                self.rebuilt += len(rebuild)
+        return {'rebuilt': len(rebuild), 'symbols': len(histories)}
+
+    def _extend(self, symbol, bars):
+        """Line the stored series up with `bars`, drop bars that aged out and append new ones"""
+        st = self.series.get(symbol)
+        if not st or not bars or not st['dates']: return False
+        dates, closes = st['dates'], st['closes']
+        a = bisect.bisect_left(dates, bars[0][0])  # first stored bar still in the history
+        overlap = len(dates) - a
+        # Same bars at both ends of the overlap (a split or revision changes the closes)
+        if overlap < WINDOW or overlap > len(bars) or dates[a] != bars[0][0] or closes[a] != bars[0][1] \
+                or dates[-1] != bars[overlap - 1][0] or closes[-1] != bars[overlap - 1][1]:
+            return False
+        if a:
+            del dates[:a]; del closes[:a]; del st['ivs'][:a]
+        k = WINDOW - 1
+        for d, c in bars[overlap:]:
+            # The window of the last 20 returns becomes an IV point once a newer close exists
+            st['ivs'].append(_window_iv(st['s1'], st['s2']))
+            r_new = math.log(c / closes[-1]); r_old = math.log(closes[-k] / closes[-k - 1])
+            st['s1'] += r_new - r_old; st['s2'] += r_new * r_new - r_old * r_old
+            dates.append(d); closes.append(c); self.appended += 1
+        return True
+
+    def load(self):
+        try:
+            with open(self.path) as f: self.series = json.load(f)
+        except (OSError, ValueError): self.series = {}
+
+    def save(self):
+        try:
+            with self._lock: blob = json.dumps(self.series, separators=(',', ':'))
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w') as f: f.write(blob)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"[IV RANK ERR] save series: {e}")
+
 
 class IVRankCalculator:
     def __init__(self, api):
@@ -13,6 +126,7 @@ class IVRankCalculator:
         self.iv_data = {}  # symbol -> {current_iv, high_iv, low_iv, rank, percentile}
         self._lock = threading.Lock()
         self.last_refresh = None
+        self.vol = RealizedVolSeries()
 
     def start_refresh_loop(self):
         threading.Thread(target=self._refresh_loop, daemon=True).start()
@@ -31,6 +145,17 @@ class IVRankCalculator:
         symbols = list(config.WATCHLIST)
         random.shuffle(symbols)  # Vary order each cycle
         
+        # Histories first (I/O), then every symbol's vol series in one batch
+        histories = {}
+        for symbol in symbols:
+            misses = getattr(self.api, 'misses', None)  # MarketData's counter: unchanged on a cache hit
+            try: histories[symbol] = self.api.get_history(symbol, 365)
+            except Exception: pass
+            # Paced like the loop below: the Tradier client is shared with live quotes and orders
+            if getattr(self.api, 'misses', 0) != misses: time.sleep(0.3)
+        self.vol.update_many(histories)
+        self.vol.save()
+
         updated = 0
         for symbol in symbols:
             try:
@@ -81,7 +206,7 @@ class IVRankCalculator:
         if not history or len(history) < 60: return None
         
         # Estimate IV from historical realized volatility windows
-        ivs = self._estimate_historical_ivs(history)
+        ivs = self.vol.get(symbol, history)
         if not ivs or len(ivs) < 10: return None
         
         high_iv = max(ivs)
@@ -122,28 +247,6 @@ class IVRankCalculator:
                 if iv > 0: best = iv
         return best
 
-    def _estimate_historical_ivs(self, history):
-        """Estimate implied volatility from realized vol over rolling 21-day windows"""
-        import math
-        ivs = []
-        closes = [d.get('close', 0) for d in history if d.get('close', 0) > 0]
-        if len(closes) < 30: return ivs
-        
-        for i in range(21, len(closes)):
-            window = closes[i-21:i]
-            returns = []
-            for j in range(1, len(window)):
-                if window[j-1] > 0:
-                    returns.append(math.log(window[j] / window[j-1]))
-            if len(returns) < 10: continue
-            avg = sum(returns) / len(returns)
-            variance = sum((r - avg)**2 for r in returns) / (len(returns) - 1)
-            realized_vol = math.sqrt(variance * 252)
-            # IV typically trades at ~1.1-1.3x realized vol
-            ivs.append(realized_vol * 1.15)
-        
-        return ivs
-
     def get_iv_rank(self, symbol):
         """Get IV rank for a specific symbol"""
         with self._lock:
@@ -13,17 +13,17 @@ class TradeJournal:
     def _load(self):
         """Load journal from storage"""
         try:
-            data = self.storage._read(self.storage.STORAGE_DIR + '/journal.json')
+            data = self.storage.load_journal()
             if data:
                 self.entries = data
                 print(f"[JOURNAL] Loaded {len(self.entries)} entries")
         except:
             self.entries = []
 
-    def _save(self):
-        """Save journal to storage"""
+    def _save(self, entry):
+        """Save one journal entry to storage"""
         try:
-            self.storage._write(self.storage.STORAGE_DIR + '/journal.json', self.entries)
+            self.storage.save_journal_entry(entry)
         except Exception as e:
             print(f"[JOURNAL ERR] Save: {e}")
 
@@ -49,7 +49,7 @@ class TradeJournal:
             'screenshot_note': data.get('screenshot_note', ''),
         }
         self.entries.append(entry)
-        self._save()
+        self._save(entry)
         return entry
 
     def add_auto_entry(self, trade_data, close_reason):
@@ -74,7 +74,7 @@ class TradeJournal:
             'needs_review': True,  # Flag for user to add notes later
         }
         self.entries.append(entry)
-        self._save()
+        self._save(entry)
         return entry
 
     def update_entry(self, entry_id, updates):
@@ -83,7 +83,7 @@ class TradeJournal:
             if entry.get('id') == entry_id:
                 entry.update(updates)
                 entry['updated_at'] = datetime.now().isoformat()
-                self._save()
+                self._save(entry)
                 return entry
         return None
 
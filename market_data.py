@@ -0,0 +1,265 @@
+"""
+PROJECT HOPE v3.0 - Shared Market-Data Plane
+One cached view of Tradier market data plus the market-wide analytics
+(IV rank, earnings, screener, risk, backtests) shared by every account.
+Each account keeps its own broker connection for balances and orders.
+"""
+import threading, time
+from datetime import datetime
+from tradier_api import TradierAPI
+from credit_spread_scanner import CreditSpreadScanner
+from screener import OptionsScreener
+from backtester import Backtester
+from backtest_jobs import BacktestJobs
+from sweep import ParameterSweep
+from earnings import EarningsCalendar
+from iv_rank import IVRankCalculator
+from risk_analyzer import RiskAnalyzer
+from economic_calendar import EconomicCalendar
+from storage import create_storage
+from chain_archive import ChainArchive
+import config
+
+
+class MarketData:
+    """TTL cache in front of TradierAPI market endpoints, with single-flight fetches"""
+
+    def __init__(self, api, archive=None):
+        self.api = api
+        self.archive = archive  # ChainArchive: records every chain actually fetched
+        self._cache = {}        # key -> (expires_at, value)
+        self._inflight = {}     # key -> Lock, so concurrent misses fetch once
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_quote(self, symbol):
+        return self.get_quotes([symbol]).get(symbol)
+
+    def get_quotes(self, symbols):
+        if not symbols: return {}
+        result = {}; missing = []
+        now = time.time()
+        with self._lock:
+            for s in symbols:
+                hit = self._cache.get(('quote', s))
+                if hit and hit[0] > now: result[s] = hit[1]; self.hits += 1
+                else: missing.append(s)
+        if missing:
+            fresh = self.api.get_quotes_batch(missing) if len(missing) > 1 else self._single_quote(missing[0])
+            exp = time.time() + config.MARKET_QUOTE_TTL
+            with self._lock:
+                self.misses += len(missing)
+                for s, q in fresh.items(): self._cache[('quote', s)] = (exp, q)
+            result.update(fresh)
+        return result
+
+    def get_quotes_batch(self, symbols):
+        return self.get_quotes(symbols)
+
+    def get_vix(self):
+        q = self.get_quote('VIX')
+        return q.get('last', 20) if q else 20
+
+    def get_option_chain(self, symbol, expiration):
+        return self._cached(('chain', symbol, expiration), config.MARKET_CHAIN_TTL,
+                            lambda: self._fetch_chain(symbol, expiration))
+
+    def get_option_expirations(self, symbol):
+        return self._cached(('exps', symbol), config.MARKET_EXPIRATIONS_TTL,
+                            lambda: self.api.get_option_expirations(symbol))
+
+    def get_history(self, symbol, days=365):
+        return self._cached(('history', symbol, days), config.MARKET_HISTORY_TTL,
+                            lambda: self.api.get_history(symbol, days))
+
+    def find_expiration_in_range(self, symbol, min_dte, max_dte):
+        exps = self.get_option_expirations(symbol)
+        today = datetime.now().date()
+        for exp_str in exps:
+            try:
+                dte = (datetime.strptime(exp_str, '%Y-%m-%d').date() - today).days
+                if min_dte <= dte <= max_dte: return exp_str, dte
+            except: continue
+        return None, None
+
+    def get_stats(self):
+        total = self.hits + self.misses
+        return {'entries': len(self._cache), 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': round(self.hits / total * 100, 1) if total else 0,
+                'archive': self.archive.get_stats() if self.archive else None}
+
+    def __getattr__(self, name):
+        # Anything not cached (e.g. earnings' raw _get) goes straight to Tradier
+        return getattr(self.api, name)
+
+    # ========== INTERNAL ==========
+
+    def _fetch_chain(self, symbol, expiration):
+        chain = self.api.get_option_chain(symbol, expiration)
+        if chain and self.archive:
+            try:
+                hit = self._cache.get(('quote', symbol))
+                self.archive.record(symbol, expiration, chain, underlying=hit[1].get('last') if hit else None)
+            except Exception as e:
+                print(f"[ARCHIVE ERR] {symbol} {expiration}: {e}")
+        return chain
+
+    def _single_quote(self, symbol):
+        q = self.api.get_quote(symbol)
+        return {symbol: q} if q else {}
+
+    def _cached(self, key, ttl, fetch):
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit and hit[0] > time.time():
+                self.hits += 1
+                return hit[1]
+            flight = self._inflight.setdefault(key, threading.Lock())
+        with flight:
+            # Another thread may have filled it while we waited
+            with self._lock:
+                hit = self._cache.get(key)
+                if hit and hit[0] > time.time():
+                    self.hits += 1
+                    return hit[1]
+            value = fetch()
+            with self._lock:
+                self.misses += 1
+                if value: self._cache[key] = (time.time() + ttl, value)
+                self._inflight.pop(key, None)
+                if len(self._cache) > config.MARKET_CACHE_MAX_ENTRIES: self._evict()
+            return value
+
+    def _evict(self):
+        now = time.time()
+        for k in [k for k, v in self._cache.items() if v[0] <= now]: del self._cache[k]
+
+
+class AccountAPI:
+    """Per-account API: orders and balances go to the account's broker, market reads to the shared plane"""
+    BROKER_METHODS = {'get_account_balance', 'get_positions', 'get_orders', 'buy_option',
+                      'sell_option', 'place_credit_spread', 'close_credit_spread', 'account_id'}
+
+    def __init__(self, broker, market):
+        self.broker = broker
+        self.market = market
+
+    def __getattr__(self, name):
+        return getattr(self.broker if name in self.BROKER_METHODS else self.market, name)
+
+
+class SharedServices:
+    """Market-wide components built once and handed to every TradingEngine"""
+
+    def __init__(self, api=None, storage=None):
+        """storage: the default account's Storage (root dir); one instance per root keeps a single set of log writers"""
+        self.api = api or TradierAPI()
+        self.archive = ChainArchive() if config.CHAIN_ARCHIVE_ENABLED else None
+        self.market = MarketData(self.api, self.archive)
+        self.storage = storage or create_storage()
+        self.earnings = EarningsCalendar(self.market, self.storage)
+        self.iv_rank = IVRankCalculator(self.market)
+        self.risk = RiskAnalyzer(self.market)
+        self.screener = OptionsScreener(self.market)
+        self.backtester = Backtester(self.market)
+        self.backtest_jobs = BacktestJobs(self.backtester)
+        self.sweeper = ParameterSweep(self.market)
+        self.econ_cal = EconomicCalendar()
+        self.candidate_scanner = CreditSpreadScanner(self.market, {'credit_spreads': []})
+        self._candidates = []
+        self._candidates_at = 0
+        self._candidates_lock = threading.Lock()
+        self._states = []
+        self.running = False
+
+    def attach(self, state):
+        """Register an account state to receive shared screener results"""
+        self._states.append(state)
+
+    def start(self):
+        if self.running: return
+        self.running = True
+        self.earnings.start_refresh_loop()
+        self.iv_rank.start_refresh_loop()
+        threading.Thread(target=self._screener_loop, daemon=True).start()
+        if self.archive and config.CHAIN_RECORD_INTERVAL:
+            threading.Thread(target=self._recorder_loop, daemon=True).start()
+        print(f"[MARKET] Shared market-data plane started for {len(self._states)} account(s)")
+
+    def spread_candidates(self):
+        """All credit spread opportunities on the watchlist, as last scanned by the screener thread"""
+        with self._candidates_lock:
+            return list(self._candidates)
+
+    def record_chains(self, symbols=None):
+        """Fetch (and so archive) every expiration out to CS_MAX_DTE; returns chains recorded
+
+        Chain requests are spaced CHAIN_RECORD_PACE seconds apart so a pass never bursts
+        on the Tradier client the live scanners share.
+        """
+        symbols = symbols or self._record_symbols()
+        if not symbols: return 0
+        self.market.get_quotes(symbols)  # fresh underlyings for the snapshot headers
+        today = datetime.now().date(); n = 0
+        for sym in symbols:
+            for exp in self.market.get_option_expirations(sym) or []:
+                try: dte = (datetime.strptime(exp, '%Y-%m-%d').date() - today).days
+                except ValueError: continue
+                if not 0 <= dte <= config.CS_MAX_DTE: continue
+                if self.market.get_option_chain(sym, exp): n += 1
+                time.sleep(config.CHAIN_RECORD_PACE)
+        return n
+
+    def _record_symbols(self):
+        """CHAIN_RECORD_SCOPE 'watchlist': all of it; otherwise symbols held by any account or in the candidates"""
+        if config.CHAIN_RECORD_SCOPE == 'watchlist': return list(config.WATCHLIST)
+        syms = {s.get('symbol') for st in self._states for s in list(st.get('credit_spreads', []))
+                if s.get('status') in ('open', 'pending')}
+        with self._candidates_lock: syms.update(c.get('symbol') for c in self._candidates)
+        return sorted(s for s in syms if s)
+
+    def _market_open(self):
+        return any(s.get('market_open') for s in self._states)
+
+    def _recorder_loop(self):
+        while self.running:
+            try:
+                if self._market_open():
+                    t0 = time.time(); n = self.record_chains()
+                    print(f"[ARCHIVE] Recorded {n} chains in {time.time() - t0:.0f}s")
+            except Exception as e: print(f"[REC ERR] {e}")
+            time.sleep(config.CHAIN_RECORD_INTERVAL)
+
+    def _refresh_candidates(self):
+        """Rescan spread candidates once SPREAD_SCAN_INTERVAL has passed; readers only wait for the swap"""
+        if time.time() - self._candidates_at < config.SPREAD_SCAN_INTERVAL: return
+        self._candidates_at = time.time()
+        candidates = self.candidate_scanner.scan()
+        with self._candidates_lock: self._candidates = candidates
+
+    def _screener_loop(self):
+        next_screen = 0
+        while self.running:
+            try:
+                if self._market_open():
+                    self._refresh_candidates()
+                    if time.time() >= next_screen:
+                        next_screen = time.time() + 120
+                        self._screen()
+            except Exception as e: print(f"[SCR ERR] {e}")
+            time.sleep(5)
+
+    def _screen(self):
+        syms = config.WATCHLIST; all_sp = []
+        for i in range(0, len(syms), 20):
+            r = self.screener.full_scan(syms[i:i+20])
+            all_sp.extend(r.get('spreads',[]))
+            self._refresh_candidates()  # a full screen is slow; keep candidates on their own interval
+            time.sleep(2)
+        all_sp.sort(key=lambda x:x.get('score',0), reverse=True)
+        results = {
+            'spreads':all_sp[:20],
+            'scan_time':datetime.now().isoformat(),'symbols_scanned':len(syms),
+            'total_spread_opps':len(all_sp)}
+        for s in self._states: s['screener_results'] = results
@@ -0,0 +1,163 @@
+"""
+PROJECT HOPE v3.0 - Spread Path Simulator
+Replays put credit spreads day by day, repricing both legs with Black-Scholes,
+and exits them with the same rules PositionManager enforces, in the same order:
+    1. take profit at CS_TAKE_PROFIT_PCT of the credit
+    2. stop loss at CS_STOP_LOSS_PCT of the credit
+    3. emergency close at CS_EMERGENCY_DTE
+    4. at CS_CLOSE_DTE: close if profitable, otherwise roll (the old spread closes at its debit)
+All entries are simulated together as an (entries x days) grid, so thousands of
+spreads reprice in one pass.
+
+Vol is the 20-return realized vol of the closes; 'implied' scales it by the same
+1.15 premium IVRankCalculator uses when no chain IV is available, or takes a
+caller-supplied per-day IV array.
+"""
+import math
+from datetime import datetime
+from statistics import NormalDist
+import numpy as np
+import config
+
+IV_PREMIUM = 1.15
+REASONS = ('TAKE PROFIT', 'STOP LOSS', 'EMERGENCY', '21 DTE CLOSE', '21 DTE ROLL', 'EXPIRED', 'OPEN')
+TP, SL, EMERGENCY, DTE_CLOSE, DTE_ROLL, EXPIRED, OPEN = range(len(REASONS))
+
+
+def default_rules():
+    return {
+        'take_profit_pct': config.CS_TAKE_PROFIT_PCT, 'stop_loss_pct': config.CS_STOP_LOSS_PCT,
+        'close_dte': config.CS_CLOSE_DTE, 'emergency_dte': config.CS_EMERGENCY_DTE,
+        'entry_dte': (config.CS_MIN_DTE + config.CS_MAX_DTE) // 2, 'target_delta': config.CS_TARGET_DELTA,
+        'width': config.CS_SPREAD_WIDTH, 'min_credit': config.CS_MIN_CREDIT, 'contracts': config.CS_CONTRACTS,
+        'entry_every': 5, 'strike_step': 1.0, 'slippage': 0.0, 'vol': 'realized',
+    }
+
+
+def norm_cdf(x):
+    """Vectorized standard normal CDF (same approximation as probability.norm_cdf)"""
+    a1, a2, a3, a4, a5, p = 0.254829592, -0.284496736, 1.421413741, -1.453152027, 1.061405429, 0.3275911
+    sign = np.sign(x); z = np.abs(x) / math.sqrt(2)
+    t = 1.0 / (1.0 + p * z)
+    y = 1.0 - (((((a5 * t + a4) * t) + a3) * t + a2) * t + a1) * t * np.exp(-z * z)
+    return 0.5 * (1.0 + sign * y)
+
+
+def bs_put(S, K, T, sigma, r=None):
+    """Black-Scholes put value; intrinsic where T or sigma is zero"""
+    r = config.RISK_FREE_RATE if r is None else r
+    S, K, T, sigma = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (S, K, T, sigma)))
+    intrinsic = np.maximum(K - S, 0.0)
+    live = (T > 0) & (sigma > 0)
+    sq = np.where(live, sigma * np.sqrt(np.where(live, T, 1)), 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d1 = (np.log(S / K) + (r + sigma ** 2 / 2) * T) / sq
+    d2 = d1 - sq
+    value = K * np.exp(-r * T) * norm_cdf(-d2) - S * norm_cdf(-d1)
+    return np.where(live, np.maximum(value, 0.0), intrinsic)
+
+
+def realized_vol(close, window=20):
+    """Annualized vol of the last `window` log returns at each day (NaN until enough history)"""
+    vol = np.full(len(close), np.nan)
+    if len(close) <= window: return vol
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = np.diff(np.log(np.where(close > 0, close, np.nan)))
+    w = np.lib.stride_tricks.sliding_window_view(r, window)
+    vol[window:] = w.std(axis=1, ddof=1) * math.sqrt(252)
+    return vol
+
+
+class PathSimulator:
+    def __init__(self, rules=None):
+        self.rules = {**default_rules(), **(rules or {})}
+
+    def simulate(self, history, iv=None):
+        """Simulate entries across one symbol's daily history
+
+        Returns {'trades': [...], 'summary': {...}}; each trade has date, exit_date, reason,
+        days_held, short, long, credit, debit, pnl. `iv` (optional) is a per-day vol array.
+        """
+        R = self.rules
+        close = np.array([h.get('close', 0) or 0 for h in history], dtype=float)
+        # Price off the last good close when a day's close is missing
+        filled = close[np.maximum.accumulate(np.where(close > 0, np.arange(len(close)), 0))]
+        dates = [h.get('date', '') for h in history]
+        try: day = np.array([datetime.strptime(d, '%Y-%m-%d').toordinal() for d in dates])
+        except (TypeError, ValueError): day = np.arange(len(close)) * 7 // 5  # no dates: ~calendar days
+        if iv is not None: vol = np.asarray(iv, dtype=float)
+        else: vol = realized_vol(close) * (IV_PREMIUM if R['vol'] == 'implied' else 1.0)
+
+        n = len(close)
+        entries = np.arange(21, n - 1, max(1, int(R['entry_every'])))
+        entries = entries[(close[entries] > 0) & np.isfinite(vol[entries]) & (vol[entries] > 0)]
+        if not len(entries): return {'trades': [], 'summary': self._summary([], R)}
+        S0, sig0 = close[entries], vol[entries]
+        expiry = day[entries] + int(R['entry_dte'])
+        T0 = R['entry_dte'] / 365
+
+        # Short strike at the target put delta (N(d1) = 1 - delta), snapped down to the strike grid
+        d1 = NormalDist().inv_cdf(1 - float(R['target_delta']))
+        raw = S0 * np.exp(-d1 * sig0 * math.sqrt(T0) + (config.RISK_FREE_RATE + sig0 ** 2 / 2) * T0)
+        step = float(R['strike_step'])
+        short = np.floor(raw / step) * step
+        long = short - float(R['width'])
+        credit = np.round(bs_put(S0, short, T0, sig0) - bs_put(S0, long, T0, sig0) - R['slippage'], 2)
+        ok = credit >= float(R['min_credit'])
+        entries, short, long, credit, expiry, sig0 = entries[ok], short[ok], long[ok], credit[ok], expiry[ok], sig0[ok]
+        if not len(entries): return {'trades': [], 'summary': self._summary([], R)}
+
+        # (entries x days) grid of trading days after entry, up to the longest hold
+        last = np.searchsorted(day, expiry, side='right') - 1  # last trading day on or before expiry
+        horizon = max(1, int((last - entries).max()))
+        idx = entries[:, None] + np.arange(1, horizon + 1)[None, :]
+        inside = idx < n
+        idx = np.minimum(idx, n - 1)
+        dte = expiry[:, None] - day[idx]
+        alive = inside & (dte >= 0)
+        T = np.maximum(dte, 0) / 365
+        S = filled[idx]; sig = vol[idx]
+        sig = np.where(np.isfinite(sig), sig, sig0[:, None])  # a bad close mid-path keeps the entry vol
+        debit = bs_put(S, short[:, None], T, sig) - bs_put(S, long[:, None], T, sig) + R['slippage']
+        debit = np.maximum(np.round(debit, 2), 0.01)
+        pct = np.round((credit[:, None] - debit) / credit[:, None] * 100, 1)
+
+        # Rules in PositionManager order; the first day any fires is the exit
+        rule = np.full(dte.shape, -1)
+        for code, hit in ((EXPIRED, dte <= 0),
+                          (DTE_ROLL, (dte <= R['close_dte']) & (pct <= 0)),
+                          (DTE_CLOSE, (dte <= R['close_dte']) & (pct > 0)),
+                          (EMERGENCY, dte <= R['emergency_dte']),
+                          (SL, pct <= -R['stop_loss_pct']),
+                          (TP, pct >= R['take_profit_pct'])):
+            rule = np.where(hit, code, rule)  # later assignments take priority
+        rule = np.where(alive, rule, -1)
+        fired = rule >= 0
+        has_exit = fired.any(1)
+        last_alive = alive.sum(1) - 1
+        exit_k = np.where(has_exit, fired.argmax(1), np.maximum(last_alive, 0))
+        rows = np.arange(len(entries))
+        reason = np.where(has_exit, rule[rows, exit_k], OPEN)
+        exit_debit = np.where(reason == EXPIRED, np.maximum(np.minimum(short - S[rows, exit_k], short - long), 0),
+                              debit[rows, exit_k])
+        pnl = np.round((credit - exit_debit) * 100 * R['contracts'], 2)
+
+        exit_idx = idx[rows, exit_k]
+        trades = [{'date': dates[e], 'exit_date': dates[x], 'reason': REASONS[r], 'days_held': int(day[x] - day[e]),
+                   'entry': float(close[e]), 'short': float(s), 'long': float(l), 'credit': float(c),
+                   'debit': round(float(d), 2), 'pnl': float(p)}
+                  for e, x, r, s, l, c, d, p in zip(entries.tolist(), exit_idx.tolist(), reason.tolist(), short.tolist(),
+                                                     long.tolist(), credit.tolist(), exit_debit.tolist(), pnl.tolist())]
+        return {'trades': trades, 'summary': self._summary(trades, R)}
+
+    @staticmethod
+    def _summary(trades, rules):
+        closed = [t for t in trades if t['reason'] != 'OPEN']
+        wins = sum(1 for t in closed if t['pnl'] > 0)
+        reasons = {}
+        for t in closed: reasons[t['reason']] = reasons.get(t['reason'], 0) + 1
+        return {'trades': len(closed), 'open': len(trades) - len(closed), 'wins': wins,
+                'win_rate': round(wins / len(closed) * 100, 1) if closed else 0,
+                'total_pnl': round(sum(t['pnl'] for t in closed), 2),
+                'avg_days_held': round(sum(t['days_held'] for t in closed) / len(closed), 1) if closed else 0,
+                'exit_reasons': reasons, 'rules': rules}
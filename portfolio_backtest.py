@@ -0,0 +1,117 @@
+"""
+PROJECT HOPE v3.0 - Portfolio Backtester
+Event-driven replay of the whole watchlist on one merged daily timeline, with the
+live engine's portfolio limits in the loop instead of averaging per-symbol runs.
+
+Per-symbol candidate spreads (one per symbol per day) and their exits come from
+PathSimulator in one vectorized pass each. The event loop then walks the trading
+days: exits first (P&L, consecutive losses), then the engine's scan slots, where a
+real Protections instance on a simulated state and clock decides entries:
+ACTIVE_TIER max_positions, CS_MAX_OPEN, CS_MAX_NEW_PER_DAY, BP reserve,
+MAX_DAILY_LOSS, the 3-loss breaker, the 2-minute cooldown, trading windows and
+MAX_SAME_SECTOR / duplicate symbols via check_sector_limit.
+"""
+import time
+from datetime import datetime, timedelta
+import config
+from chart_series import downsample
+from path_simulator import PathSimulator
+from protections import Protections
+from robustness import analyze
+
+SCAN_START = 585  # 9:45 AM ET, first minute of the entry window
+
+
+class PortfolioBacktester:
+    def __init__(self, api, tier=None, rules=None):
+        self.api = api
+        self.tier = tier or config.ACTIVE_TIER
+        self.sim = PathSimulator({'entry_every': 1, **(rules or {})})
+
+    def run(self, symbols=None, days=730, robust=False, progress=None):
+        """progress(fraction, message) is called between symbols and days; it may raise to cancel"""
+        t0 = time.time()
+        symbols = list(symbols or config.WATCHLIST)
+        # ========== CANDIDATES ==========
+        entries = {}; missing = []
+        for i, sym in enumerate(symbols):
+            if progress: progress(0.8 * i / len(symbols), f'Candidates {sym}')
+            try: hist = self.api.get_history(sym, days) or []
+            except Exception as e:
+                print(f"[PBT ERR] {sym}: {e}"); hist = []
+            if len(hist) < 30: missing.append(sym); continue
+            for t in self.sim.simulate(hist)['trades']:
+                t['symbol'] = sym; t['score'] = t['credit'] / (t['short'] - t['long'])
+                entries.setdefault(t['date'], []).append(t)
+        for day_entries in entries.values(): day_entries.sort(key=lambda t: t['score'], reverse=True)
+        t_sim = time.time() - t0
+
+        # ========== EVENT LOOP ==========
+        clock = {'now': datetime(2000, 1, 1)}
+        state = {'credit_spreads': [], 'cs_trades_today': 0, 'daily_pnl': 0, 'consecutive_losses': 0,
+                 'last_trade_time': None, 'vix': 20}
+        prot = Protections(self.api, state, clock=lambda: clock['now'])
+        exits = {}  # exit date -> [open spread]
+        balance = peak = config.BACKTEST_INITIAL_BALANCE
+        max_dd = 0; closed = []; blocked = {}; equity = []
+        slot = timedelta(seconds=config.SPREAD_SCAN_INTERVAL)
+        slots = (955 - SCAN_START) * 60 // config.SPREAD_SCAN_INTERVAL
+        timeline = sorted(set(entries) | {t['exit_date'] for ts in entries.values() for t in ts})
+        for i, day in enumerate(timeline):
+            if progress and i % 20 == 0: progress(0.8 + 0.2 * i / len(timeline), f'Replaying {day}')
+            try: d = datetime.strptime(day, '%Y-%m-%d')
+            except ValueError: continue
+            # New trading day: the engine's daily reset
+            state.update({'cs_trades_today': 0, 'daily_pnl': 0, 'consecutive_losses': 0})
+            clock['now'] = d + timedelta(minutes=SCAN_START)
+            for s in exits.pop(day, []):
+                s['status'] = 'closed'
+                balance += s['pnl']; state['daily_pnl'] += s['pnl']
+                state['consecutive_losses'] = 0 if s['pnl'] > 0 else state['consecutive_losses'] + 1
+                closed.append(s)
+            state['credit_spreads'] = [s for s in state['credit_spreads'] if s['status'] == 'open']
+            if balance > peak: peak = balance
+            dd = (peak - balance) / peak * 100 if peak > 0 else 0
+            if dd > max_dd: max_dd = dd
+            equity.append({'date': day, 'balance': round(balance, 2), 'open': len(state['credit_spreads'])})
+
+            queue = entries.get(day, [])
+            for k in range(slots if queue else 0):
+                clock['now'] = d + timedelta(minutes=SCAN_START) + k * slot
+                if len(state['credit_spreads']) >= self.tier['max_positions']:
+                    reason = 'Tier max positions'
+                else:
+                    ok, reason = prot.check_all('spread')
+                    if ok:
+                        # Best remaining candidate that clears the sector / duplicate check
+                        pick = next((t for t in queue if prot.check_sector_limit(t['symbol'])[0]), None)
+                        if pick is None: break
+                        queue = [t for t in queue if t is not pick]
+                        s = {**pick, 'status': 'open', 'contracts': self.sim.rules['contracts']}
+                        state['credit_spreads'].append(s); state['cs_trades_today'] += 1
+                        state['last_trade_time'] = clock['now']
+                        if pick['reason'] != 'OPEN': exits.setdefault(pick['exit_date'], []).append(s)
+                        continue
+                blocked[reason.split(':')[0]] = blocked.get(reason.split(':')[0], 0) + 1
+                # Day-level limits do not clear until tomorrow; cooldown and time-of-day ones might
+                if not reason.startswith(('Cooldown', 'Outside', 'EOD')): break
+
+        wins = sum(1 for s in closed if s['pnl'] > 0)
+        keep = downsample(None, [e['balance'] for e in equity], config.CHART_REPORT_POINTS) if equity else []
+        by_symbol = {}
+        for s in closed: by_symbol[s['symbol']] = round(by_symbol.get(s['symbol'], 0) + s['pnl'], 2)
+        print(f"[PBT] {len(symbols) - len(missing)} symbols, {len(equity)} days, {len(closed)} trades "
+              f"in {time.time() - t0:.1f}s (candidates {t_sim:.1f}s)")
+        return {
+            'model': 'portfolio', 'days': days, 'symbols': len(symbols) - len(missing), 'missing': missing,
+            'tier': self.tier.get('name', ''), 'total_trades': len(closed), 'open_at_end': len(state['credit_spreads']),
+            'wins': wins, 'losses': len(closed) - wins,
+            'win_rate': round(wins / len(closed) * 100, 1) if closed else 0,
+            'total_pnl': round(balance - config.BACKTEST_INITIAL_BALANCE, 2),
+            'total_return': round((balance - config.BACKTEST_INITIAL_BALANCE) / config.BACKTEST_INITIAL_BALANCE * 100, 1),
+            'final_balance': round(balance, 2), 'max_dd': round(max_dd, 1),
+            'blocked': dict(sorted(blocked.items(), key=lambda kv: -kv[1])),
+            'top_symbols': dict(sorted(by_symbol.items(), key=lambda kv: -kv[1])[:10]),
+            'equity_curve': [equity[i] for i in keep], 'trades': closed[-30:], 'elapsed': round(time.time() - t0, 2),
+            'robustness': analyze([s['pnl'] for s in closed]) if robust else None,
+        }
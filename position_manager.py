@@ -6,11 +6,13 @@ from datetime import datetime
 import config, math
 
 class PositionManager:
-    def __init__(self, api, state, alerts, analytics=None):
+    def __init__(self, api, state, alerts, analytics=None, wal=None, clock=None):
         self.api = api
+        self.clock = clock or datetime.now  # backtests inject simulated time
         self.state = state
         self.alerts = alerts
         self.analytics = analytics
+        self.wal = wal
 
     def check_all_positions(self):
         self._check_credit_spreads()
@@ -29,7 +31,7 @@ class PositionManager:
                 pct = round(profit / s['credit'] * 100, 1) if s['credit'] > 0 else 0
                 s['current_debit'] = debit; s['current_profit'] = profit; s['profit_pct'] = pct
                 try:
-                    dte = (datetime.strptime(s['expiration'], '%Y-%m-%d').date() - datetime.now().date()).days
+                    dte = (datetime.strptime(s['expiration'], '%Y-%m-%d').date() - self.clock().date()).days
                     s['current_dte'] = dte
                 except: dte = 999
 
@@ -74,7 +76,8 @@ class PositionManager:
             pnl = s.get('current_profit', 0) * s['contracts'] * 100
             s['status'] = 'rolled'
             s['close_reason'] = '21 DTE ROLL'
-            s['closed_at'] = datetime.now().isoformat()
+            s['closed_at'] = self.clock().isoformat()
+            if self.wal: self.wal.status_changed(s)
             self._track(pnl, s, 'spread')
             self._log(f"ROLLED {s['symbol']}: closed old leg | ${pnl:.2f}")
             self.alerts.send(f"ROLL: {s['symbol']} closed at 21 DTE — scanner will open new 45 DTE position")
@@ -86,7 +89,8 @@ class PositionManager:
     def _close_spread(self, s, reason):
         self.api.close_credit_spread(s['symbol'], s['short_symbol'], s['long_symbol'], s['contracts'], s.get('current_debit', s['credit']))
         pnl = s.get('current_profit', 0) * s['contracts'] * 100
-        s['status'] = 'closed'; s['close_reason'] = reason; s['closed_at'] = datetime.now().isoformat()
+        s['status'] = 'closed'; s['close_reason'] = reason; s['closed_at'] = self.clock().isoformat()
+        if self.wal: self.wal.status_changed(s)
         self.alerts.send(f"SPREAD: {s['symbol']} | {reason} | P/L: ${pnl:.2f}")
         self._track(pnl, s, 'spread')
         self._log(f"Spread {s['symbol']}: {reason} | ${pnl:.2f}")
@@ -97,8 +101,13 @@ class PositionManager:
         else:
             self.state['losses'] += 1; self.state['consecutive_losses'] += 1
         self.state['total_pnl'] += pnl
+        if self.wal: self.wal.pnl_tracked(self.state)
         if self.analytics:
-            self.analytics.record_trade({'symbol': trade['symbol'], 'type': ttype, 'pnl': pnl, 'direction': trade.get('direction', '')})
+            self.analytics.record_trade({'symbol': trade['symbol'], 'type': trade.get('type') or ttype, 'pnl': pnl,
+                                         'direction': trade.get('direction', ''), 'contracts': trade.get('contracts', 0),
+                                         'entry_price': trade.get('credit', 0), 'exit_price': trade.get('current_debit', 0),
+                                         'opened_at': trade.get('opened_at', ''), 'closed_at': trade.get('closed_at') or self.clock().isoformat(),
+                                         'close_reason': trade.get('close_reason', '')})
 
     def manual_close_position(self, trade_id, ttype='spread'):
         for s in self.state['credit_spreads']:
@@ -111,6 +120,7 @@ class PositionManager:
         for s in self.state['credit_spreads']:
             if str(s.get('order_id')) == str(trade_id):
                 s['manual_override'] = not s.get('manual_override', False)
+                if self.wal: self.wal.status_changed(s)
                 return s['manual_override']
         return None
 
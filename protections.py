@@ -3,8 +3,15 @@ from datetime import datetime
 import config
 
 class Protections:
-    def __init__(self, api, state):
-        self.api = api; self.state = state
+    def __init__(self, api, state, clock=None):
+        # clock: callable returning the current US/Eastern datetime; backtests inject simulated time
+        self.api = api; self.state = state; self.clock = clock
+
+    def _now(self):
+        if self.clock: return self.clock()
+        try:
+            import pytz; return datetime.now(pytz.timezone('US/Eastern'))
+        except: return datetime.now()
 
     def check_all(self, trade_type='spread'):
         for c in [self._max_pos, self._cooldown, self._daily_loss, self._windows, self._max_daily,
@@ -23,7 +30,7 @@ class Protections:
     def _cooldown(self, tt):
         lt = self.state.get('last_trade_time')
         if lt:
-            elapsed = (datetime.now() - lt).total_seconds()
+            elapsed = ((self.clock() if self.clock else datetime.now()) - lt).total_seconds()
             if elapsed < 120: return False, f"Cooldown: {int(120 - elapsed)}s"
         return True, ""
 
@@ -32,9 +39,7 @@ class Protections:
         return True, ""
 
     def _windows(self, tt):
-        try:
-            import pytz; now = datetime.now(pytz.timezone('US/Eastern'))
-        except: now = datetime.now()
+        now = self._now()
         if now.weekday() > 4: return False, "Weekend"
         m = now.hour * 60 + now.minute
         if not (585 <= m <= 955): return False, "Outside trading window (9:45 AM - 3:55 PM)"
@@ -45,9 +50,7 @@ class Protections:
         return True, ""
 
     def _eod_block(self, tt):
-        try:
-            import pytz; now = datetime.now(pytz.timezone('US/Eastern'))
-        except: now = datetime.now()
+        now = self._now()
         if now.hour * 60 + now.minute >= 955: return False, "EOD block"
         return True, ""
 
@@ -61,9 +64,7 @@ class Protections:
         return True, ""
 
     def _weekend(self, tt):
-        try:
-            import pytz; now = datetime.now(pytz.timezone('US/Eastern'))
-        except: now = datetime.now()
+        now = self._now()
         if now.weekday() == 4 and now.hour * 60 + now.minute >= 900: return False, "Friday EOD"
         if now.weekday() > 4: return False, "Weekend"
         return True, ""
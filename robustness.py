@@ -0,0 +1,92 @@
+"""
+PROJECT HOPE v3.0 - Backtest Robustness
+A backtest's sharpe / max drawdown / win rate are point estimates from a few dozen
+trades. This resamples the trade sequence to put confidence intervals on them:
+
+    bootstrap  moving-block bootstrap of the trade P&L sequence (blocks keep streaks
+               and regime clustering together)
+    offsets    the same strategy entered on shifted days: a random start offset and a
+               per-entry jitter over the P&L of every possible entry day
+
+All resamples are one (samples x trades) matrix; equity, drawdown, Sharpe (as in
+Backtester._compile_results) and ruin are computed with cumulative array ops.
+"""
+import math
+import numpy as np
+import config
+
+PERCENTILES = (5, 25, 50, 75, 95)
+MAX_CELLS = 20000000  # samples x trades cap, ~160 MB of float64
+
+
+def block_indices(n, samples, block, rng):
+    """(samples, n) trade indices made of random circular blocks of length `block`"""
+    starts = rng.integers(0, n, size=(samples, -(-n // block)))
+    return ((starts[:, :, None] + np.arange(block)) % n).reshape(samples, -1)[:, :n]
+
+
+def offset_indices(n, every, samples, rng, jitter=None):
+    """(samples, trades) entry indices on an `every`-day grid with a random start and per-entry jitter"""
+    jitter = every // 2 if jitter is None else jitter
+    trades = max(1, n // every)
+    grid = rng.integers(0, every, size=(samples, 1)) + np.arange(trades) * every
+    return np.clip(grid + rng.integers(-jitter, jitter + 1, size=grid.shape), 0, n - 1)
+
+
+def path_stats(pnl, initial=None, ruin_pct=None):
+    """Per-row metrics of a (samples, trades) P&L matrix, plus the balance paths"""
+    initial = float(initial or config.BACKTEST_INITIAL_BALANCE)
+    ruin_pct = config.ROBUST_RUIN_DD if ruin_pct is None else ruin_pct
+    balance = initial + np.cumsum(pnl, axis=1)
+    peak = np.maximum.accumulate(np.maximum(balance, initial), axis=1)
+    max_dd = np.maximum(((peak - balance) / peak * 100).max(axis=1), 0)
+    returns = pnl / np.maximum(balance, 1)
+    if pnl.shape[1] > 1:
+        std = returns.std(axis=1, ddof=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sharpe = np.where(std > 0, (returns.mean(axis=1) * 252 - 0.05) / (std * math.sqrt(252)), 0)
+    else:
+        sharpe = np.zeros(len(pnl))
+    return {'return_pct': (balance[:, -1] - initial) / initial * 100, 'max_dd': max_dd, 'sharpe': sharpe,
+            'win_rate': (pnl > 0).mean(axis=1) * 100,
+            'ruined': balance.min(axis=1) <= initial * (1 - ruin_pct / 100)}, balance
+
+
+def _summary(stats, balance, points):
+    out = {k: dict(zip([f'p{p}' for p in PERCENTILES], np.round(np.percentile(v, PERCENTILES), 2).tolist()),
+                   mean=round(float(v.mean()), 2))
+           for k, v in stats.items() if k != 'ruined'}
+    out['risk_of_ruin'] = round(float(stats['ruined'].mean()) * 100, 2)
+    # Percentile bands of the balance after each trade, thinned to chart width
+    cols = np.unique(np.linspace(0, balance.shape[1] - 1, min(points, balance.shape[1])).astype(int))
+    bands = np.percentile(balance[:, cols], PERCENTILES, axis=0)
+    out['equity_bands'] = {'trade': (cols + 1).tolist(),
+                           **{f'p{p}': np.round(b, 2).tolist() for p, b in zip(PERCENTILES, bands)}}
+    return out
+
+
+def analyze(pnl, candidates=None, every=5, samples=None, block=None, seed=None, points=None):
+    """Confidence intervals for a backtest's trade P&L sequence
+
+    pnl: realized P&L per trade in order. candidates (optional): P&L of a trade entered on
+    every possible day, for the entry-offset resamples. Returns {'samples', 'block', 'trades',
+    'bootstrap': {...}, 'offsets': {...}}; each section has p5..p95/mean of return_pct,
+    max_dd, sharpe and win_rate, risk_of_ruin (% of paths that lose ROBUST_RUIN_DD % of the
+    starting balance) and equity_bands.
+    """
+    pnl = np.asarray(pnl, dtype=float)
+    n = len(pnl)
+    if n < 2: return {'error': 'Not enough trades to resample', 'trades': n}
+    rng = np.random.default_rng(seed)
+    samples = int(samples or config.ROBUST_SAMPLES)
+    samples = max(1, min(samples, MAX_CELLS // n))
+    block = int(block or max(1, round(n ** (1 / 3))))
+    points = points or config.CHART_REPORT_POINTS
+    out = {'samples': samples, 'block': block, 'trades': n}
+    out['bootstrap'] = _summary(*path_stats(pnl[block_indices(n, samples, block, rng)]), points)
+    if candidates is not None:
+        c = np.asarray(candidates, dtype=float)
+        c = c[np.isfinite(c)]
+        if len(c) >= 2 * every:
+            out['offsets'] = _summary(*path_stats(c[offset_indices(len(c), every, samples, rng)]), points)
+    return out
@@ -0,0 +1,343 @@
+"""
+PROJECT HOPE v3.0 - SQLite Storage Backend
+Same interface as storage.Storage, backed by one SQLite database (hope.db) in WAL mode
+Trades indexed by closed_at/symbol/close_reason, journal by type/symbol, agreements by email/name/ip
+Text searches are case-insensitive prefix matches, so LIKE can use the NOCASE indexes
+Existing JSON data is migrated on first start
+
+Enable with HOPE_STORAGE_BACKEND=sqlite, or migrate ahead of time:
+    python sqlite_storage.py [storage_dir]
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+import storage as json_storage
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS trades (
+    seq INTEGER PRIMARY KEY, closed_at TEXT, symbol TEXT, close_reason TEXT, pnl REAL, data TEXT);
+CREATE INDEX IF NOT EXISTS trades_closed_at ON trades(closed_at);
+CREATE INDEX IF NOT EXISTS trades_symbol ON trades(symbol, closed_at);
+CREATE INDEX IF NOT EXISTS trades_close_reason ON trades(close_reason COLLATE NOCASE, seq);
+CREATE TABLE IF NOT EXISTS daily_log (
+    date TEXT PRIMARY KEY, trades INTEGER, wins INTEGER, losses INTEGER, pnl REAL, entries TEXT);
+CREATE TABLE IF NOT EXISTS backtests (id INTEGER PRIMARY KEY AUTOINCREMENT, saved_at TEXT, data TEXT);
+CREATE TABLE IF NOT EXISTS agreements (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, saved_at TEXT, email TEXT, name TEXT, ip TEXT, data TEXT);
+CREATE INDEX IF NOT EXISTS agreements_email ON agreements(email COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS agreements_name ON agreements(name COLLATE NOCASE);
+DROP INDEX IF EXISTS agreements_ip;
+CREATE INDEX IF NOT EXISTS agreements_ip_nocase ON agreements(ip COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS journal (id INTEGER PRIMARY KEY, type TEXT, symbol TEXT, date TEXT, data TEXT);
+CREATE INDEX IF NOT EXISTS journal_type ON journal(type, id);
+CREATE INDEX IF NOT EXISTS journal_symbol ON journal(symbol, id);
+CREATE TABLE IF NOT EXISTS earnings (symbol TEXT PRIMARY KEY, data TEXT);
+"""
+
+
+def _dumps(data):
+    return json.dumps(data, default=str)
+
+
+def _prefix(q):
+    """LIKE pattern matching values that start with q; q's own % and _ match literally"""
+    return q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+class SQLiteStorage:
+    def __init__(self, storage_dir=None):
+        self.STORAGE_DIR = storage_dir or json_storage.STORAGE_DIR
+        os.makedirs(self.STORAGE_DIR, exist_ok=True)
+        self.db_file = os.path.join(self.STORAGE_DIR, 'hope.db')
+        self._local = threading.local()
+        self._lock = threading.Lock()  # one writer at a time; readers run concurrently under WAL
+        self._save_count = 0
+        with self._lock, self._conn() as db:
+            db.executescript(SCHEMA)
+        if not self._get_kv('migrated_from_json'): self.migrate_from_json()
+        print(f"[STORAGE] Using SQLite database: {self.db_file}")
+
+    # ========== SAVE FUNCTIONS ==========
+
+    def save_state(self, state, wal_seq=None):
+        """Save current engine state (positions, P&L, counters); wal_seq = last WAL record it includes"""
+        try:
+            data = {'saved_at': datetime.now().isoformat(), **json_storage.state_record(state)}
+            if wal_seq is not None: data['wal_seq'] = wal_seq
+            self._set_kv('state', data)
+            return True
+        except Exception as e:
+            print(f"[STORAGE ERROR] save_state: {e}")
+            return False
+
+    def save_trade(self, trade_data):
+        """Append a completed trade to permanent history"""
+        try:
+            trade_data['saved_at'] = datetime.now().isoformat()
+            with self._lock, self._conn() as db:
+                seq = self._insert_trade(db, trade_data)
+            self._save_count += 1
+            print(f"[STORAGE] Trade #{seq + 1} saved: {trade_data.get('symbol','')} {trade_data.get('pnl','')}")
+        except Exception as e:
+            print(f"[STORAGE ERROR] save_trade: {e}")
+
+    def save_analytics(self, analytics_data):
+        """Save analytics snapshot"""
+        try:
+            self._set_kv('analytics', {'saved_at': datetime.now().isoformat(), **analytics_data})
+        except Exception as e:
+            print(f"[STORAGE ERROR] save_analytics: {e}")
+
+    def save_backtest(self, results):
+        """Save backtest results, keeping the last 20"""
+        try:
+            results['saved_at'] = datetime.now().isoformat()
+            with self._lock, self._conn() as db:
+                db.execute("INSERT INTO backtests (saved_at, data) VALUES (?, ?)", (results['saved_at'], _dumps(results)))
+                db.execute("DELETE FROM backtests WHERE id NOT IN (SELECT id FROM backtests ORDER BY id DESC LIMIT 20)")
+        except Exception as e:
+            print(f"[STORAGE ERROR] save_backtest: {e}")
+
+    def save_daily_log(self, date_str, log_entry):
+        """Save daily summary log"""
+        try:
+            with self._lock, self._conn() as db:
+                row = db.execute("SELECT entries FROM daily_log WHERE date = ?", (date_str,)).fetchone()
+                entries = json.loads(row[0]) if row else []
+                entries.append(log_entry)
+                if row:
+                    db.execute("UPDATE daily_log SET entries = ? WHERE date = ?", (_dumps(entries), date_str))
+                else:
+                    db.execute("INSERT INTO daily_log VALUES (?, 0, 0, 0, 0, ?)", (date_str, _dumps(entries)))
+        except Exception as e:
+            print(f"[STORAGE ERROR] save_daily_log: {e}")
+
+    def update_daily_summary(self, date_str, trades, wins, losses, pnl):
+        """Update daily summary stats"""
+        try:
+            with self._lock, self._conn() as db:
+                db.execute("""INSERT INTO daily_log VALUES (?, ?, ?, ?, ?, '[]')
+                              ON CONFLICT(date) DO UPDATE SET trades=excluded.trades, wins=excluded.wins,
+                              losses=excluded.losses, pnl=excluded.pnl""",
+                           (date_str, trades, wins, losses, round(pnl, 2)))
+        except Exception as e:
+            print(f"[STORAGE ERROR] update_daily: {e}")
+
+    # ========== LOAD FUNCTIONS ==========
+
+    def load_state(self):
+        """Load saved engine state"""
+        try:
+            data = self._get_kv('state')
+            if data:
+                print(f"[STORAGE] State loaded from {data.get('saved_at', 'unknown')}")
+                return data
+            print("[STORAGE] No saved state found - starting fresh")
+            return None
+        except Exception as e:
+            print(f"[STORAGE ERROR] load_state: {e}")
+            return None
+
+    def load_trade_history(self):
+        """Load all trade history"""
+        try:
+            history = [json.loads(r[0]) for r in self._conn().execute("SELECT data FROM trades ORDER BY seq")]
+            print(f"[STORAGE] Loaded {len(history)} historical trades")
+            return history
+        except Exception as e:
+            print(f"[STORAGE ERROR] load_history: {e}")
+            return []
+
+    def query_trades(self, cursor=None, limit=100, start=None, end=None, symbol=None, close_reason=None, order='desc'):
+        """One page of trade history; same cursor semantics as Storage.query_trades"""
+        where, args = [], []
+        if start: where.append("closed_at >= ?"); args.append(start[:10])
+        if end: where.append("closed_at < ?"); args.append(end[:10] + '~')  # '~' sorts after any time suffix
+        if symbol: where.append("symbol = ?"); args.append(symbol.upper())
+        if close_reason: where.append("close_reason LIKE ? ESCAPE '\\'"); args.append(_prefix(close_reason))
+        if order == 'asc':
+            where.append("seq >= ?"); args.append(max(int(cursor or 0), 0))
+        elif cursor is not None:
+            where.append("seq < ?"); args.append(int(cursor))
+        db = self._conn()
+        rows = db.execute(f"SELECT seq, data FROM trades WHERE {' AND '.join(where) or '1'} "
+                          f"ORDER BY seq {'ASC' if order == 'asc' else 'DESC'} LIMIT ?", args + [limit]).fetchall()
+        total = (db.execute("SELECT MAX(seq) FROM trades").fetchone()[0] or -1) + 1
+        if order == 'asc':
+            next_cursor = rows[-1][0] + 1 if len(rows) == limit and rows[-1][0] + 1 < total else None
+        else:
+            next_cursor = rows[-1][0] if len(rows) == limit and rows[-1][0] > 0 else None
+            rows.reverse()
+        page = [{**json.loads(data), 'seq': seq} for seq, data in rows]
+        return {'total': total, 'count': len(page), 'trades': page, 'next_cursor': next_cursor}
+
+    def iter_trades(self, start=None, end=None, symbol=None, close_reason=None, chunk=500):
+        """Stream matching trades oldest first, one page at a time"""
+        cursor = 0
+        while cursor is not None:
+            page = self.query_trades(cursor, chunk, start, end, symbol, close_reason, order='asc')
+            yield from page['trades']
+            cursor = page['next_cursor']
+
+    def load_backtests(self):
+        """Load saved backtest results"""
+        try:
+            return [json.loads(r[0]) for r in self._conn().execute("SELECT data FROM backtests ORDER BY id")]
+        except:
+            return []
+
+    def load_daily_logs(self):
+        """Load all daily logs"""
+        try:
+            return {d: {'trades': t, 'wins': w, 'losses': l, 'pnl': p, 'entries': json.loads(e or '[]')}
+                    for d, t, w, l, p, e in self._conn().execute("SELECT * FROM daily_log ORDER BY date")}
+        except:
+            return {}
+
+    # ========== STATS ==========
+
+    @property
+    def save_count(self):
+        """Trades saved by this instance; moves whenever trade history grows"""
+        return self._save_count
+
+    def get_storage_stats(self):
+        """Get storage status info"""
+        try:
+            db = self._conn()
+            count = lambda table: db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            return {
+                'storage_dir': self.STORAGE_DIR,
+                'backend': 'sqlite',
+                'total_trades_saved': count('trades'),
+                'total_days_logged': count('daily_log'),
+                'total_backtests': count('backtests'),
+                'state_saved': self._get_kv('state') is not None,
+                'state_file_size': os.path.getsize(self.db_file),
+                'trades_file_size': os.path.getsize(self.db_file),
+                'save_count_this_session': self._save_count,
+            }
+        except:
+            return {'storage_dir': self.STORAGE_DIR, 'error': 'Could not read stats'}
+
+    def symbol_stats(self, symbol=None):
+        """Per-symbol trade count, wins and P&L"""
+        sql = "SELECT symbol, COUNT(*), SUM(pnl > 0), ROUND(SUM(pnl), 2) FROM trades"
+        args = []
+        if symbol: sql += " WHERE symbol = ?"; args.append(symbol.upper())
+        rows = self._conn().execute(sql + " GROUP BY symbol ORDER BY SUM(pnl) DESC", args)
+        return [{'symbol': s, 'trades': n, 'wins': w, 'pnl': p} for s, n, w, p in rows]
+
+    # ========== AGREEMENTS ==========
+
+    def save_agreement(self, data):
+        try:
+            data['saved_at'] = datetime.now().isoformat()
+            with self._lock, self._conn() as db:
+                self._insert_agreement(db, data)
+            print(f'[STORAGE] Agreement saved: {data.get("type","unknown")}')
+            return True
+        except Exception as e:
+            print(f'[STORAGE ERROR] {e}')
+            return False
+
+    def load_agreements(self):
+        return [json.loads(r[0]) for r in self._conn().execute("SELECT data FROM agreements ORDER BY id")]
+
+    def search_agreements(self, q):
+        """Agreements whose name, email or ip starts with q (case-insensitive)"""
+        # One indexed range scan per column; an OR across them would scan the table
+        rows = self._conn().execute(
+            "SELECT data FROM agreements WHERE id IN ("
+            "SELECT id FROM agreements WHERE name LIKE :q ESCAPE '\\' UNION "
+            "SELECT id FROM agreements WHERE email LIKE :q ESCAPE '\\' UNION "
+            "SELECT id FROM agreements WHERE ip LIKE :q ESCAPE '\\') ORDER BY id", {'q': _prefix(q or '')})
+        return [json.loads(r[0]) for r in rows]
+
+    # ========== JOURNAL / EARNINGS ==========
+
+    def load_journal(self):
+        return [json.loads(r[0]) for r in self._conn().execute("SELECT data FROM journal ORDER BY id")]
+
+    def save_journal_entry(self, entry):
+        """Insert or replace a journal entry by id"""
+        with self._lock, self._conn() as db:
+            self._insert_journal(db, entry)
+
+    def load_earnings(self):
+        return {s: json.loads(d) for s, d in self._conn().execute("SELECT symbol, data FROM earnings")}
+
+    def save_earnings(self, symbol, data):
+        with self._lock, self._conn() as db:
+            db.execute("INSERT OR REPLACE INTO earnings VALUES (?, ?)", (symbol, _dumps(data)))
+
+    # ========== MIGRATION ==========
+
+    def migrate_from_json(self):
+        """One-shot import of the JSON backend's data in this storage dir"""
+        src = json_storage.Storage(self.STORAGE_DIR)
+        state = src.load_state()
+        analytics = src._read(src.analytics_file)
+        with self._lock, self._conn() as db:
+            if db.execute("SELECT value FROM kv WHERE key = 'migrated_from_json'").fetchone(): return
+            n = 0
+            for t in src.trade_log: self._insert_trade(db, t); n += 1
+            for d, log in (src.load_daily_logs() or {}).items():
+                db.execute("INSERT OR REPLACE INTO daily_log VALUES (?, ?, ?, ?, ?, ?)",
+                           (d, log.get('trades', 0), log.get('wins', 0), log.get('losses', 0), log.get('pnl', 0),
+                            _dumps(log.get('entries', []))))
+            for b in src.load_backtests():
+                db.execute("INSERT INTO backtests (saved_at, data) VALUES (?, ?)", (b.get('saved_at'), _dumps(b)))
+            for a in src.load_agreements(): self._insert_agreement(db, a)
+            for e in src.load_journal(): self._insert_journal(db, e)
+            for s, d in src.load_earnings().items():
+                db.execute("INSERT OR REPLACE INTO earnings VALUES (?, ?)", (s, _dumps(d)))
+            for key, value in (('state', state), ('analytics', analytics)):
+                if value: db.execute("INSERT OR REPLACE INTO kv VALUES (?, ?)", (key, _dumps(value)))
+            db.execute("INSERT OR REPLACE INTO kv VALUES ('migrated_from_json', ?)", (_dumps(datetime.now().isoformat()),))
+        print(f"[STORAGE] Migrated JSON storage into {self.db_file} ({n} trades)")
+
+    # ========== INTERNAL ==========
+
+    def _conn(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.db_file, timeout=30, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _get_kv(self, key):
+        row = self._conn().execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _set_kv(self, key, value):
+        with self._lock, self._conn() as db:
+            db.execute("INSERT OR REPLACE INTO kv VALUES (?, ?)", (key, _dumps(value)))
+
+    @staticmethod
+    def _insert_trade(db, t):
+        seq = db.execute("SELECT COALESCE(MAX(seq) + 1, 0) FROM trades").fetchone()[0]
+        db.execute("INSERT INTO trades VALUES (?, ?, ?, ?, ?, ?)",
+                   (seq, str(t.get('closed_at', '')), str(t.get('symbol', '')).upper(),
+                    str(t.get('close_reason', '')).lower(), t.get('pnl', 0) or 0, _dumps(t)))
+        return seq
+
+    @staticmethod
+    def _insert_agreement(db, a):
+        db.execute("INSERT INTO agreements (saved_at, email, name, ip, data) VALUES (?, ?, ?, ?, ?)",
+                   (a.get('saved_at'), a.get('email', ''), a.get('name', ''), a.get('ip', ''), _dumps(a)))
+
+    @staticmethod
+    def _insert_journal(db, e):
+        db.execute("INSERT OR REPLACE INTO journal VALUES (?, ?, ?, ?, ?)",
+                   (e.get('id'), e.get('type', ''), str(e.get('symbol', '')).upper(), e.get('date', ''), _dumps(e)))
+
+
+if __name__ == '__main__':
+    import sys
+    SQLiteStorage(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,114 @@
+"""
+PROJECT HOPE v3.0 - Engine State Write-Ahead Log
+Every state mutation that matters after a crash (position opened, status changed,
+P&L tracked, counters reset, settings changed) is appended and fsynced here as it
+happens. Snapshots saved by the StatePersister record the last WAL seq they include;
+on startup the snapshot is loaded and later records are replayed, then the next
+snapshot checkpoints (truncates) the log.
+
+Records carry absolute values, so replaying one that the snapshot already has is harmless.
+Mutate the state first, then append: a snapshot reads `seq` before serializing, so
+everything at or below its wal_seq is already in it.
+"""
+import json, os, threading, time
+
+# Spread fields a status change may touch
+SPREAD_STATUS_FIELDS = ('status', 'close_reason', 'closed_at', 'current_debit', 'current_profit',
+                        'profit_pct', 'credit', 'quoted_credit', 'take_profit_price', 'stop_loss_price',
+                        'manual_override')
+PNL_FIELDS = ('wins', 'losses', 'consecutive_losses', 'total_pnl')
+
+
+class StateWAL:
+    def __init__(self, storage_dir, snapshot_seq=0):
+        """snapshot_seq: wal_seq of the loaded snapshot. A checkpoint can leave the log empty,
+        so numbering resumes above it; restarting at 1 would put new records at or below
+        the snapshot's wal_seq, and replay would skip them."""
+        self.path = os.path.join(storage_dir, 'state_wal.jsonl')
+        self._lock = threading.Lock()
+        records = self.records()
+        self.seq = max(records[-1]['seq'] if records else 0, int(snapshot_seq or 0))
+        self._f = open(self.path, 'ab')
+
+    # ========== WRITE ==========
+
+    def append(self, op, **fields):
+        """Durably log one mutation; returns its seq (0 if the write failed)"""
+        try:
+            with self._lock:
+                self.seq += 1
+                rec = {'seq': self.seq, 'ts': round(time.time(), 3), 'op': op, **fields}
+                self._f.write((json.dumps(rec, default=str) + '\n').encode())
+                self._f.flush()
+                os.fsync(self._f.fileno())
+                return self.seq
+        except Exception as e:
+            print(f"[WAL ERROR] {op}: {e}")
+            return 0
+
+    def position_opened(self, state, spread):
+        return self.append('position_opened', spread=spread, cs_trades_today=state.get('cs_trades_today', 0))
+
+    def status_changed(self, spread):
+        return self.append('status_changed', order_id=spread.get('order_id'),
+                           fields={k: spread[k] for k in SPREAD_STATUS_FIELDS if k in spread})
+
+    def pnl_tracked(self, state):
+        return self.append('pnl_tracked', fields={k: state.get(k, 0) for k in PNL_FIELDS})
+
+    def counters_reset(self, state):
+        return self.append('counters_reset', fields={k: state.get(k) for k in
+                           ('today', 'cs_trades_today', 'daily_pnl', 'consecutive_losses')})
+
+    def field_set(self, key, value):
+        return self.append('field_set', key=key, value=value)
+
+    def checkpoint(self, seq):
+        """Drop records a saved snapshot already includes (seq <= `seq`)"""
+        with self._lock:
+            keep = [r for r in self.records() if r['seq'] > seq]
+            tmp = self.path + '.tmp'
+            with open(tmp, 'wb') as f:
+                for r in keep: f.write((json.dumps(r, default=str) + '\n').encode())
+                f.flush(); os.fsync(f.fileno())
+            self._f.close()
+            os.replace(tmp, self.path)
+            self._f = open(self.path, 'ab')
+
+    # ========== RECOVERY ==========
+
+    def records(self, after_seq=0):
+        if not os.path.exists(self.path): return []
+        out = []
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'): break  # torn final write
+                try: rec = json.loads(line)
+                except json.JSONDecodeError: break
+                if rec['seq'] > after_seq: out.append(rec)
+        return out
+
+    def replay(self, state, after_seq=0):
+        """Apply records newer than the snapshot to `state`; returns how many were applied"""
+        records = self.records(after_seq)
+        for rec in records:
+            try: self.apply(state, rec)
+            except Exception as e: print(f"[WAL ERROR] replay #{rec.get('seq')}: {e}")
+        if records: print(f"[WAL] Replayed {len(records)} state mutations after snapshot #{after_seq}")
+        return len(records)
+
+    @staticmethod
+    def apply(state, rec):
+        op = rec['op']
+        if op == 'position_opened':
+            spread = rec['spread']
+            if not any(str(s.get('order_id')) == str(spread.get('order_id')) for s in state['credit_spreads']):
+                state['credit_spreads'].append(spread)
+            state['cs_trades_today'] = rec.get('cs_trades_today', state.get('cs_trades_today', 0))
+        elif op == 'status_changed':
+            for s in state['credit_spreads']:
+                if str(s.get('order_id')) == str(rec['order_id']): s.update(rec['fields'])
+        elif op in ('pnl_tracked', 'counters_reset'):
+            state.update(rec['fields'])
+        elif op == 'field_set':
+            state[rec['key']] = rec['value']
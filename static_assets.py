@@ -0,0 +1,89 @@
+"""
+PROJECT HOPE v3.0 - Static Asset Serving
+HTML pages are read once at startup with gzip/brotli variants precomputed,
+served with content-hash ETags and long-lived caching. Large JSON responses
+are compressed on the fly when the client accepts it.
+"""
+import gzip, hashlib, os, threading
+from collections import OrderedDict
+from flask import Response
+import config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # gzip only
+
+
+def pick_encoding(request):
+    """Best encoding the client accepts: br, then gzip, else identity"""
+    accepted = request.accept_encodings
+    if brotli and accepted['br']: return 'br'
+    if accepted['gzip']: return 'gzip'
+    return None
+
+
+def _compress(data, encoding, fast=False):
+    if encoding == 'br': return brotli.compress(data, quality=4 if fast else 11)
+    return gzip.compress(data, compresslevel=6 if fast else 9, mtime=0)
+
+
+class StaticAssets:
+    def __init__(self, root=None, files=()):
+        self.root = root or os.path.dirname(os.path.abspath(__file__))
+        self.assets = {}  # name -> {'etag', 'mimetype', None/'gzip'/'br': bytes}
+        for name in files: self.load(name)
+
+    def load(self, name, mimetype='text/html'):
+        with open(os.path.join(self.root, name), 'rb') as f: raw = f.read()
+        asset = {'etag': hashlib.sha256(raw).hexdigest()[:16], 'mimetype': mimetype, None: raw,
+                 'gzip': _compress(raw, 'gzip')}
+        if brotli: asset['br'] = _compress(raw, 'br')
+        self.assets[name] = asset
+        sizes = ' / '.join(f"{k or 'raw'} {len(v)//1024}KB" for k, v in asset.items() if k not in ('etag', 'mimetype'))
+        print(f"[STATIC] {name}: {sizes}")
+
+    def response(self, name, request):
+        asset = self.assets[name]
+        enc = pick_encoding(request)
+        resp = Response(asset[enc], mimetype=asset['mimetype'])
+        if enc: resp.headers['Content-Encoding'] = enc
+        # Each encoding is a different representation, so it gets its own strong ETag
+        resp.set_etag(f"{asset['etag']}-{enc}" if enc else asset['etag'])
+        resp.headers['Cache-Control'] = f'public, max-age={config.STATIC_CACHE_MAX_AGE}'
+        resp.headers['Vary'] = 'Accept-Encoding'
+        return resp.make_conditional(request)
+
+
+class JSONCompressor:
+    """after_request hook: compress JSON bodies over COMPRESS_MIN_SIZE; reuses work for ETagged bodies"""
+
+    def __init__(self, min_size=None, cache_size=64):
+        self.min_size = min_size or config.COMPRESS_MIN_SIZE
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # (etag, encoding) -> bytes
+        self._lock = threading.Lock()
+
+    def __call__(self, response, request):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or response.mimetype != 'application/json' or 'Content-Encoding' in response.headers):
+            return response
+        enc = pick_encoding(request)
+        if not enc: return response
+        data = response.get_data()
+        if len(data) < self.min_size: return response
+        etag = response.get_etag()[0]
+        key = (etag, enc) if etag else None
+        with self._lock: body = self._cache.get(key) if key else None
+        if body is None:
+            body = _compress(data, enc, fast=True)
+            if key:
+                with self._lock:
+                    self._cache[key] = body
+                    if len(self._cache) > self.cache_size: self._cache.popitem(last=False)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = enc
+        response.headers['Vary'] = 'Accept-Encoding'
+        # Weak, so If-None-Match still matches the route's own ETag on the next request
+        if etag: response.set_etag(etag, weak=True)
+        return response
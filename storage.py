@@ -2,6 +2,7 @@
 PROJECT HOPE v3.0 - Persistent Storage
 Saves all trade data, analytics, and state to disk
 Auto-saves every 30 seconds, auto-loads on startup
+Trades, agreements and backtests go to append-only logs (trade_log.py)
 Nothing is lost on restart
 """
 import json
@@ -9,7 +10,10 @@ import os
 import time
 import threading
 from datetime import datetime
+from contextlib import contextmanager
 from copy import deepcopy
+from trade_log import AppendOnlyLog
+import config
 
 # Storage location - use Render persistent disk if available, else local
 STORAGE_DIR = os.environ.get('STORAGE_PATH', '/opt/render/project/data')
@@ -27,43 +31,112 @@ BACKTEST_FILE = os.path.join(STORAGE_DIR, 'backtest_results.json')
 DAILY_LOG_FILE = os.path.join(STORAGE_DIR, 'daily_log.json')
 AGREEMENTS_FILE = os.path.join(STORAGE_DIR, 'user_agreements.json')
 
+TRADE_CSV_HEADER = ['Date','Symbol','Type','Direction','Entry','Exit','P&L','Reason','Setup']
+
+# Engine state fields that survive a restart, with their defaults
+STATE_FIELDS = {
+    'autopilot': False, 'credit_spreads': [], 'wins': 0, 'losses': 0, 'consecutive_losses': 0,
+    'total_pnl': 0, 'daily_pnl': 0, 'cs_trades_today': 0, 'today': '',
+    'theme': 'dark', 'overnight_hold': False,
+}
+
+
+def state_record(state):
+    return {k: state.get(k, d) for k, d in STATE_FIELDS.items()}
+
+
+def trade_csv_row(t):
+    return [t.get('closed_at','')[:10], t.get('symbol',''), t.get('type',''),
+            t.get('direction',''), t.get('entry_price',''), t.get('exit_price',''),
+            t.get('pnl',0), t.get('close_reason',''), t.get('setup_type','')]
+
+
+class _RWLock:
+    """Many readers or one writer; waiting writers hold off new readers"""
 
-class Storage:
     def __init__(self):
-        self._lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def reading(self):
+        with self._cond:
+            self._cond.wait_for(lambda: not self._writer and not self._writers_waiting)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers: self._cond.notify_all()
+
+    @contextmanager
+    def writing(self):
+        with self._cond:
+            self._writers_waiting += 1
+            self._cond.wait_for(lambda: not self._writer and not self._readers)
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class Storage:
+    def __init__(self, storage_dir=None):
+        # Each account gets its own directory; the default account keeps the root
+        self.STORAGE_DIR = storage_dir or STORAGE_DIR
+        os.makedirs(self.STORAGE_DIR, exist_ok=True)
+        self.state_file = os.path.join(self.STORAGE_DIR, 'engine_state.json')
+        self.trades_file = os.path.join(self.STORAGE_DIR, 'trade_history.json')
+        self.analytics_file = os.path.join(self.STORAGE_DIR, 'analytics_data.json')
+        self.backtest_file = os.path.join(self.STORAGE_DIR, 'backtest_results.json')
+        self.daily_log_file = os.path.join(self.STORAGE_DIR, 'daily_log.json')
+        self.agreements_file = os.path.join(self.STORAGE_DIR, 'user_agreements.json')
+        self._lock = threading.Lock()  # guards the lock table below
+        self._file_locks = {}          # path -> _RWLock
+        self._cache = {}               # path -> ((mtime_ns, size), decoded data)
         self._save_count = 0
-        print(f"[STORAGE] Using directory: {STORAGE_DIR}")
+        self.trade_log = AppendOnlyLog(self.STORAGE_DIR, 'trades')
+        self.agreement_log = AppendOnlyLog(self.STORAGE_DIR, 'agreements')
+        self.backtest_log = AppendOnlyLog(self.STORAGE_DIR, 'backtests')
+        for legacy, log in ((self.trades_file, self.trade_log), (self.agreements_file, self.agreement_log),
+                            (self.backtest_file, self.backtest_log)):
+            self._migrate_json(legacy, log)
+        # Light (date, symbol, reason) index over the trade log for paging and filtering;
+        # built on first use, then kept current by save_trade
+        self._trade_index = None
+        self._trades_lock = threading.Lock()
+        print(f"[STORAGE] Using directory: {self.STORAGE_DIR}")
 
     # ========== SAVE FUNCTIONS ==========
 
-    def save_state(self, state):
-        """Save current engine state (positions, P&L, counters)"""
-        try:
-            data = {
-                'saved_at': datetime.now().isoformat(),
-                'autopilot': state.get('autopilot', False),
-                'credit_spreads': state.get('credit_spreads', []),
-                'wins': state.get('wins', 0),
-                'losses': state.get('losses', 0),
-                'consecutive_losses': state.get('consecutive_losses', 0),
-                'total_pnl': state.get('total_pnl', 0),
-                'daily_pnl': state.get('daily_pnl', 0),
-                'cs_trades_today': state.get('cs_trades_today', 0),
-                'today': state.get('today', ''),
-            }
-            self._write(STATE_FILE, data)
+    def save_state(self, state, wal_seq=None):
+        """Save current engine state (positions, P&L, counters); wal_seq = last WAL record it includes"""
+        try:
+            data = {'saved_at': datetime.now().isoformat(), **state_record(state)}
+            if wal_seq is not None: data['wal_seq'] = wal_seq
+            self._write(self.state_file, data)
+            return True
         except Exception as e:
             print(f"[STORAGE ERROR] save_state: {e}")
+            return False
 
     def save_trade(self, trade_data):
         """Append a completed trade to permanent history"""
         try:
-            history = self._read(TRADES_FILE) or []
-            trade_data['saved_at'] = datetime.now().isoformat()
-            history.append(trade_data)
-            self._write(TRADES_FILE, history)
+            with self._trades_lock:
+                index = self._load_trade_index()
+                trade_data['saved_at'] = datetime.now().isoformat()
+                seq = self.trade_log.append(trade_data)
+                index.append(self._index_entry(trade_data))
             self._save_count += 1
-            print(f"[STORAGE] Trade #{len(history)} saved: {trade_data.get('symbol','')} {trade_data.get('pnl','')}")
+            print(f"[STORAGE] Trade #{seq + 1} saved: {trade_data.get('symbol','')} {trade_data.get('pnl','')}")
         except Exception as e:
             print(f"[STORAGE ERROR] save_trade: {e}")
 
@@ -71,45 +144,43 @@ class Storage:
         """Save analytics snapshot"""
         try:
             data = {'saved_at': datetime.now().isoformat(), **analytics_data}
-            self._write(ANALYTICS_FILE, data)
+            self._write(self.analytics_file, data)
         except Exception as e:
             print(f"[STORAGE ERROR] save_analytics: {e}")
 
     def save_backtest(self, results):
         """Save backtest results"""
         try:
-            all_results = self._read(BACKTEST_FILE) or []
             results['saved_at'] = datetime.now().isoformat()
-            all_results.append(results)
-            # Keep last 20 backtests
-            if len(all_results) > 20:
-                all_results = all_results[-20:]
-            self._write(BACKTEST_FILE, all_results)
+            self.backtest_log.append(results)
+            # Keep last 20 backtests; compact once the log holds twice that
+            if len(self.backtest_log) > 40:
+                self.backtest_log.compact(keep_last=20)
         except Exception as e:
             print(f"[STORAGE ERROR] save_backtest: {e}")
 
     def save_daily_log(self, date_str, log_entry):
         """Save daily summary log"""
         try:
-            logs = self._read(DAILY_LOG_FILE) or {}
-            if date_str not in logs:
-                logs[date_str] = {'trades': 0, 'wins': 0, 'losses': 0, 'pnl': 0, 'entries': []}
-            logs[date_str]['entries'].append(log_entry)
-            self._write(DAILY_LOG_FILE, logs)
+            def add(logs):
+                if date_str not in logs:
+                    logs[date_str] = {'trades': 0, 'wins': 0, 'losses': 0, 'pnl': 0, 'entries': []}
+                logs[date_str]['entries'].append(deepcopy(log_entry))
+            self._modify(self.daily_log_file, add, {})
         except Exception as e:
             print(f"[STORAGE ERROR] save_daily_log: {e}")
 
     def update_daily_summary(self, date_str, trades, wins, losses, pnl):
         """Update daily summary stats"""
         try:
-            logs = self._read(DAILY_LOG_FILE) or {}
-            if date_str not in logs:
-                logs[date_str] = {'trades': 0, 'wins': 0, 'losses': 0, 'pnl': 0, 'entries': []}
-            logs[date_str]['trades'] = trades
-            logs[date_str]['wins'] = wins
-            logs[date_str]['losses'] = losses
-            logs[date_str]['pnl'] = round(pnl, 2)
-            self._write(DAILY_LOG_FILE, logs)
+            def update(logs):
+                if date_str not in logs:
+                    logs[date_str] = {'trades': 0, 'wins': 0, 'losses': 0, 'pnl': 0, 'entries': []}
+                logs[date_str]['trades'] = trades
+                logs[date_str]['wins'] = wins
+                logs[date_str]['losses'] = losses
+                logs[date_str]['pnl'] = round(pnl, 2)
+            self._modify(self.daily_log_file, update, {})
         except Exception as e:
             print(f"[STORAGE ERROR] update_daily: {e}")
 
@@ -118,7 +189,7 @@ class Storage:
     def load_state(self):
         """Load saved engine state"""
         try:
-            data = self._read(STATE_FILE)
+            data = deepcopy(self._read(self.state_file))
             if data:
                 print(f"[STORAGE] State loaded from {data.get('saved_at', 'unknown')}")
                 return data
@@ -131,56 +202,92 @@ class Storage:
     def load_trade_history(self):
         """Load all trade history"""
         try:
-            history = self._read(TRADES_FILE) or []
+            history = list(self.trade_log)
             print(f"[STORAGE] Loaded {len(history)} historical trades")
             return history
         except Exception as e:
             print(f"[STORAGE ERROR] load_history: {e}")
             return []
 
+    def query_trades(self, cursor=None, limit=100, start=None, end=None, symbol=None, close_reason=None, order='desc'):
+        """One page of trade history, filtered on the in-memory index.
+
+        cursor is a trade sequence number: 'desc' pages walk back from it (newest first),
+        'asc' pages walk forward from it. Trades in a page are always oldest first.
+        """
+        match = self._trade_matcher(start, end, symbol, close_reason)
+        with self._trades_lock:
+            index = self._load_trade_index()
+            total = len(index); found = []
+            if order == 'asc':
+                pos = max(int(cursor or 0), 0)
+                while pos < total and len(found) < limit:
+                    if match(index[pos]): found.append(pos)
+                    pos += 1
+                next_cursor = pos if pos < total else None
+            else:
+                pos = total if cursor is None else min(int(cursor), total)
+                while pos > 0 and len(found) < limit:
+                    pos -= 1
+                    if match(index[pos]): found.append(pos)
+                next_cursor = pos if pos > 0 else None
+                found.reverse()
+        page = [{**t, 'seq': p} for p, t in zip(found, self.trade_log.read_many(found))]
+        return {'total': total, 'count': len(page), 'trades': page, 'next_cursor': next_cursor}
+
+    def iter_trades(self, start=None, end=None, symbol=None, close_reason=None, chunk=500):
+        """Stream matching trades oldest first, one page at a time"""
+        cursor = 0
+        while cursor is not None:
+            page = self.query_trades(cursor, chunk, start, end, symbol, close_reason, order='asc')
+            yield from page['trades']
+            cursor = page['next_cursor']
+
     def load_backtests(self):
         """Load saved backtest results"""
         try:
-            return self._read(BACKTEST_FILE) or []
+            return list(self.backtest_log.iter(max(self.backtest_log.start, self.backtest_log.end - 20)))
         except:
             return []
 
     def load_daily_logs(self):
         """Load all daily logs"""
         try:
-            return self._read(DAILY_LOG_FILE) or {}
+            return self._read(self.daily_log_file) or {}
         except:
             return {}
 
     # ========== STATS ==========
 
+    @property
+    def save_count(self):
+        """Trades saved by this instance; moves whenever trade history grows"""
+        return self._save_count
+
     def get_storage_stats(self):
         """Get storage status info"""
         try:
-            history = self._read(TRADES_FILE) or []
-            logs = self._read(DAILY_LOG_FILE) or {}
-            backtests = self._read(BACKTEST_FILE) or []
-            state_exists = os.path.exists(STATE_FILE)
+            logs = self._read(self.daily_log_file) or {}
+            state_exists = os.path.exists(self.state_file)
             return {
-                'storage_dir': STORAGE_DIR,
-                'total_trades_saved': len(history),
+                'storage_dir': self.STORAGE_DIR,
+                'backend': 'json',
+                'total_trades_saved': len(self.trade_log),
                 'total_days_logged': len(logs),
-                'total_backtests': len(backtests),
+                'total_backtests': min(len(self.backtest_log), 20),
                 'state_saved': state_exists,
-                'state_file_size': os.path.getsize(STATE_FILE) if state_exists else 0,
-                'trades_file_size': os.path.getsize(TRADES_FILE) if os.path.exists(TRADES_FILE) else 0,
+                'state_file_size': os.path.getsize(self.state_file) if state_exists else 0,
+                'trades_file_size': self.trade_log.size_bytes(),
                 'save_count_this_session': self._save_count,
             }
         except:
-            return {'storage_dir': STORAGE_DIR, 'error': 'Could not read stats'}
+            return {'storage_dir': self.STORAGE_DIR, 'error': 'Could not read stats'}
 
 
     def save_agreement(self, data):
         try:
-            records = self._read(AGREEMENTS_FILE) or []
             data['saved_at'] = datetime.now().isoformat()
-            records.append(data)
-            self._write(AGREEMENTS_FILE, records)
+            self.agreement_log.append(data)
             print(f'[STORAGE] Agreement saved: {data.get("type","unknown")}')
             return True
         except Exception as e:
@@ -188,51 +295,242 @@ class Storage:
             return False
 
     def load_agreements(self):
-        return self._read(AGREEMENTS_FILE) or []
+        return list(self.agreement_log)
+
+    def search_agreements(self, q):
+        """Agreements whose name, email or ip starts with q (case-insensitive), as in the SQLite backend"""
+        q = (q or '').lower()
+        return [r for r in self.agreement_log if any(str(r.get(k) or '').lower().startswith(q) for k in ('name', 'email', 'ip'))]
+
+    # ========== JOURNAL / EARNINGS ==========
+
+    def load_journal(self):
+        return deepcopy(self._read(os.path.join(self.STORAGE_DIR, 'journal.json'))) or []
+
+    def save_journal_entry(self, entry):
+        """Insert or replace a journal entry by id"""
+        entry = deepcopy(entry)
+        def upsert(entries):
+            for i, e in enumerate(entries):
+                if e.get('id') == entry.get('id'):
+                    entries[i] = entry; return
+            entries.append(entry)
+        self._modify(os.path.join(self.STORAGE_DIR, 'journal.json'), upsert, [])
+
+    def load_earnings(self):
+        return self._read(os.path.join(self.STORAGE_DIR, 'earnings.json')) or {}
+
+    def save_earnings(self, symbol, data):
+        self._modify(os.path.join(self.STORAGE_DIR, 'earnings.json'),
+                     lambda earnings_all: earnings_all.__setitem__(symbol, deepcopy(data)), {})
+
+    def symbol_stats(self, symbol=None):
+        """Per-symbol trade count, wins and P&L"""
+        stats = {}
+        for t in self.trade_log:
+            sym = t.get('symbol', '')
+            if symbol and sym.upper() != symbol.upper(): continue
+            s = stats.setdefault(sym, {'symbol': sym, 'trades': 0, 'wins': 0, 'pnl': 0})
+            s['trades'] += 1; s['wins'] += 1 if t.get('pnl', 0) > 0 else 0; s['pnl'] += t.get('pnl', 0)
+        for s in stats.values(): s['pnl'] = round(s['pnl'], 2)
+        return sorted(stats.values(), key=lambda s: s['pnl'], reverse=True)
 
     # ========== INTERNAL ==========
 
-    def _write(self, filepath, data):
+    def _load_trade_index(self):
+        # Caller holds _trades_lock
+        if self._trade_index is None:
+            self._trade_index = [self._index_entry(t) for t in self.trade_log]
+        return self._trade_index
+
+    def _migrate_json(self, filepath, log):
+        """One-time move of a legacy JSON list file into its log; resumes if interrupted"""
+        if not os.path.exists(filepath): return
+        records = self._read(filepath) or []
+        if len(log) < len(records):
+            log.extend(records[len(log):])
+            print(f"[STORAGE] Migrated {len(records)} records from {os.path.basename(filepath)} to {log.name} log")
+        os.replace(filepath, filepath + '.migrated')
+
+    @staticmethod
+    def _index_entry(t):
+        return (str(t.get('closed_at', ''))[:10], str(t.get('symbol', '')).upper(), str(t.get('close_reason', '')).lower())
+
+    @staticmethod
+    def _trade_matcher(start=None, end=None, symbol=None, close_reason=None):
+        symbol = symbol.upper() if symbol else None
+        close_reason = close_reason.lower() if close_reason else None
+        def match(entry):
+            day, sym, reason = entry
+            if start and day < start: return False
+            if end and day > end[:10]: return False
+            if symbol and sym != symbol: return False
+            if close_reason and not reason.startswith(close_reason): return False
+            return True
+        return match
+
+    def _file_lock(self, filepath):
         with self._lock:
-            # Write to temp file first, then rename (atomic)
-            tmp = filepath + '.tmp'
-            with open(tmp, 'w') as f:
-                json.dump(data, f, default=str)
-            os.replace(tmp, filepath)
+            lock = self._file_locks.get(filepath)
+            if lock is None: lock = self._file_locks[filepath] = _RWLock()
+            return lock
+
+    @staticmethod
+    def _file_sig(filepath):
+        try:
+            st = os.stat(filepath)
+            return (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _write(self, filepath, data):
+        with self._file_lock(filepath).writing():
+            self._write_locked(filepath, data)
+            # The caller may keep mutating `data`, so it isn't cached; the next read re-parses
+            self._cache.pop(filepath, None)
+
+    def _write_locked(self, filepath, data):
+        # Write to temp file first, then rename (atomic)
+        tmp = filepath + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f, default=str)
+        os.replace(tmp, filepath)
 
     def _read(self, filepath):
-        with self._lock:
-            if not os.path.exists(filepath):
-                return None
-            try:
-                with open(filepath, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                print(f"[STORAGE WARNING] Corrupt file: {filepath}")
-                return None
+        """Decoded file contents, shared with other readers: treat as read-only (see _modify)"""
+        with self._file_lock(filepath).reading():
+            return self._read_locked(filepath)
 
+    def _read_locked(self, filepath):
+        sig = self._file_sig(filepath)
+        if sig is None: return None
+        hit = self._cache.get(filepath)
+        if hit and hit[0] == sig: return hit[1]
+        try:
+            with open(filepath, 'r') as f:
+                data = json.load(f)
+        except json.JSONDecodeError:
+            print(f"[STORAGE WARNING] Corrupt file: {filepath}")
+            return None
+        self._cache[filepath] = (sig, data)
+        return data
+
+    def _modify(self, filepath, fn, default=None):
+        """Read-modify-write under the file's write lock; fn mutates a private copy"""
+        with self._file_lock(filepath).writing():
+            current = self._read_locked(filepath)
+            data = deepcopy(current) if current is not None else deepcopy(default)
+            fn(data)
+            self._write_locked(filepath, data)
+            self._cache[filepath] = (self._file_sig(filepath), data)
+            return data
+
+
+def create_storage(storage_dir=None):
+    """Storage for the configured STORAGE_BACKEND: 'json' (files + append-only logs) or 'sqlite'"""
+    if config.STORAGE_BACKEND == 'sqlite':
+        from sqlite_storage import SQLiteStorage
+        return SQLiteStorage(storage_dir)
+    return Storage(storage_dir)
 
-class AutoSaver:
-    """Background thread that auto-saves engine state every N seconds"""
 
-    def __init__(self, storage, engine, interval=30):
+class StatePersister:
+    """Write-behind engine state saver on its own I/O thread
+
+    request() marks the state dirty and returns at once; bursts of requests coalesce into
+    one write within `window` seconds. Between requests the state is still checked every
+    `interval` seconds. Serialized fields are compared with the last write, so unchanged
+    state is never rewritten. flush() writes now and waits, for critical events.
+    """
+
+    def __init__(self, storage, engine, window=None, interval=None, wal=None):
         self.storage = storage
         self.engine = engine
-        self.interval = interval
+        self.wal = wal  # StateWAL: snapshots record its seq and checkpoint it
+        self.window = window or config.STATE_SAVE_WINDOW
+        self.interval = interval or config.STATE_SAVE_INTERVAL
+        self._cond = threading.Condition()
+        self._requested_at = None  # time of the oldest unwritten request
+        self._flush_seq = 0        # flushes asked for / completed
+        self._flushed_seq = 0
+        self._saved_ok = True      # outcome of the last write the I/O thread attempted
+        self._last = {}            # field -> serialized value as last written
+        self.dirty_fields = []
+        self.writes = 0
+        self.skipped = 0
         self.running = False
+        self._thread = None
 
     def start(self):
         self.running = True
-        threading.Thread(target=self._loop, daemon=True).start()
-        print(f"[STORAGE] Auto-save started (every {self.interval}s)")
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        print(f"[STORAGE] State persister started (window {self.window}s, check every {self.interval}s)")
 
     def stop(self):
-        self.running = False
+        """Stop the I/O thread after a final write"""
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+        if self._thread: self._thread.join(timeout=10)
+        self._save()
+
+    def request(self):
+        with self._cond:
+            if self._requested_at is None: self._requested_at = time.time()
+            self._cond.notify_all()
+
+    def flush(self, timeout=10):
+        """Write any changes now and wait for them to hit storage; True only if the write succeeded"""
+        if not self.running: return self._save()
+        with self._cond:
+            self._flush_seq += 1; target = self._flush_seq
+            self._cond.notify_all()
+            if not self._cond.wait_for(lambda: self._flushed_seq >= target, timeout): return False
+            return self._saved_ok
+
+    def get_stats(self):
+        return {'writes': self.writes, 'skipped': self.skipped, 'last_dirty_fields': self.dirty_fields}
 
     def _loop(self):
+        last_check = time.time()
         while self.running:
+            with self._cond:
+                due = lambda: (self._requested_at + self.window) if self._requested_at else last_check + self.interval
+                while self.running and self._flush_seq <= self._flushed_seq and time.time() < due():
+                    self._cond.wait(due() - time.time())
+                target = self._flush_seq
+                self._requested_at = None
             try:
-                self.storage.save_state(self.engine.state)
+                ok = self._save()
             except Exception as e:
-                print(f"[AUTOSAVE ERROR] {e}")
-            time.sleep(self.interval)
+                print(f"[PERSIST ERROR] {e}"); ok = False
+            last_check = time.time()
+            with self._cond:
+                self._saved_ok = ok
+                self._flushed_seq = max(self._flushed_seq, target)
+                self._cond.notify_all()
+
+    def _save(self):
+        # Read the WAL position before the state: every record up to it is already applied
+        wal_seq = self.wal.seq if self.wal else None
+        # Another thread may be mutating the state while it is serialized; retry on that
+        for _ in range(3):
+            try:
+                current = {k: json.dumps(v, default=str, sort_keys=True) for k, v in state_record(self.engine.state).items()}
+                break
+            except RuntimeError:
+                time.sleep(0.01)
+        else:
+            return False
+        current['wal_seq'] = wal_seq
+        dirty = [k for k, v in current.items() if self._last.get(k) != v]
+        if not dirty:
+            self.skipped += 1
+            return True
+        if not self.storage.save_state(self.engine.state, wal_seq=wal_seq): return False
+        if self.wal: self.wal.checkpoint(wal_seq)
+        self._last = current
+        self.dirty_fields = dirty
+        self.writes += 1
+        return True
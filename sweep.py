@@ -0,0 +1,258 @@
+"""
+PROJECT HOPE v3.0 - Parameter Sweep
+Grid or random search over credit spread rules across many symbols.
+
+Swept parameters (see DEFAULT_SPACE):
+    short_otm / short_delta  short strike as % below the close, or by put delta from 20-day realized vol
+    width, credit_pct        spread width and credit as a fraction of it
+    hold_days                max trading days held; expiry settles on that day's close
+    take_profit              close once this fraction of the credit is captured
+    stop_loss                close once the loss reaches this multiple of the credit
+    entry_every              trading days between entries
+
+Price model (price-only, like Backtester): the spread is worth the larger of its intrinsic
+debit and the credit decayed linearly to expiry. Stops are checked against each day's low,
+take-profit against its close; if both trigger on one day the stop wins.
+
+Histories are fetched once, packed into one shared-memory block and read in place by a
+process pool. Finished sweeps are cached on disk by parameters + a digest of the prices.
+"""
+import hashlib, itertools, json, math, os, random, time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_all_start_methods, get_context, shared_memory
+from statistics import NormalDist
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import config
+import storage
+
+MODEL_VERSION = 1
+DEFAULT_SPACE = {
+    'short_otm': [0.03, 0.05, 0.07, 0.10],
+    'width': [config.CS_SPREAD_WIDTH],
+    'credit_pct': [0.22],
+    'hold_days': [14, 21, 30],
+    'take_profit': [0.5, 0.75],
+    'stop_loss': [1.0, 2.0],
+    'entry_every': [5],
+}
+DEFAULTS = {'short_otm': 0.05, 'short_delta': None, 'width': config.CS_SPREAD_WIDTH, 'credit_pct': 0.22,
+            'hold_days': 21, 'take_profit': 0.5, 'stop_loss': 2.0, 'entry_every': 5}
+RANK_METRICS = ('total_pnl', 'return_pct', 'sharpe', 'win_rate', 'profit_factor', 'avg_max_dd')
+
+_shared = {}  # worker process: {'shm', 'data', 'offsets'}
+
+
+# ========== SIMULATION ==========
+
+def simulate(close, low, p):
+    """Per-trade P&L (per 1 contract) for one symbol's closes/lows under parameter set `p`"""
+    p = {**DEFAULTS, **p}
+    n = len(close); hold = int(p['hold_days']); every = max(1, int(p['entry_every']))
+    width = float(p['width']); credit = width * float(p['credit_pct'])
+    if n <= hold + 20: return np.zeros(0)
+    entries = np.arange(20, n - hold, every)
+    entries = entries[close[entries] > 0]
+    if not len(entries): return np.zeros(0)
+    price = close[entries]
+    if p.get('short_delta'):
+        # Put with |delta| = short_delta: N(d1) = 1 - delta, K = S * exp(-d1 * vol * sqrt(T) + (r + vol^2/2) * T)
+        logret = np.diff(np.log(np.where(close > 0, close, np.nan)))
+        vol = sliding_window_view(logret, 20).std(axis=1, ddof=1) * math.sqrt(252)  # vol[k] uses closes k..k+20; NaN if any is missing
+        sigma = vol[entries - 20]; T = hold / 252
+        d1 = NormalDist().inv_cdf(1 - float(p['short_delta']))
+        short = price * np.exp(-d1 * sigma * math.sqrt(T) + (config.RISK_FREE_RATE + sigma ** 2 / 2) * T)
+        keep = np.isfinite(short); entries, price, short = entries[keep], price[keep], short[keep]
+    else:
+        short = price * (1 - float(p['short_otm']))
+    days = np.arange(1, hold + 1)
+    lows = sliding_window_view(low, hold + 1)[entries][:, 1:]
+    closes = sliding_window_view(close, hold + 1)[entries][:, 1:]
+    decay = credit * (1 - days / hold)
+    worst = np.maximum(np.clip(short[:, None] - lows, 0, width), decay)
+    at_close = np.maximum(np.clip(short[:, None] - closes, 0, width), decay)
+    stop = worst - credit >= float(p['stop_loss']) * credit
+    take = credit - at_close >= float(p['take_profit']) * credit
+    # First trigger per trade; a stop beats a take-profit on the same day
+    first_stop = np.where(stop.any(1), stop.argmax(1), hold)
+    first_take = np.where(take.any(1), take.argmax(1), hold)
+    rows = np.arange(len(entries))
+    exit_value = np.where(first_stop <= first_take, worst[rows, np.minimum(first_stop, hold - 1)],
+                          at_close[rows, np.minimum(first_take, hold - 1)])
+    expired = (first_stop == hold) & (first_take == hold)
+    exit_value = np.where(expired, np.clip(short - closes[:, -1], 0, width), exit_value)
+    return (credit - exit_value) * 100
+
+
+def metrics(pnls, periods_per_year):
+    """Summary of per-trade P&L for one or more symbols"""
+    trades = sum(len(x) for x in pnls)
+    if not trades: return {'trades': 0, 'wins': 0, 'win_rate': 0, 'total_pnl': 0, 'return_pct': 0,
+                           'sharpe': 0, 'profit_factor': 0, 'avg_max_dd': 0}
+    allp = np.concatenate(pnls)
+    wins = int((allp > 0).sum()); gp = float(allp[allp > 0].sum()); gl = float(-allp[allp <= 0].sum())
+    std = float(allp.std(ddof=1)) if trades > 1 else 0
+    dds = []
+    for x in pnls:
+        if not len(x): continue
+        bal = config.BACKTEST_INITIAL_BALANCE + np.cumsum(x)
+        peak = np.maximum.accumulate(np.maximum(bal, config.BACKTEST_INITIAL_BALANCE))
+        dds.append(float(((peak - bal) / peak).max() * 100))
+    return {
+        'trades': trades, 'wins': wins, 'win_rate': round(wins / trades * 100, 1),
+        'total_pnl': round(float(allp.sum()), 2),
+        'return_pct': round(float(allp.sum()) / (config.BACKTEST_INITIAL_BALANCE * len(dds)) * 100, 1),
+        'sharpe': round(float(allp.mean()) / std * math.sqrt(periods_per_year), 2) if std > 0 else 0,
+        'profit_factor': round(gp / gl, 2) if gl > 0 else 99,
+        'avg_max_dd': round(sum(dds) / len(dds), 1),
+    }
+
+
+def _evaluate(combos, data=None, offsets=None):
+    """Worker task: every parameter set in `combos` across every symbol in the shared block"""
+    if data is None: data, offsets = _shared['data'], _shared['offsets']
+    out = []
+    for p in combos:
+        per_symbol = {sym: simulate(data[0, a:b], data[1, a:b], p) for sym, (a, b) in offsets.items()}
+        row = {**p, **metrics(list(per_symbol.values()), 252 / max(1, int({**DEFAULTS, **p}['entry_every'])))}
+        row['per_symbol'] = {s: round(float(x.sum()), 2) for s, x in per_symbol.items()}
+        out.append(row)
+    return out
+
+
+def _attach(name, shape, offsets):
+    """Pool initializer: map the parent's price block read-only"""
+    shm = shared_memory.SharedMemory(name=name)
+    data = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    data.flags.writeable = False
+    _shared.update(shm=shm, data=data, offsets=offsets)
+
+
+def _pool_context():
+    """forkserver (spawn where unavailable), never fork: forking the multithreaded engine process
+    can copy a lock another thread holds into the child, which then deadlocks on it. The fork
+    server starts clean and preloads only this module (numpy), so each worker is a cheap fork of it
+    and the price block arrives by shared-memory name."""
+    if 'forkserver' not in get_all_start_methods(): return get_context('spawn')
+    ctx = get_context('forkserver')
+    ctx.set_forkserver_preload([__name__])
+    return ctx
+
+
+# ========== SWEEP ==========
+
+class ParameterSweep:
+    def __init__(self, api, cache_dir=None, workers=None):
+        self.api = api
+        self.cache_dir = cache_dir or config.SWEEP_CACHE_DIR or os.path.join(storage.STORAGE_DIR, 'sweeps')
+        self.workers = workers or config.SWEEP_WORKERS or os.cpu_count() or 1
+
+    def combos(self, space=None, mode='grid', samples=None, seed=0):
+        """Parameter sets to test: the full grid, or `samples` random picks from it"""
+        space = {k: (v if isinstance(v, (list, tuple)) else [v]) for k, v in (space or DEFAULT_SPACE).items() if k in DEFAULTS}
+        if 'short_delta' in space: space.pop('short_otm', None)
+        keys = sorted(space)
+        sizes = [len(space[k]) for k in keys]
+        total = math.prod(sizes)
+        if mode == 'random':
+            count = min(samples or config.SWEEP_MAX_COMBOS, total, config.SWEEP_MAX_COMBOS)
+            picks = random.Random(seed).sample(range(total), count)
+            out = []
+            for flat in picks:
+                p = {}
+                for k, size in zip(reversed(keys), reversed(sizes)):
+                    flat, j = divmod(flat, size); p[k] = space[k][j]
+                out.append(p)
+            return out
+        if total > config.SWEEP_MAX_COMBOS:
+            raise ValueError(f"{total} combinations exceeds SWEEP_MAX_COMBOS={config.SWEEP_MAX_COMBOS}; use mode='random'")
+        return [dict(zip(keys, vals)) for vals in itertools.product(*(space[k] for k in keys))]
+
+    def run(self, symbols=None, days=365, space=None, mode='grid', samples=None, seed=0, rank_by='sharpe', top=50):
+        """Run (or load from cache) a sweep; returns the ranked table and a heatmap matrix"""
+        symbols = [s.upper() for s in (symbols or ['SPY', 'QQQ', 'IWM'])]
+        combos = self.combos(space, mode, samples, seed)
+        rank_by = rank_by if rank_by in RANK_METRICS else 'sharpe'
+        t0 = time.time()
+        data, offsets = self._load_prices(symbols, days)
+        if not offsets: return {'error': 'No price history for any symbol', 'symbols': symbols}
+        key = hashlib.sha256(json.dumps({'v': MODEL_VERSION, 'combos': combos, 'symbols': sorted(offsets), 'days': days,
+                                         'prices': hashlib.sha1(data.tobytes()).hexdigest()},
+                                        sort_keys=True, default=str).encode()).hexdigest()[:24]
+        cached = self._cache_get(key)
+        if cached:
+            rows = cached
+            print(f"[SWEEP] Cache hit {key} ({len(rows)} combos)")
+        else:
+            rows = self._execute(data, offsets, combos)
+            self._cache_put(key, rows)
+        varying = [k for k in sorted({k for c in combos for k in c}) if len({json.dumps(c.get(k)) for c in combos}) > 1]
+        ranked = sorted(rows, key=lambda r: r[rank_by], reverse=rank_by != 'avg_max_dd')
+        print(f"[SWEEP] {len(combos)} combos x {len(offsets)} symbols in {time.time() - t0:.1f}s")
+        return {
+            'symbols': sorted(offsets), 'missing': [s for s in symbols if s not in offsets], 'days': days,
+            'mode': mode, 'combos': len(combos), 'rank_by': rank_by, 'cache_key': key, 'cached': bool(cached),
+            'varying': varying, 'ranked': ranked[:top],
+            'heatmap': self.heatmap(rows, *(varying + [None, None])[:2], metric=rank_by),
+            'elapsed': round(time.time() - t0, 2),
+        }
+
+    @staticmethod
+    def heatmap(rows, x, y, metric='sharpe'):
+        """Best `metric` per (x, y) cell over all other parameters: {'x','y','x_values','y_values','z'}"""
+        if not x: return None
+        better = (lambda a, b: a < b) if metric == 'avg_max_dd' else (lambda a, b: a > b)
+        xs = sorted({r[x] for r in rows}); ys = sorted({r[y] for r in rows}) if y else [None]
+        z = [[None] * len(xs) for _ in ys]
+        for r in rows:
+            i = ys.index(r[y]) if y else 0; j = xs.index(r[x])
+            if z[i][j] is None or better(r[metric], z[i][j]): z[i][j] = r[metric]
+        return {'x': x, 'y': y, 'metric': metric, 'x_values': xs, 'y_values': ys, 'z': z}
+
+    # ========== INTERNAL ==========
+
+    def _load_prices(self, symbols, days):
+        """All histories packed as one (2, N) array of closes/lows plus {symbol: (start, end)}"""
+        closes, lows, offsets, pos = [], [], {}, 0
+        for sym in symbols:
+            try: hist = self.api.get_history(sym, days) or []
+            except Exception as e:
+                print(f"[SWEEP ERR] {sym}: {e}"); continue
+            if len(hist) < 30: continue
+            c = np.array([h.get('close', 0) or 0 for h in hist], dtype=float)
+            l = np.array([h.get('low') if h.get('low') is not None else h.get('close', 0) or 0 for h in hist], dtype=float)
+            closes.append(c); lows.append(l); offsets[sym] = (pos, pos + len(c)); pos += len(c)
+        if not offsets: return np.zeros((2, 0)), {}
+        return np.stack([np.concatenate(closes), np.concatenate(lows)]), offsets
+
+    def _execute(self, data, offsets, combos):
+        # Spawning workers costs ~1s; below a few million combo-days one process is faster
+        workers = min(self.workers, len(combos), len(combos) * data.shape[1] // 4000000)
+        if workers <= 1: return _evaluate(combos, data, offsets)
+        shm = shared_memory.SharedMemory(create=True, size=max(data.nbytes, 1))
+        try:
+            np.ndarray(data.shape, dtype=np.float64, buffer=shm.buf)[:] = data
+            chunks = [combos[i::workers * 4] for i in range(workers * 4)]
+            with ProcessPoolExecutor(workers, mp_context=_pool_context(), initializer=_attach,
+                                     initargs=(shm.name, data.shape, offsets)) as pool:
+                return [row for part in pool.map(_evaluate, [c for c in chunks if c]) for row in part]
+        finally:
+            shm.close(); shm.unlink()
+
+    def _cache_get(self, key):
+        path = os.path.join(self.cache_dir, f'{key}.json')
+        try:
+            with open(path) as f: return json.load(f)
+        except (OSError, ValueError): return None
+
+    def _cache_put(self, key, rows):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = os.path.join(self.cache_dir, f'{key}.tmp')
+            with open(tmp, 'w') as f: json.dump(rows, f)
+            os.replace(tmp, os.path.join(self.cache_dir, f'{key}.json'))
+            files = sorted((os.path.getmtime(p), p) for p in
+                           (os.path.join(self.cache_dir, n) for n in os.listdir(self.cache_dir)) if p.endswith('.json'))
+            for _, p in files[:-config.SWEEP_CACHE_KEEP]: os.remove(p)
+        except Exception as e:
+            print(f"[SWEEP ERR] cache write: {e}")
@@ -0,0 +1,105 @@
+import json, os, random, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+from backtester import Backtester
+
+
+class _History:
+    def __init__(self, history): self.history = history
+    def get_history(self, symbol, days=365): return self.history
+
+
+def _loop_backtest(bt, symbol, days, history):
+    """run_credit_spread_backtest as it was before vectorizing: one nested forward scan per entry"""
+    trades = []
+    balance = config.BACKTEST_INITIAL_BALANCE
+    wins = losses = 0
+    peak = balance
+    max_dd = 0
+    daily_returns = []
+
+    i = 0
+    while i < len(history) - 25:
+        entry = history[i]
+        price = entry.get('close', 0)
+        if price <= 0:
+            i += 1
+            continue
+
+        short_strike = round(price * 0.95, 2)
+        long_strike = short_strike - config.CS_SPREAD_WIDTH
+        credit = round(config.CS_SPREAD_WIDTH * 0.22, 2)
+        max_loss = config.CS_SPREAD_WIDTH - credit
+
+        exit_idx = min(i + 21, len(history) - 1)
+        min_price = price
+        for j in range(i, exit_idx + 1):
+            low = history[j].get('low', price)
+            if low < min_price:
+                min_price = low
+
+        if min_price > short_strike:
+            pnl = round(credit * 0.50 * 100, 2)
+            wins += 1
+            result = 'WIN'
+        elif min_price <= long_strike:
+            pnl = round(-max_loss * 100, 2)
+            losses += 1
+            result = 'MAX_LOSS'
+        else:
+            intrusion = (short_strike - min_price) / config.CS_SPREAD_WIDTH
+            pnl = round(-(intrusion * max_loss) * 100, 2)
+            losses += 1
+            result = 'STOP_LOSS'
+
+        balance += pnl
+        daily_returns.append(pnl / max(balance, 1))
+        if balance > peak: peak = balance
+        dd = ((peak - balance) / peak * 100) if peak > 0 else 0
+        if dd > max_dd: max_dd = dd
+
+        trades.append({
+            'date': entry.get('date', ''), 'symbol': symbol,
+            'entry': price, 'short': short_strike, 'long': long_strike,
+            'credit': credit, 'min_price': round(min_price, 2),
+            'pnl': pnl, 'result': result, 'balance': round(balance, 2)
+        })
+        i += 5
+
+    return bt._compile_results(symbol, days, trades, wins, losses, balance, max_dd, daily_returns)
+
+
+def _random_history(rng, n):
+    price = rng.uniform(20, 500); out = []
+    for k in range(n):
+        price = max(1.0, price * (1 + rng.gauss(0, 0.02)))
+        bar = {'date': f"{2020 + k // 365}-{k % 365 // 31 + 1:02d}-{k % 31 + 1:02d}", 'close': round(price, 2)}
+        r = rng.random()
+        if r < 0.05: bar['close'] = 0          # zero close: not an entry day
+        elif r < 0.08: del bar['close']        # missing close
+        if rng.random() > 0.1: bar['low'] = round(price * (1 - abs(rng.gauss(0, 0.03))), 2)  # else missing low
+        out.append(bar)
+    return out
+
+
+def test_vectorized_matches_loop_implementation():
+    rng = random.Random(43)
+    for n in [30, 31, 47, 60, 252, 500, 1200] + [rng.randint(30, 1500) for _ in range(25)]:
+        history = _random_history(rng, n)
+        bt = Backtester(_History(history))
+        new = bt.run_credit_spread_backtest('TEST', n)
+        old = _loop_backtest(bt, 'TEST', n, history)
+        assert json.dumps(new, sort_keys=True) == json.dumps(old, sort_keys=True), n
+
+
+def test_crash_through_long_strike_is_max_loss():
+    history = [{'date': f'2024-01-{k + 1:02d}', 'close': 100.0, 'low': 99.0} for k in range(40)]
+    history[10]['low'] = 50.0
+    bt = Backtester(_History(history))
+    new = bt.run_credit_spread_backtest('TEST', 40)
+    assert json.dumps(new, sort_keys=True) == json.dumps(_loop_backtest(bt, 'TEST', 40, history), sort_keys=True)
+    assert any(t['result'] == 'MAX_LOSS' for t in new['trades'])
+
+
+def test_short_history_is_an_error():
+    assert 'error' in Backtester(_History([{'close': 100}] * 29)).run_credit_spread_backtest('TEST', 29)
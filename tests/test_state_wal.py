@@ -0,0 +1,35 @@
+import os, sys, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from state_wal import StateWAL
+
+
+def test_restart_after_checkpoint_keeps_new_records():
+    with tempfile.TemporaryDirectory() as d:
+        state = {'credit_spreads': [], 'wins': 0, 'losses': 0, 'consecutive_losses': 0, 'total_pnl': 0}
+        wal = StateWAL(d)
+        state['wins'] = 1; wal.pnl_tracked(state)
+        state['wins'] = 2; wal.pnl_tracked(state)
+        # Snapshot includes everything so far, then the log is checkpointed empty
+        snapshot = {**state, 'wal_seq': wal.seq}
+        wal.checkpoint(snapshot['wal_seq'])
+        assert wal.records() == []
+
+        # Restart: snapshot loaded, new mutations logged, then crash before the next snapshot
+        wal = StateWAL(d, snapshot['wal_seq'])
+        state = dict(snapshot)
+        state['wins'] = 3; state['total_pnl'] = 50
+        assert wal.pnl_tracked(state) > snapshot['wal_seq']
+
+        # Second restart replays the post-checkpoint record on top of the snapshot
+        restored = dict(snapshot)
+        wal = StateWAL(d, snapshot['wal_seq'])
+        assert wal.replay(restored, snapshot['wal_seq']) == 1
+        assert restored['wins'] == 3 and restored['total_pnl'] == 50
+
+
+def test_seq_continues_from_log_when_above_snapshot():
+    with tempfile.TemporaryDirectory() as d:
+        wal = StateWAL(d)
+        for i in range(5): wal.field_set('theme', f't{i}')
+        assert StateWAL(d, 2).seq == 5
+        assert StateWAL(d, 9).seq == 9
@@ -0,0 +1,232 @@
+"""
+PROJECT HOPE v3.0 - Append-Only Record Log
+Line-delimited JSON records split across segment files, each with a sidecar
+offset index (.idx, packed uint64 line offsets) for direct seeks by sequence number.
+Appends are O(1); fsync is batched; a full active segment is sealed and a new one
+started; compaction rewrites the retained tail when old records are dropped.
+
+Files for a log named 'trades':  trades.000000000000.jsonl + trades.000000000000.idx, ...
+The number is the sequence number of the segment's first record.
+"""
+import bisect, glob, json, os, threading, time
+from array import array
+import config
+
+
+class _Segment:
+    def __init__(self, path, start):
+        self.path = path
+        self.idx_path = path[:-len('.jsonl')] + '.idx'
+        self.start = start
+        self.offsets = array('Q')
+        self.size = 0
+        self._load()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @property
+    def end(self):
+        return self.start + len(self.offsets)
+
+    def _load(self):
+        if not os.path.exists(self.path): open(self.path, 'ab').close()
+        self.size = os.path.getsize(self.path)
+        if os.path.exists(self.idx_path):
+            with open(self.idx_path, 'rb') as f: raw = f.read()
+            self.offsets.frombytes(raw[:len(raw) - len(raw) % 8])
+        # Drop index entries past the data (crash before the data hit disk), then
+        # index any lines the sidecar missed, and cut a torn final line
+        while self.offsets and self.offsets[-1] >= self.size: self.offsets.pop()
+        repaired = False
+        with open(self.path, 'rb') as f:
+            pos = 0
+            if self.offsets:
+                f.seek(self.offsets[-1]); line = f.readline()
+                if line.endswith(b'\n'): pos = self.offsets[-1] + len(line)
+                else: pos = self.offsets.pop(); repaired = True
+            f.seek(pos)
+            while pos < self.size:
+                line = f.readline()
+                if not line.endswith(b'\n'): break
+                self.offsets.append(pos); pos += len(line); repaired = True
+        if pos < self.size:
+            print(f"[LOG WARNING] Truncating torn record in {self.path}")
+            with open(self.path, 'r+b') as f: f.truncate(pos)
+            self.size = pos
+        if repaired or not os.path.exists(self.idx_path):
+            with open(self.idx_path, 'wb') as f: f.write(self.offsets.tobytes())
+
+    def read(self, seqs):
+        out = []
+        with open(self.path, 'rb') as f:
+            for seq in seqs:
+                f.seek(self.offsets[seq - self.start])
+                out.append(json.loads(f.readline()))
+        return out
+
+    def iter(self, start=None, stop=None):
+        start = max(start or self.start, self.start)
+        count = min(stop if stop is not None else self.end, self.end) - start
+        if count <= 0: return
+        with open(self.path, 'rb') as f:
+            f.seek(self.offsets[start - self.start])
+            for _ in range(count): yield json.loads(f.readline())
+
+    def remove(self):
+        for p in (self.path, self.idx_path):
+            try: os.remove(p)
+            except FileNotFoundError: pass
+
+
+class AppendOnlyLog:
+    def __init__(self, directory, name, segment_records=None, fsync_interval=None, fsync_batch=None):
+        self.directory = directory
+        self.name = name
+        self.segment_records = segment_records or config.LOG_SEGMENT_RECORDS
+        self.fsync_interval = config.LOG_FSYNC_INTERVAL if fsync_interval is None else fsync_interval
+        self.fsync_batch = fsync_batch or config.LOG_FSYNC_BATCH
+        self._lock = threading.RLock()
+        self._data = None; self._idx = None  # append handles for the active segment
+        self._unsynced = 0
+        self._last_sync = time.time()
+        self._timer = None
+        self.segments = self._open_segments()
+
+    # ========== WRITE ==========
+
+    def append(self, record):
+        """Append one record; returns its sequence number"""
+        line = (json.dumps(record, default=str) + '\n').encode()
+        with self._lock:
+            seg = self.segments[-1]
+            if len(seg) >= self.segment_records: seg = self._seal()
+            if self._data is None: self._open_handles(seg)
+            pos = seg.size
+            self._data.write(line); self._data.flush()
+            self._idx.write(array('Q', [pos]).tobytes()); self._idx.flush()
+            seg.offsets.append(pos); seg.size += len(line)
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_batch or time.time() - self._last_sync >= self.fsync_interval:
+                self._sync()
+            elif self._timer is None:
+                # Bound the durability window even if no further appends arrive
+                self._timer = threading.Timer(self.fsync_interval, self.sync)
+                self._timer.daemon = True
+                self._timer.start()
+            return seg.end - 1
+
+    def extend(self, records):
+        for r in records: self.append(r)
+        self.sync()
+
+    def sync(self):
+        with self._lock: self._sync()
+
+    def compact(self, keep_last=None):
+        """Drop all but the newest `keep_last` records, rewriting them into one segment"""
+        with self._lock:
+            if keep_last is None or len(self) <= keep_last: return
+            first = self.end - keep_last
+            records = list(self.iter(first))
+            self._sync(); self._close_handles()
+            path = self._segment_path(first)
+            tmp = path + '.tmp'
+            with open(tmp, 'wb') as f:
+                for r in records: f.write((json.dumps(r, default=str) + '\n').encode())
+                f.flush(); os.fsync(f.fileno())
+            stale = self.segments
+            idx = path[:-len('.jsonl')] + '.idx'
+            if os.path.exists(idx): os.remove(idx)  # rebuilt from the new data below
+            os.replace(tmp, path)
+            new = _Segment(path, first)
+            for seg in stale:
+                if seg.path != path: seg.remove()
+            self.segments = [new]
+            print(f"[LOG] {self.name}: compacted to last {len(new)} records")
+
+    # ========== READ ==========
+
+    def __len__(self):
+        return self.end - self.start
+
+    @property
+    def start(self):
+        return self.segments[0].start
+
+    @property
+    def end(self):
+        return self.segments[-1].end
+
+    def __iter__(self):
+        return self.iter()
+
+    def iter(self, start=None, stop=None):
+        """Stream records in sequence order"""
+        with self._lock: segments = list(self.segments)
+        for seg in segments:
+            if stop is not None and seg.start >= stop: break
+            if start is not None and seg.end <= start: continue
+            yield from seg.iter(start, stop)
+
+    def read(self, seq):
+        return self.read_many([seq])[0]
+
+    def read_many(self, seqs):
+        """Records for the given sequence numbers, in the order asked"""
+        with self._lock: segments = list(self.segments)
+        starts = [s.start for s in segments]
+        by_seg = {}
+        for i, seq in enumerate(seqs):
+            if not self.start <= seq < self.end: raise IndexError(seq)
+            by_seg.setdefault(bisect.bisect_right(starts, seq) - 1, []).append((i, seq))
+        out = [None] * len(seqs)
+        for si, items in by_seg.items():
+            for (i, _), rec in zip(items, segments[si].read([s for _, s in items])): out[i] = rec
+        return out
+
+    def size_bytes(self):
+        return sum(s.size for s in self.segments)
+
+    # ========== INTERNAL ==========
+
+    def _segment_path(self, start):
+        return os.path.join(self.directory, f'{self.name}.{start:012d}.jsonl')
+
+    def _open_segments(self):
+        found = []
+        for path in glob.glob(os.path.join(self.directory, f'{self.name}.*.jsonl')):
+            try: found.append((int(path.rsplit('.', 2)[-2]), path))
+            except ValueError: continue
+        segments = []
+        for start, path in sorted(found):
+            seg = _Segment(path, start)
+            # Overlaps are leftovers from an interrupted compaction: a segment covered by the one
+            # before it is stale, and so is anything a compacted segment starts inside of
+            if segments and segments[-1].end >= seg.end:
+                seg.remove(); continue
+            while segments and segments[-1].end > seg.start: segments.pop().remove()
+            segments.append(seg)
+        return segments or [_Segment(self._segment_path(0), 0)]
+
+    def _seal(self):
+        self._sync(); self._close_handles()
+        seg = _Segment(self._segment_path(self.end), self.end)
+        self.segments.append(seg)
+        return seg
+
+    def _open_handles(self, seg):
+        self._data = open(seg.path, 'ab')
+        self._idx = open(seg.idx_path, 'ab')
+
+    def _close_handles(self):
+        for f in (self._data, self._idx):
+            if f: f.close()
+        self._data = self._idx = None
+
+    def _sync(self):
+        if self._timer: self._timer.cancel(); self._timer = None
+        if self._unsynced and self._data:
+            os.fsync(self._data.fileno())
+        self._unsynced = 0
+        self._last_sync = time.time()
@@ -6,10 +6,10 @@ from datetime import datetime, timedelta
 import config
 
 class TradierAPI:
-    def __init__(self):
-        self.api_key = config.TRADIER_API_KEY
-        self.account_id = config.TRADIER_ACCOUNT_ID
-        self.base_url = config.TRADIER_BASE_URL
+    def __init__(self, api_key=None, account_id=None, base_url=None):
+        self.api_key = api_key or config.TRADIER_API_KEY
+        self.account_id = account_id or config.TRADIER_ACCOUNT_ID
+        self.base_url = base_url or config.TRADIER_BASE_URL
         self.headers = {'Authorization': f'Bearer {self.api_key}', 'Accept': 'application/json'}
 
     def _get(self, endpoint, params=None):